@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 import sys
 import os
+import argparse
+import time
+import cProfile
+import pstats
+import tracemalloc
+import linecache
 from shutil import copyfile
 from datetime import datetime
 import platform
@@ -8,10 +14,27 @@ import r1py.r1py as r1
 import autor1.autor1 as autor1
 import logging
 import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 ############################## CONSTANTS ##############################
 LOGDIR = "./LOGS/"
 TEMP_FILE = "./templates.r2t"
+TEMP_CACHE_FILE = "./templates.r2t.cache"
+OUTPUT_CACHE_SIZE_MB = 1024
+# Packages time and memory are attributed to in --profile summaries
+PROFILE_PACKAGES = [os.path.dirname(r1.__file__), os.path.dirname(autor1.__file__)]
+# Functions and allocation sites listed in each --profile summary
+PROFILE_TOP = 30
+# Most recent frames tracemalloc keeps of each allocation, enough to reach the autor1 or r1py caller
+PROFILE_FRAMES = 10
+
+# Templates loaded once by each worker process, see initWorker
+workerTemplates = None
+# Records spans of each project with --trace, one per process
+tracer = r1.NullTracer()
+# (bytes, stage, tracemalloc.Snapshot) holding the most memory between stages with --profile
+memorySnapshot = None
 
 ############################## FUNCTIONS ##############################
 
@@ -25,17 +48,639 @@ def checkFile(path):
     return True
 
 
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(
+        prog="autor1",
+        description="Generate AutoR1 views, controls and groups for all .dbpr files in a folder.",
+    )
+    parser.add_argument(
+        "folder", nargs="?", default=None, help="Folder containing .dbpr projects"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of projects to process in parallel",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Also process projects in sub folders",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Folder to write _AUTO projects to, sub folders are recreated. Defaults to beside each project",
+    )
+    parser.add_argument(
+        "--no-indexes",
+        dest="indexes",
+        action="store_false",
+        help="Process without temporary indexes, for comparing run times",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="For projects AutoR1 has already run on, only regenerate the source groups that changed",
+    )
+    parser.add_argument(
+        "--fast-write",
+        dest="fastWrite",
+        action="store_true",
+        help="Generate in memory and write each _AUTO project in one pass once complete",
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cacheDir",
+        default=None,
+        help="Folder of previously generated projects, unchanged projects are restored from it instead of regenerated",
+    )
+    parser.add_argument(
+        "--cache-size",
+        dest="cacheSize",
+        type=int,
+        default=OUTPUT_CACHE_SIZE_MB,
+        help="Size in MiB the cache is trimmed to, least recently used entries are removed first",
+    )
+    parser.add_argument(
+        "--cache-link",
+        dest="cacheLink",
+        action="store_true",
+        help="Hardlink cached projects into place instead of copying them",
+    )
+    parser.add_argument(
+        "--max-view-controls",
+        dest="maxViewControls",
+        type=int,
+        default=autor1.VIEW_MAX_CONTROLS,
+        help="Split meter and master views into numbered pages above this many controls",
+    )
+    parser.add_argument(
+        "--max-view-width",
+        dest="maxViewWidth",
+        type=int,
+        default=autor1.VIEW_MAX_WIDTH,
+        help="Split meter and master views into numbered pages wider than this",
+    )
+    parser.add_argument(
+        "--dry-run",
+        dest="dryRun",
+        action="store_true",
+        help="Generate in memory and report what would be written, projects are not modified",
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="With --dry-run, write generated controls to <project>_AUTO.jsonl",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="FILE",
+        help="Write the time taken by each stage as a Chrome trace, viewable in chrome://tracing or Perfetto",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run each project under cProfile and tracemalloc, writing a .prof file and a summary of time and memory to the LOGS folder",
+    )
+    parser.add_argument(
+        "--sql-trace",
+        dest="sqlTrace",
+        action="store_true",
+        help="Log the count, time and query plan of every SQL statement run on each project",
+    )
+    return parser.parse_args(argv)
+
+
+def isProject(fileName):
+    return fileName.endswith(".dbpr") and "_AUTO" not in fileName
+
+
+def findProjects(folder, recursive=False):
+    """List the .dbpr projects to process
+
+    Args:
+        folder (string): Folder to search
+        recursive (bool, optional): Include sub folders. Defaults to False.
+
+    Returns:
+        [string]: Paths of projects, relative to folder when not recursive
+    """
+    if not recursive:
+        return [each for each in os.listdir(folder) if isProject(each)]
+
+    projects = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        projects += [os.path.join(root, f) for f in sorted(files) if isProject(f)]
+    return projects
+
+
+def getAutoPath(projectPath, outputDir=None):
+    """Get the path a generated project is written to
+
+    Args:
+        projectPath (string): Path of source project
+        outputDir (string, optional): Folder for outputs, the project's relative folder is recreated inside it. Defaults to None.
+
+    Returns:
+        string: Path of _AUTO project
+    """
+    autoPath = os.path.splitext(projectPath)[0] + "_AUTO.dbpr"
+    if outputDir is None:
+        return autoPath
+
+    autoPath = os.path.join(outputDir, os.path.normpath(autoPath))
+    os.makedirs(os.path.dirname(autoPath), exist_ok=True)
+    return autoPath
+
+
+def generate(projFile, tempFile, budget=None, incremental=False):
+    """Run every AutoR1 stage on an opened project
+
+    Args:
+        projFile (r1.ProjectFile): Project to generate into
+        tempFile (autor1.TemplateFile): Templates to use
+        budget (autor1.ViewBudget, optional): Limits of each generated view. Defaults to None.
+        incremental (bool, optional): Only regenerate source groups that changed since AutoR1 last ran on the project. Defaults to False.
+    """
+    if incremental and runStage(projFile, autor1.regenerate, tempFile, budget):
+        runStage(projFile, autor1.saveManifest)
+        return
+
+    for stage, stageArgs in autor1.getStages(tempFile, budget):
+        runStage(projFile, stage, *stageArgs)
+
+
+def runStage(projFile, stage, *args):
+    # Each stage is a span of the project's trace
+    with projFile.span(stage.__name__, "stage"):
+        result = stage(projFile, *args)
+    if tracemalloc.is_tracing():
+        snapshotMemory(stage.__name__)
+    return result
+
+
+def snapshotMemory(stage):
+    """Keep a snapshot of traced memory if more is held than after any earlier stage
+
+    Args:
+        stage (string): Stage that has just finished
+    """
+    global memorySnapshot
+    size = tracemalloc.get_traced_memory()[0]
+    if memorySnapshot is None or size > memorySnapshot[0]:
+        memorySnapshot = (size, stage, tracemalloc.take_snapshot())
+
+
+def getViewBudget(args):
+    return autor1.ViewBudget(args.maxViewControls, args.maxViewWidth)
+
+
+def processProject(projectPath, tempFile, args):
+    """Generate a copy of a project with AutoR1 views, controls and groups
+
+    Args:
+        projectPath (string): Path of .dbpr project
+        tempFile (autor1.TemplateFile): Templates to use
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        int: 0 on success, 1 on failure
+    """
+    log = logging.getLogger(__name__)
+    status = 0
+    autoPath = getAutoPath(projectPath, args.output)
+
+    startTime = time.perf_counter()
+    with tracer.span("open", "stage"):
+        if args.fastWrite:
+            # Nothing is written until generation has finished, see saveAs below
+            projFile = r1.ProjectFile(
+                projectPath,
+                groupTree=True,
+                processingIndexes=args.indexes,
+                inMemory=True,
+                sqlTrace=args.sqlTrace,
+            )
+        else:
+            # Copying over the output would write through to a cache entry hardlinked there by --cache-link
+            if os.path.exists(autoPath):
+                os.remove(autoPath)
+            copyfile(projectPath, autoPath)
+
+            if not checkFile(autoPath):
+                print(f"Could not access {autoPath}")
+                status = 1
+
+            projFile = r1.ProjectFile(
+                autoPath,
+                groupTree=True,
+                processingIndexes=args.indexes,
+                sqlTrace=args.sqlTrace,
+            )
+    projFile.tracer = tracer
+    if projFile.isInitialised():
+        try:
+            generate(projFile, tempFile, getViewBudget(args), args.incremental)
+            if args.fastWrite:
+                with tracer.span("saveAs", "stage"):
+                    projFile.saveAs(autoPath)
+        except:
+            # Nothing of a failed run is kept, indexes included
+            projFile.close(commit=False)
+            if not args.fastWrite:
+                os.remove(autoPath)
+            raise
+        log.info(
+            f"Processed {autoPath} in {time.perf_counter() - startTime:.3f}s (indexes {'on' if args.indexes else 'off'}, fast write {'on' if args.fastWrite else 'off'})"
+        )
+        print(f"Finished generating views, controls and groups for {autoPath}.")
+    else:
+        projFile.close()
+        if not args.fastWrite:
+            os.remove(autoPath)
+        print(
+            f"Initial setup has not been run for {projectPath}. Open the file in R1 and perform the initial group and view creation process first, save and then re-run AutoR1."
+        )
+        return 1
+
+    with tracer.span("close", "stage"):
+        projFile.close()
+    return status
+
+
+def dryRunProject(projectPath, tempFile, args):
+    """Generate into an in-memory copy of a project, the project on disk is not touched
+
+    Controls are counted, or written to <project>_AUTO.jsonl with --jsonl.
+
+    Args:
+        projectPath (string): Path of .dbpr project
+        tempFile (autor1.TemplateFile): Templates to use
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        int: 0 on success, 1 on failure
+    """
+    log = logging.getLogger(__name__)
+
+    startTime = time.perf_counter()
+    projFile = r1.ProjectFile(
+        projectPath,
+        groupTree=True,
+        processingIndexes=args.indexes,
+        inMemory=True,
+        sqlTrace=args.sqlTrace,
+    )
+    if not projFile.isInitialised():
+        projFile.close()
+        print(f"Initial setup has not been run for {projectPath}.")
+        return 1
+
+    if args.jsonl:
+        autoPath = getAutoPath(projectPath, args.output)
+        sink = r1.JsonLinesSink(os.path.splitext(autoPath)[0] + ".jsonl")
+    else:
+        sink = r1.NullSink()
+    projFile.controlSink = sink
+    projFile.tracer = tracer
+
+    try:
+        generate(projFile, tempFile, getViewBudget(args), args.incremental)
+        sink.flush()
+    finally:
+        if args.jsonl:
+            sink.close()
+        projFile.close()
+
+    summary = (
+        f"{projectPath}: {sink.count} controls, {len(projFile.created['Groups'])} groups, "
+        f"{len(projFile.created['Views'])} views in {time.perf_counter() - startTime:.3f}s"
+    )
+    log.info(f"Dry run of {summary}")
+    print(f"Dry run of {summary}.")
+    return 0
+
+
+def runProject(projectPath, tempFile, args):
+    with tracer.span(os.path.basename(projectPath), "project", path=projectPath):
+        if args.dryRun:
+            return dryRunProject(projectPath, tempFile, args)
+        return processProject(projectPath, tempFile, args)
+
+
+def isProfiledFile(path):
+    return any(path.startswith(package + os.sep) for package in PROFILE_PACKAGES)
+
+
+def getProfileName(path):
+    # Path relative to src, e.g. autor1/autor1.py
+    return os.path.relpath(path, os.path.dirname(PROFILE_PACKAGES[0]))
+
+
+def getOwnTimes(stats):
+    """Time spent in each autor1 and r1py function, including the code outside them it calls
+
+    The own time of code outside autor1 and r1py, such as sqlite, is given to the
+    nearest autor1 or r1py function up the call stack, split between callers by the
+    time each call took. Outside code calling back into autor1 or r1py, such as
+    contextlib or sorted with a key, keeps none of that time, so nothing is counted twice.
+
+    Args:
+        stats (pstats.Stats): Profile of the project
+
+    Returns:
+        dict: Seconds by pstats function key
+    """
+    shares = {}
+
+    def getShares(func, visiting):
+        # Fraction of an outside function's calls owed to each autor1 and r1py function
+        if func in shares:
+            return shares[func]
+        if func in visiting or func not in stats.stats:
+            return {}
+        visiting.add(func)
+        callers = stats.stats[func][4]
+        total = sum(ct for _, _, _, ct in callers.values())
+        result = {}
+        for caller, (_, _, _, ct) in callers.items():
+            if not total:
+                break
+            for key, fraction in getCallerShares(caller, visiting).items():
+                result[key] = result.get(key, 0) + fraction * ct / total
+        visiting.discard(func)
+        shares[func] = result
+        return result
+
+    def getCallerShares(caller, visiting):
+        if isProfiledFile(caller[0]):
+            return {caller: 1.0}
+        return getShares(caller, visiting)
+
+    own = {}
+    for func, (_, _, tt, _, callers) in stats.stats.items():
+        if isProfiledFile(func[0]):
+            own[func] = own.get(func, 0) + tt
+            continue
+        # Own time of outside code by the caller it was spent under
+        for caller, (_, _, callerTt, _) in callers.items():
+            for key, fraction in getCallerShares(caller, set()).items():
+                own[key] = own.get(key, 0) + callerTt * fraction
+    return own
+
+
+def getTimeSummary(stats):
+    """
+    Args:
+        stats (pstats.Stats): Profile of the project
+
+    Returns:
+        [string]: Lines listing the autor1 and r1py functions taking the most time, see getOwnTimes
+    """
+    own = getOwnTimes(stats)
+    lines = [f"{'Calls':>10}{'Own (s)':>10}{'Cumul (s)':>11}  Function"]
+    for func in sorted(own, key=own.get, reverse=True)[:PROFILE_TOP]:
+        _, nc, _, ct, _ = stats.stats[func]
+        lines.append(
+            f"{nc:>10}{own[func]:>10.3f}{ct:>11.3f}  {getProfileName(func[0])}:{func[1]}({func[2]})"
+        )
+    return lines
+
+
+def getMemorySummary(snapshot):
+    """Memory held by each line of autor1 and r1py, from the innermost of their frames in each allocation's traceback
+
+    Args:
+        snapshot (tracemalloc.Snapshot): Traced memory
+
+    Returns:
+        [string]: Lines of the summary
+    """
+    sites = {}
+    for stat in snapshot.statistics("traceback"):
+        frame = next(
+            (f for f in reversed(stat.traceback) if isProfiledFile(f.filename)), None
+        )
+        key = (frame.filename, frame.lineno) if frame is not None else None
+        size, count = sites.get(key, (0, 0))
+        sites[key] = (size + stat.size, count + stat.count)
+
+    lines = [f"{'Size (KiB)':>10}{'Blocks':>10}  Line"]
+    for key in sorted(sites, key=lambda k: sites[k][0], reverse=True)[:PROFILE_TOP]:
+        size, count = sites[key]
+        if key is None:
+            site = "Outside autor1 and r1py"
+        else:
+            source = linecache.getline(key[0], key[1]).strip()
+            site = f"{getProfileName(key[0])}:{key[1]}  {source}"
+        lines.append(f"{size / 1024:>10.1f}{count:>10}  {site}")
+    return lines
+
+
+def measureProjectMemory(projectPath, tempFile, args):
+    """Generate into an in-memory copy of a project under tracemalloc
+
+    Controls go to a NullSink and nothing is traced, printed or written, so only
+    the run profiled for time produces output.
+
+    Args:
+        projectPath (string): Path of .dbpr project
+        tempFile (autor1.TemplateFile): Templates to use
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        (int, int): 0 on success or 1 on failure, and the peak traced memory in bytes
+    """
+    tracemalloc.start(PROFILE_FRAMES)
+    try:
+        projFile = r1.ProjectFile(
+            projectPath,
+            groupTree=True,
+            processingIndexes=args.indexes,
+            inMemory=True,
+        )
+        try:
+            if not projFile.isInitialised():
+                return 1, tracemalloc.get_traced_memory()[1]
+            projFile.controlSink = r1.NullSink()
+            generate(projFile, tempFile, getViewBudget(args), args.incremental)
+            return 0, tracemalloc.get_traced_memory()[1]
+        finally:
+            projFile.close()
+    finally:
+        tracemalloc.stop()
+
+
+def profileProject(projectPath, tempFile, args):
+    """Measure the memory of a dry run of a project, then run it under cProfile
+
+    Tracing allocations slows code that allocates many small objects several times
+    over, so memory is measured in a dry run first, see measureProjectMemory. Only
+    the run under cProfile writes the output.
+
+    Writes <log prefix>-<project>.prof, viewable with python -m pstats or snakeviz,
+    and <log prefix>-<project>-profile.txt summarising the time and memory taken by
+    autor1 and r1py functions.
+
+    Args:
+        projectPath (string): Path of .dbpr project
+        tempFile (autor1.TemplateFile): Templates to use
+        args (argparse.Namespace): Parsed arguments, args.profile is the log prefix
+
+    Returns:
+        int: 0 on success, 1 on failure
+    """
+    global memorySnapshot
+    log = logging.getLogger(__name__)
+    name = os.path.splitext(os.path.normpath(projectPath))[0].replace(os.sep, "-")
+    prefix = f"{args.profile}-{name}"
+
+    log.info(f"Profiling memory of {projectPath}")
+    memorySnapshot = None
+    memoryStatus, peak = measureProjectMemory(projectPath, tempFile, args)
+
+    log.info(f"Profiling time of {projectPath}")
+    profiler = cProfile.Profile()
+    startTime = time.perf_counter()
+    status = profiler.runcall(runProject, projectPath, tempFile, args)
+    elapsed = time.perf_counter() - startTime
+    status |= memoryStatus
+    profiler.dump_stats(prefix + ".prof")
+
+    lines = [
+        f"Profile of {projectPath} - status {status}, {elapsed:.3f}s, peak traced memory {peak / (1 << 20):.1f}MiB",
+        f"cProfile stats in {prefix}.prof",
+        "",
+        "Time by autor1 and r1py function, own time includes calls outside them",
+    ]
+    lines += getTimeSummary(pstats.Stats(profiler))
+    if memorySnapshot is not None:
+        size, stage, snapshot = memorySnapshot
+        lines += [
+            "",
+            f"Memory held after {stage}, the most of any stage - {size / (1 << 20):.1f}MiB",
+        ]
+        lines += getMemorySummary(snapshot)
+        memorySnapshot = None
+    with open(prefix + "-profile.txt", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    log.info(f"Saved profile of {projectPath} to {prefix}-profile.txt")
+    print(f"Saved profile of {projectPath} to {prefix}-profile.txt.")
+    return status
+
+
+def runProfiledProject(projectPath, tempFile, args):
+    if args.profile:
+        return profileProject(projectPath, tempFile, args)
+    return runProject(projectPath, tempFile, args)
+
+
+def initWorker(logfn, trace=False):
+    """Set up a worker process, templates are loaded once and reused for each project
+
+    Args:
+        logfn (string): Log file shared with the main process
+        trace (bool, optional): Record spans, returned with each project's status. Defaults to False.
+    """
+    global workerTemplates, tracer
+    logging.basicConfig(filename=logfn, level=logging.INFO)
+    workerTemplates = autor1.TemplateFile(TEMP_FILE, TEMP_CACHE_FILE)
+    if trace:
+        tracer = r1.Tracer()
+
+
+def runProjectWorker(projectPath, args):
+    # Spans are passed back to the main process which writes the trace
+    return runProfiledProject(projectPath, workerTemplates, args), tracer.popEvents()
+
+
+def runPool(projects, args, logfn):
+    """Process projects in a pool of worker processes
+
+    Args:
+        projects ([string]): Paths of projects
+        args (argparse.Namespace): Parsed arguments
+        logfn (string): Log file shared with the workers
+
+    Returns:
+        {string: int}: Status of each project, 0 on success
+    """
+    log = logging.getLogger(__name__)
+
+    # Build the template cache once so every worker can load it in one read
+    autor1.TemplateFile(TEMP_FILE, TEMP_CACHE_FILE).close()
+
+    statuses = {}
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=initWorker,
+        initargs=(logfn, args.trace is not None),
+    ) as pool:
+        futures = [
+            (projectPath, pool.submit(runProjectWorker, projectPath, args))
+            for projectPath in projects
+        ]
+        for projectPath, future in futures:
+            try:
+                projectStatus, events = future.result()
+                tracer.addEvents(events)
+            except Exception as e:
+                log.exception(f"{projectPath} failed")
+                print(f"Could not process {projectPath} - {e}")
+                projectStatus = 1
+            log.info(f"{projectPath} finished with status {projectStatus}")
+            statuses[projectPath] = projectStatus
+    return statuses
+
+
+def getCacheOptions(args):
+    # Settings that change the generated project, part of every output cache key
+    return (args.maxViewControls, args.maxViewWidth, args.incremental)
+
+
+def restoreFromCache(projects, cache, args):
+    """Place cached outputs for every project that has one
+
+    Args:
+        projects ([string]): Paths of projects
+        cache (autor1.OutputCache): Cache to restore from
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        {string: string}: Cache key of each project that still needs generating
+    """
+    templateDigest = autor1.getTemplateFingerprint(TEMP_FILE)[2]
+    options = getCacheOptions(args)
+    misses = {}
+    for projectPath in projects:
+        key = cache.getKey(projectPath, templateDigest, options)
+        autoPath = getAutoPath(projectPath, args.output)
+        if cache.fetch(key, autoPath):
+            print(f"Restored {autoPath} from cache.")
+        else:
+            misses[projectPath] = key
+    return misses
+
+
 ############################## LOGGING #############################
 # Ensure exceptions are logged
 
 
 def main():
+    global tracer
+    args = parseArgs(sys.argv[1:])
     dateTimeObj = datetime.now()
 
     if not os.path.exists(LOGDIR):
         os.makedirs(LOGDIR)
     timestamp = dateTimeObj.strftime("%d-%b-%Y-%H-%M-%S")
-    logfn = LOGDIR + timestamp + "-autor1log.txt"
+    logfn = os.path.abspath(LOGDIR + timestamp + "-autor1log.txt")
     with open(logfn, "w"):
         pass
 
@@ -55,13 +700,24 @@ def main():
 
     ############################## START ##############################
 
+    if args.output is not None:
+        args.output = os.path.abspath(args.output)
+    if args.cacheDir is not None:
+        args.cacheDir = os.path.abspath(args.cacheDir)
+    if args.trace is not None:
+        args.trace = os.path.abspath(args.trace)
+        tracer = r1.Tracer()
+    if args.profile:
+        # Profiles are written beside the log, named after it
+        args.profile = os.path.abspath(LOGDIR + timestamp)
+
     # Clear screen, ensure correct cmd for OS + set CWD if on Mac
     if platform.system() == "Windows":
         os.system("cls")
     else:
         os.system("clear")
         try:
-            os.chdir(sys.argv[1] + "/")
+            os.chdir(args.folder + "/")
         except:
             print("Could not get current working directory.")
 
@@ -73,56 +729,53 @@ def main():
 
     print("**AutoR1**")
 
-    projects = []
-    projects += [
-        each
-        for each in os.listdir("./")
-        if each.endswith(".dbpr") and "_AUTO" not in each
-    ]
+    projects = findProjects("./", args.recursive)
 
     print(f"Found {len(projects)} projects in folder.")
 
     if not checkFile(TEMP_FILE):
         print(f"Could not access {TEMP_FILE}")
         sys.exit(1)
+
+    cache = None
+    misses = {}
+    if args.cacheDir is not None and not args.dryRun:
+        cache = autor1.OutputCache(
+            args.cacheDir, args.cacheSize * (1 << 20), args.cacheLink
+        )
+        misses = restoreFromCache(projects, cache, args)
+        projects = [p for p in projects if p in misses]
+
+    if args.jobs > 1:
+        statuses = runPool(projects, args, logfn)
     else:
-        tempFile = autor1.TemplateFile(TEMP_FILE)
+        tempFile = autor1.TemplateFile(TEMP_FILE, TEMP_CACHE_FILE)
+        statuses = {}
+        for projectPath in projects:
+            statuses[projectPath] = runProfiledProject(projectPath, tempFile, args)
+        tempFile.close()
 
     status = 0
-    for projectPath in projects:
-        autoPath = os.path.splitext(projectPath)[0] + "_AUTO.dbpr"
-
-        copyfile(projectPath, autoPath)
-
-        if not checkFile(autoPath):
-            print(f"Could not access {autoPath}")
-            status = 1
-
-        projFile = r1.ProjectFile(autoPath)
-        if projFile.isInitialised():
-            autor1.clean(projFile)
-            projFile.pId = projFile.createGrp(autor1.PARENT_GROUP_TITLE, 1)[0]
-            autor1.createSubLRCGroups(projFile)
-            autor1.getSrcGrpInfo(projFile)
-            autor1.configureApChannels(projFile)
-            autor1.createMeterView(projFile, tempFile)
-            autor1.createMasterView(projFile, tempFile)
-            autor1.createNavButtons(projFile, tempFile)
-            autor1.addSubCtoSubL(projFile)
-            print(f"Finished generating views, controls and groups for {autoPath}.")
-        else:
-            projFile.close()
-            os.remove(autoPath)
-            print(
-                f"Initial setup has not been run for {projectPath}. Open the file in R1 and perform the initial group and view creation process first, save and then re-run AutoR1."
-            )
-            status = 1
+    for projectPath, projectStatus in statuses.items():
+        status |= projectStatus
+        if cache is not None and projectStatus == 0:
+            cache.store(misses[projectPath], getAutoPath(projectPath, args.output))
 
-        projFile.close()
+    if cache is not None:
+        # Apply a lowered --cache-size even when nothing new was stored
+        cache.evict()
+        summary = cache.getSummary()
+        log.info(f"Output cache: {summary}")
+        print(f"Output cache: {summary}.")
+
+    if args.trace is not None:
+        tracer.save(args.trace)
+        print(f"Saved trace to {args.trace}.")
 
-    tempFile.close()
     sys.exit(status)
 
 
 if __name__ == "__main__":
+    # Required for worker processes in frozen builds
+    multiprocessing.freeze_support()
     main()
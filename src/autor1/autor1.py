@@ -3,6 +3,11 @@ import logging
 from abc import ABCMeta
 import r1py.r1py as r1
 import sys
+import os
+import hashlib
+import json
+import shutil
+import tempfile
 
 log = logging.getLogger(__name__)
 # log.addHandler(logging.StreamHandler(sys.stdout))
@@ -21,6 +26,29 @@ METER_WINDOW_TITLE = "AUTO - Meters"
 MASTER_WINDOW_TITLE = "AUTO - Master"
 INPUT_SNAP_NAME = "IP Config"
 
+# Bump when the layout of the compiled template cache changes
+TEMPLATE_CACHE_VERSION = 2
+
+# Bump whenever a change to AutoR1 alters the projects it generates, invalidating every
+# entry of an OutputCache
+OUTPUT_CACHE_VERSION = 1
+OUTPUT_CACHE_SUFFIX = ".dbpr"
+
+# Default rendering budget of a single view, larger layouts are split across numbered pages
+VIEW_MAX_CONTROLS = 4000
+VIEW_MAX_WIDTH = 16384
+
+# Dante + digital info properties require channel ID to be 0
+DEV_PROPS = frozenset(r1.DEV_PROP_TYPES)
+
+# Table recording the ids of every row AutoR1 inserted, used by clean()
+MANIFEST_TABLE = "AutoR1Manifest"
+MANIFEST_KIND_NAV_VIEWS = "NavViews"
+# Fingerprint and JoinedIds of each source group's part of a generated view, used by regenerate()
+VIEW_UNITS_TABLE = "AutoR1ViewUnits"
+# Unit of the controls in a view that do not belong to a source group
+UNIT_HEADER = ""
+
 TYPE_SUBS_C = 7
 TYPE_SUBS_R = 6
 TYPE_SUBS_L = 5
@@ -30,42 +58,630 @@ TYPE_TOPS_R = 2
 TYPE_TOPS = 1
 TYPE_POINT = 0
 
+# Roles of R1 groups, parsed from the suffix appended to a SourceGroup name
+ROLE_MASTER = "Master"
+ROLE_TOPS = "TOPs"
+ROLE_TOPS_L = "TOPs L"
+ROLE_TOPS_R = "TOPs R"
+ROLE_SUBS = "SUBs"
+ROLE_SUBS_L = "SUBs L"
+ROLE_SUBS_R = "SUBs R"
+ROLE_SUBS_C = "SUBs C"
+# Longest first so "X TOPs L" is not read as a TOPs group
+ROLE_SUFFIXES = [
+    ROLE_TOPS_L,
+    ROLE_TOPS_R,
+    ROLE_SUBS_L,
+    ROLE_SUBS_R,
+    ROLE_SUBS_C,
+    ROLE_TOPS,
+    ROLE_SUBS,
+]
+
+r1.registerQueries(
+    {
+        "templateSections": "SELECT * FROM Sections ORDER BY JoinedId ASC",
+        "templateControls": "SELECT * FROM Controls WHERE JoinedId = ? ORDER BY PosX ASC",
+        "templateSizes": "SELECT JoinedId, max(PosX + Width), max(PosY + Height) FROM Controls GROUP BY JoinedId",
+        "sourceGroupFromName": "SELECT * FROM SourceGroups WHERE Name = ? ORDER BY NextSourceGroupId DESC",
+        "sourceGroupFromId": "SELECT * FROM SourceGroups WHERE SourceGroupId = ? ORDER BY NextSourceGroupId DESC",
+        "groupRolesCreate": "CREATE TEMP TABLE IF NOT EXISTS GroupRoles(GroupId INTEGER PRIMARY KEY, Name VARCHAR, ParentId INTEGER, Role VARCHAR)",
+        "groupRolesIndex": "CREATE INDEX IF NOT EXISTS temp.GroupRolesRoleParent ON GroupRoles(Role, ParentId)",
+        "groupRolesClear": "DELETE FROM temp.GroupRoles",
+        "groupRolesInsert": "INSERT INTO temp.GroupRoles (GroupId, Name, ParentId, Role) VALUES (?, ?, ?, ?)",
+        "navButtonViews": "SELECT ViewId FROM Controls WHERE TargetId = ? AND TargetChannel = -1",
+        "navButtonDelete": "DELETE FROM Controls WHERE TargetId = ? AND TargetChannel = -1",
+        "navButtonShiftViews": (
+            " UPDATE Controls SET PosY = PosY + ? WHERE ViewId IN ( "
+            "   SELECT ViewId FROM Controls WHERE TargetId = ? AND TargetChannel = -1 AND ViewId NOT IN (?, ?) "
+            " ) "
+        ),
+        "controlShiftViewBatch": f"UPDATE Controls SET PosY = PosY + ? WHERE ViewId IN ({', '.join('?' * r1.ID_BATCH_SIZE)})",
+        "manifestCreate": f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE}(Kind VARCHAR, Id INTEGER, PRIMARY KEY (Kind, Id))",
+        "manifestAll": f"SELECT Kind, Id FROM {MANIFEST_TABLE} ORDER BY Kind, Id",
+        "manifestClear": f"DELETE FROM {MANIFEST_TABLE}",
+        "manifestControlsOutsideViews": (
+            " SELECT ViewId, TargetId, TargetChannel FROM Controls WHERE ControlId IN ( "
+            f"   SELECT Id FROM {MANIFEST_TABLE} WHERE Kind = 'Controls' "
+            " ) AND ViewId NOT IN ( "
+            f"   SELECT Id FROM {MANIFEST_TABLE} WHERE Kind = 'Views' "
+            " ) "
+        ),
+        "manifestInsert": f"INSERT OR IGNORE INTO {MANIFEST_TABLE} (Kind, Id) VALUES (?, ?)",
+        "viewUnitsCreate": f"CREATE TABLE IF NOT EXISTS {VIEW_UNITS_TABLE}(ViewId INTEGER, Unit VARCHAR, Fingerprint VARCHAR, PosX REAL, JoinedId INTEGER)",
+        "viewUnitsAll": f"SELECT ViewId, Unit, Fingerprint, PosX, JoinedId FROM {VIEW_UNITS_TABLE} ORDER BY rowid",
+        "viewUnitsClear": f"DELETE FROM {VIEW_UNITS_TABLE}",
+        "viewUnitsInsert": f"INSERT INTO {VIEW_UNITS_TABLE} (ViewId, Unit, Fingerprint, PosX, JoinedId) VALUES (?, ?, ?, ?, ?)",
+        "viewResize": "UPDATE Views SET HRes = ?, VRes = ? WHERE ViewId = ?",
+        "controlIdsFromJoinedBatch": f"SELECT ControlId FROM Controls WHERE ViewId = ? AND JoinedId IN ({', '.join('?' * r1.ID_BATCH_SIZE)})",
+        "controlShiftXBatch": f"UPDATE Controls SET PosX = PosX + ? WHERE ViewId = ? AND JoinedId IN ({', '.join('?' * r1.ID_BATCH_SIZE)})",
+        "discoveryRootsCreate": "CREATE TEMP TABLE IF NOT EXISTS DiscoveryRoots(GroupId INTEGER PRIMARY KEY)",
+        "discoveryRootsClear": "DELETE FROM temp.DiscoveryRoots",
+        "discoveryRootsInsert": "INSERT OR IGNORE INTO temp.DiscoveryRoots (GroupId) VALUES (?)",
+        "groupTreeChannels": (
+            " WITH RECURSIVE "
+            "   devs(RootId, GroupId, Name, TargetId, TargetChannel, Type) AS ( "
+            "      SELECT Groups.ParentId, Groups.GroupId, Groups.Name, Groups.TargetId, Groups.TargetChannel, Groups.Type FROM Groups "
+            "      JOIN temp.DiscoveryRoots ON Groups.ParentId = DiscoveryRoots.GroupId "
+            "      UNION "
+            "      SELECT devs.RootId, Groups.GroupId, Groups.Name, Groups.TargetId, Groups.TargetChannel, Groups.Type FROM Groups, devs WHERE Groups.ParentId = devs.GroupId "
+            "   ) "
+            " SELECT RootId, GroupId, devs.Name, TargetId, TargetChannel, CabinetsAdditionalData.Name, Cabinets.CabinetId, devs.Type, "
+            " /* Sub arrays always end with either L/C/R, two numbers, a dash and a further two numbers */ "
+            " devs.Name LIKE '% L__%', devs.Name LIKE '% R__%', devs.Name LIKE '% C__%' "
+            " FROM devs "
+            " JOIN Cabinets "
+            " ON devs.TargetId = Cabinets.DeviceId "
+            " AND devs.TargetChannel = Cabinets.AmplifierChannel "
+            " JOIN CabinetsAdditionalData "
+            " ON Cabinets.CabinetId = CabinetsAdditionalData.CabinetId "
+            " WHERE Linked = 0 "
+            " ORDER BY RootId, Cabinets.CabinetId, GroupId "
+        ),
+        "sourceGroupDiscovery": (
+            " SELECT Views.ViewId, Views.Name, SourceGroups.SourceGroupId, NextSourceGroupId, SourceGroups.Type, ArrayProcessingEnable,  "
+            " ArraySightId, System, masterGroup.GroupId as MasterGroupId, masterGroup.Name as MasterGroupName, topsGroup.GroupId as TopGroupId, topsGroup.Name as TopGroupName,  "
+            " topsLGroup.GroupId as TopLeftGroupId, topsLGroup.Name as TopLeftGroupName, topsRGroup.GroupId as TopRightGroupId, topsRGroup.Name as TopRightGroupName,  "
+            " subsGroup.GroupId as SubGroupId, subsGroup.Name as SubGroupName, subsLGroup.GroupId as SubLeftGroupId, subsLGroup.Name as SubLeftGroupName, subsRGroup.GroupId as "
+            " SubRightGroupId, subsRGroup.Name as SubRightGroupName, subsCGroup.GroupId as SubCGroupId, subsCGroup.Name as SubCGroupName, i.DisplayName as xover "
+            " FROM SourceGroups "
+            " /* Combine additional source group data */ "
+            " JOIN SourceGroupsAdditionalData  "
+            " ON SourceGroups.SourceGroupId = SourceGroupsAdditionalData.SourceGroupId "
+            " /* Combine view info */ "
+            " JOIN Views "
+            " ON Views.Name = SourceGroups.Name "
+            " /* Combine R1 groups to Source Groups - We only have the name to go on here */ "
+            " JOIN Groups masterGroup "
+            " ON SourceGroups.name = masterGroup.Name "
+            " /* Fetch TOPs groups which may or may not have L/R subgroups */ "
+            " LEFT OUTER JOIN temp.GroupRoles topsGroup "
+            " ON topsGroup.Role = 'TOPs' AND topsGroup.ParentId = masterGroup.GroupId "
+            " /* Fetch L/R TOP groups which will be under the main TOPs groups */ "
+            " LEFT OUTER JOIN temp.GroupRoles topsLGroup "
+            " ON topsLGroup.Role = 'TOPs L' AND topsLGroup.ParentId  = topsGroup.GroupId "
+            " LEFT OUTER JOIN temp.GroupRoles topsRGroup "
+            " ON topsRGroup.Role = 'TOPs R' AND topsRGroup.ParentId  = topsGroup.GroupId "
+            " /* Fetch the SUBs groups */ "
+            " LEFT OUTER JOIN temp.GroupRoles subsGroup "
+            " ON subsGroup.Role = 'SUBs' AND subsGroup.ParentId  = masterGroup.GroupId "
+            " /* Fetch L/R/C SUB groups we created earlier */ "
+            " LEFT OUTER JOIN temp.GroupRoles subsLGroup "
+            " ON subsLGroup.Role = 'SUBs L' AND subsLGroup.ParentId  = subsGroup.GroupId "
+            " LEFT OUTER JOIN temp.GroupRoles subsRGroup "
+            " ON subsRGroup.Role = 'SUBs R' AND subsRGroup.ParentId  = subsGroup.GroupId "
+            " LEFT OUTER JOIN temp.GroupRoles subsCGroup "
+            " ON subsCGroup.Role = 'SUBs C' AND subsCGroup.ParentId  = subsGroup.GroupId "
+            " /* Fetch crossover info for subs */ "
+            ' LEFT OUTER JOIN (SELECT * FROM Controls WHERE DisplayName = "100Hz" OR DisplayName = "Infra") i '
+            " ON i.ViewId  = Views.ViewId "
+            " /* Skip unused channels group */ "
+            ' WHERE SourceGroups.name != "Unused channels" '
+            " /* Skip second half of stereo pairs */"
+            " AND OrderIndex != -1 "
+            " /* Skip duplicate groups in Master group _only for arrays_. We want L/R groups for arrays. */ "
+            ' AND (SourceGroups.Type == 1 AND masterGroup.ParentId != (SELECT GroupId FROM temp.GroupRoles WHERE Role = "Master"))  '
+            " /* Skip existing Sub array group in Master */ "
+            ' OR (SourceGroups.Type == 3 AND masterGroup.ParentId != (SELECT GroupId FROM temp.GroupRoles WHERE Role = "Master"))  '
+            " /* Get point source groups from Master group */ "
+            ' OR (SourceGroups.Type == 2 AND masterGroup.ParentId == (SELECT GroupId FROM temp.GroupRoles WHERE Role = "Master")) '
+            " /* Device only groups */"
+            " OR SourceGroups.Type == 4 "
+            "  ORDER BY SourceGroups.OrderIndex ASC "
+        ),
+    }
+)
+
 ##### Source groups are created in ArrayCalc ########
 # Sections is table name from .r2t file
 class Template:
-    def __init__(self, sections, controls):
+    def __init__(self, sections, controls=None, templateFile=None, size=None):
+        """A single template, controls are read from templateFile on first use
+
+        Args:
+            sections (tuple): Row from the Sections table
+            controls ([tuple], optional): Rows from the Controls table. Defaults to None.
+            templateFile (TemplateFile, optional): File to load controls from. Defaults to None.
+            size ([int], optional): Width and height of the template. Defaults to None.
+        """
+        self.sections = sections
         if sections is not None:
             self.id, self.name, self.parentId, self.joinedId, _ = sections
 
-        if controls is not None:
-            self.controls = controls
+        self.templateFile = templateFile
+        self.size = size
+        self._controls = controls
+        self._prototypes = None
+
+    @property
+    def controls(self):
+        if self._controls is None and self.templateFile is not None:
+            self._controls = self.templateFile.query(
+                "templateControls", (self.joinedId,)
+            ).fetchall()
+            log.info(f"Loaded template - {self.name}")
+        return self._controls
+
+    @property
+    def prototypes(self):
+        """Controls compiled once into the values instantiate() copies into each row"""
+        if self._prototypes is None:
+            self._prototypes = [self.__compile(control) for control in self.controls]
+        return self._prototypes
+
+    def __compile(self, control):
+        name = control[7]
+        # Frames and buttons that swap views take the display name of the instance
+        renameable = (
+            control[1] == r1.CTRL_FRAME
+            or (
+                control[1] == r1.CTRL_BUTTON
+                and control[21] == r1.CONTROLS_TargetType_View
+            )
+        ) and name not in ("Fallback", "Regular")
+
+        return (
+            control[1],  # Type
+            control[2],  # PosX
+            control[3],  # PosY
+            control[4],  # Width
+            control[5],  # Height
+            name if name is not None else "",
+            renameable,
+            tuple(control[10:22]),
+            control[22],  # TargetId
+            control[23],  # TargetChannel
+            control[24],  # TargetProperty
+            control[25],  # TargetRecord
+            tuple(control[28:32]),
+            control[24] in DEV_PROPS,
+        )
+
+    def instantiate(
+        self,
+        posX,
+        posY,
+        viewId,
+        displayName,
+        joinedId,
+        targetId,
+        targetChannel,
+        width=None,
+        height=None,
+        targetProp=None,
+        targetRec=None,
+    ):
+        """Build Controls rows for one copy of the template
+
+        Arguments left as None keep the value stored in the template.
+
+        Returns:
+            [tuple]: Rows ordered as r1.CONTROLS_COLUMNS
+        """
+        if targetProp is not None:
+            isDevProp = targetProp in DEV_PROPS
+
+        rows = []
+        for (
+            cType,
+            x,
+            y,
+            w,
+            h,
+            name,
+            renameable,
+            middle,
+            tId,
+            tChannel,
+            tProp,
+            tRec,
+            tail,
+            devProp,
+        ) in self.prototypes:
+            if targetProp is not None:
+                tProp, devProp = targetProp, isDevProp
+            if targetChannel is not None:
+                tChannel = targetChannel
+            if devProp and tChannel > -1:
+                tChannel = 0
+
+            rows.append(
+                (
+                    cType,
+                    x + posX,
+                    y + posY,
+                    w if width is None else width,
+                    h if height is None else height,
+                    viewId,
+                    displayName if renameable and displayName is not None else name,
+                    joinedId,
+                    *middle,
+                    tId if targetId is None else targetId,
+                    tChannel,
+                    tProp,
+                    tRec if targetRec is None else targetRec,
+                    None,
+                    None,
+                    *tail,
+                    " ",
+                )
+            )
+        return rows
 
 
 ### Load template file + templates within from .r2t file ###
 # Sections table contains template overview info
 class TemplateFile(r1.sqlDbFile):
-    def __init__(self, f):
+    def __init__(self, f, cachePath=None):
+        """Load all templates from a .r2t file
+
+        Args:
+            f (string): Path to template file
+            cachePath (string, optional): File holding the compiled templates, reused while
+                the template file is unchanged and rewritten when it is stale. Defaults to None.
+        """
         super().__init__(f)  # Inherit from parent class
         self.templates = []
+        self.names = {}  # Name -> Template
+        self.fromCache = False
+
+        fingerprint = None
+        if cachePath is not None:
+            fingerprint = getTemplateFingerprint(f)
+            if self.__loadCache(cachePath, fingerprint):
+                return
+
+        # Bounding box of every template, measured from the template origin
+        sizes = {
+            jId: [max(w, 0), max(h, 0)]
+            for jId, w, h in self.query("templateSizes").fetchall()
+        }
+
+        templates = self.query("templateSections").fetchall()
+
+        log.info(f"Found {len(templates)} templates in file.")
+
+        for temp in templates:
+            template = Template(temp, None, self, sizes.get(temp[3], [0, 0]))
+            self.templates.append(template)
+            self.names.setdefault(template.name, template)
+
+        if cachePath is not None:
+            self.__saveCache(cachePath, fingerprint)
+
+    def getTemplate(self, name):
+        """
+        Args:
+            name (string): Name of template
+
+        Returns:
+            Template: Matching template or None if not found
+        """
+        return self.names.get(name)
 
+    def __loadCache(self, cachePath, fingerprint):
+        """Fill templates from a cache written by __saveCache
+
+        Args:
+            cachePath (string): Path of cache file
+            fingerprint (tuple): Fingerprint of the template file, see getTemplateFingerprint
+
+        Returns:
+            bool: True if the cache matched the template file and was loaded
+        """
+        # The cache may sit in a shared folder, it is only ever read as data and
+        # anything unexpected in it is treated as stale
         try:
-            self.cursor.execute('SELECT * FROM "main"."Sections" ORDER BY JoinedId ASC')
+            with open(cachePath, "r") as f:
+                cache = json.load(f, object_hook=decodeTemplateCacheObject)
+            version = (cache.get("version"), cache.get("fingerprint"))
+            if version != (TEMPLATE_CACHE_VERSION, list(fingerprint)):
+                log.info(f"Template cache {cachePath} is stale.")
+                return False
+
+            templates = [
+                Template(tuple(sections), [tuple(c) for c in controls], self, size)
+                for sections, controls, size in cache["templates"]
+            ]
+            names = {name: templates[idx] for name, idx in cache["names"]}
+        except Exception as e:
+            log.info(f"Could not read template cache {cachePath} - {e}")
+            return False
+
+        self.templates = templates
+        self.names = names
+        self.fromCache = True
+        log.info(f"Loaded {len(self.templates)} templates from {cachePath}.")
+        return True
+
+    def __saveCache(self, cachePath, fingerprint):
+        """Write every template, with its controls loaded, to a cache file
+
+        Args:
+            cachePath (string): Path of cache file
+            fingerprint (tuple): Fingerprint of the template file, see getTemplateFingerprint
+        """
+        index = {id(t): idx for idx, t in enumerate(self.templates)}
+        cache = {
+            "version": TEMPLATE_CACHE_VERSION,
+            "fingerprint": fingerprint,
+            "templates": [(t.sections, t.controls, t.size) for t in self.templates],
+            "names": [[name, index[id(t)]] for name, t in self.names.items()],
+        }
+
+        # Write then rename so a cache is never left half written
+        tmpPath = cachePath + ".tmp"
+        try:
+            with open(tmpPath, "w") as f:
+                json.dump(cache, f, default=encodeTemplateCacheValue)
+            os.replace(tmpPath, cachePath)
+        except OSError as e:
+            log.info(f"Could not write template cache {cachePath} - {e}")
+            return
+        log.info(f"Saved {len(self.templates)} templates to {cachePath}.")
+
+
+def encodeTemplateCacheValue(value):
+    # JSON has no bytes type, blobs are written as tagged hex strings
+    if isinstance(value, bytes):
+        return {"bytes": value.hex()}
+    raise TypeError(f"Cannot cache {type(value).__name__} in a template cache")
+
+
+def decodeTemplateCacheObject(obj):
+    if obj.keys() == {"bytes"}:
+        return bytes.fromhex(obj["bytes"])
+    return obj
+
+
+def getTemplateFingerprint(path):
+    """Identify the exact contents of a template file
+
+    Args:
+        path (string): Path to template file
+
+    Returns:
+        tuple: Size, modification time and SHA-256 of the file
+    """
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return (stat.st_size, stat.st_mtime_ns, digest)
+
+
+class OutputCache:
+    def __init__(self, path, maxBytes, link=False):
+        """Directory of generated projects keyed on everything that determines their contents
+
+        Entries are evicted least recently used first once the directory grows past maxBytes.
+
+        Args:
+            path (string): Cache directory, created if missing
+            maxBytes (int): Size the cache is trimmed to after each store
+            link (bool, optional): Hardlink entries into place instead of copying them.
+                Edits to a linked output also change the cache entry. Defaults to False.
+        """
+        self.path = path
+        self.maxBytes = maxBytes
+        self.link = link
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(path, exist_ok=True)
+
+    def getKey(self, projectPath, templateDigest, options=()):
+        """Fingerprint a project as it would be generated
+
+        Args:
+            projectPath (string): Path of source project
+            templateDigest (string): SHA-256 of the template file, see getTemplateFingerprint
+            options (tuple, optional): Any generation settings that change the output. Defaults to ().
+
+        Returns:
+            string: Hex digest identifying the output
+        """
+        h = hashlib.sha256()
+        h.update(
+            repr(
+                (OUTPUT_CACHE_VERSION, TEMPLATE_CACHE_VERSION, templateDigest, options)
+            ).encode()
+        )
+        with open(projectPath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def getEntryPath(self, key):
+        return os.path.join(self.path, key + OUTPUT_CACHE_SUFFIX)
+
+    def fetch(self, key, dst):
+        """Place a cached output at dst
+
+        Args:
+            key (string): Key from getKey
+            dst (string): Destination path, replaced if it exists
+
+        Returns:
+            bool: True on a hit, False if nothing is cached for key
+        """
+        entry = self.getEntryPath(key)
+        try:
+            # Mark as most recently used
+            os.utime(entry)
+        except OSError:
+            self.stats["misses"] += 1
+            return False
+
+        if os.path.exists(dst):
+            os.remove(dst)
+        if self.link:
+            try:
+                os.link(entry, dst)
+            except OSError:
+                shutil.copyfile(entry, dst)
+        else:
+            shutil.copyfile(entry, dst)
+        self.stats["hits"] += 1
+        log.info(f"Output cache hit {key} -> {dst}")
+        return True
+
+    def store(self, key, src):
+        """Add a generated project to the cache then evict down to maxBytes
+
+        Args:
+            key (string): Key from getKey
+            src (string): Path of generated project
+        """
+        fd, tmpPath = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmpPath)
+            os.replace(tmpPath, self.getEntryPath(key))
         except:
+            os.remove(tmpPath)
             raise
+        self.stats["stores"] += 1
+        log.info(f"Output cache stored {src} as {key}")
+        self.evict()
+
+    def getEntries(self):
+        """
+        Returns:
+            [tuple]: Last use time, size and path of every entry, least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(OUTPUT_CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in maxBytes"""
+        entries = self.getEntries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+            log.info(f"Output cache evicted {path}")
+
+    def getSummary(self):
+        """
+        Returns:
+            string: Counts of hits, misses, stores and evictions plus the current cache size
+        """
+        entries = self.getEntries()
+        size = sum(size for _, size, _ in entries)
+        return (
+            f"{self.stats['hits']} hits, {self.stats['misses']} misses, "
+            f"{self.stats['stores']} stored, {self.stats['evictions']} evicted, "
+            f"{len(entries)} entries using {size / (1 << 20):.1f} MiB"
+        )
 
-        templates = self.cursor.fetchall()
 
-        log.info(f"Found {len(templates)} templates in file.")
+class GroupRoles:
+    def __init__(self, groups):
+        """Classify every group once by the role suffix of its name
+
+        Args:
+            groups (r1.GroupTree): Groups to classify
+        """
+        self.groups = groups
+        self.version = groups.version
+        self.roles = {}  # GroupId -> (SourceGroup name, role)
+        self.bases = {}  # (SourceGroup name, role) -> [GroupId]
+
+        for gId, row in groups.rows.items():
+            name = row[r1.GROUPS_COL_Name]
+            if type(name) is not str:
+                continue
+
+            if name == ROLE_MASTER:
+                base, role = name, ROLE_MASTER
+            else:
+                role = next((r for r in ROLE_SUFFIXES if name.endswith(" " + r)), None)
+                if role is None:
+                    continue
+                base = name[: -len(role) - 1]
+
+            self.roles[gId] = (base, role)
+            self.bases.setdefault((base, role), []).append(gId)
 
-        for idx, temp in enumerate(templates):
-            joinedId = temp[3]
-            self.cursor.execute(
-                f"SELECT * FROM Controls WHERE JoinedId = {joinedId} ORDER BY PosX ASC"
-            )  # Load controls
-            controls = self.cursor.fetchall()
+    def hasRole(self, name, role):
+        """
+        Args:
+            name (string): SourceGroup name
+            role (string): One of the ROLE_ constants
 
-            self.templates.append(Template(temp, controls))
-            log.info(f"Loaded template - {idx} / {self.templates[-1].name}")
+        Returns:
+            bool: True if a group with the given role exists for the SourceGroup
+        """
+        return (name, role) in self.bases
+
+
+def getGroupRoles(proj):
+    """Get the role of every group, re-classifying only if Groups has changed
+
+    Args:
+        proj (r1.ProjectFile): Project file to use
+
+    Returns:
+        GroupRoles: Classified groups
+    """
+    groups = proj.index.getGroups()
+    roles = getattr(proj, "groupRoles", None)
+    if roles is None or roles.groups is not groups or roles.version != groups.version:
+        roles = GroupRoles(groups)
+        proj.groupRoles = roles
+        log.info(f"Classified {len(roles.roles)} groups.")
+    return roles
+
+
+def __writeGroupRoles(proj, roles):
+    proj.query("groupRolesCreate")
+    proj.query("groupRolesIndex")
+    proj.query("groupRolesClear")
+    proj.queryMany(
+        "groupRolesInsert",
+        (
+            (
+                gId,
+                roles.groups.getName(gId),
+                roles.groups.getParentId(gId),
+                role,
+            )
+            for gId, (_, role) in roles.roles.items()
+        ),
+    )
 
 
 def getSrcGroupType(proj, nameOrId):
@@ -79,21 +695,15 @@ def getSrcGroupType(proj, nameOrId):
         int: Four digit value - first digit is SourceGroup Type, second digit is 0 or 1 if L/R group, third digit is if contains a TOPs group, last digit is if contains a SUBs group
     """
     srcGrpType = 0
-    column = ""
+    query = ""
     name = ""
     if type(nameOrId) is str:
-        column = "Name"
+        query = "sourceGroupFromName"
         name = nameOrId
     if type(nameOrId) is int:
-        column = "SourceGroupId"
-        proj.cursor.execute(
-            f'SELECT Name FROM SourceGroups WHERE {column} = "{nameOrId}"'
-        )
-        name = proj.cursor.fetchone()[0]
-    proj.cursor.execute(
-        f'SELECT * FROM SourceGroups WHERE {column} = "{nameOrId}" ORDER BY NextSourceGroupId DESC'
-    )
-    source = proj.cursor.fetchone()
+        query = "sourceGroupFromId"
+        name = proj.getSourceGroupNameFromId(nameOrId)
+    source = proj.query(query, (nameOrId,)).fetchone()
     if source is not None:
         # SourceGroup Type
         srcGrpType += source[r1.SOURCEGROUPS_COL_Type] * 1000
@@ -102,20 +712,16 @@ def getSrcGroupType(proj, nameOrId):
         if source[r1.SOURCEGROUPS_COL_NextSourceGroupId] != 0:
             srcGrpType += 100
         # SUB array L/R/C
-        elif (
-            source[r1.SOURCEGROUPS_COL_Type] is r1.SOURCEGROUPS_TYPE_SUBarray
-            and hasSubGroups(proj) > 1
-        ):
-            srcGrpType += 100 * (hasSubGroups(proj) - 1)
+        elif source[r1.SOURCEGROUPS_COL_Type] is r1.SOURCEGROUPS_TYPE_SUBarray:
+            subGroupCount = hasSubGroups(proj)
+            if subGroupCount > 1:
+                srcGrpType += 100 * (subGroupCount - 1)
 
-    proj.cursor.execute(
-        f'SELECT Name FROM Groups WHERE Name LIKE "{name + " SUBs"}" OR Name LIKE "{name + " TOPs"}"'
-    )
-    groups = proj.cursor.fetchall()
-    if groups is not None and any("TOPs" in group[0] for group in groups):
+    roles = getGroupRoles(proj)
+    if roles.hasRole(name, ROLE_TOPS):
         srcGrpType += 10
 
-    if groups is not None and any("SUBs" in group[0] for group in groups):
+    if roles.hasRole(name, ROLE_SUBS):
         srcGrpType += 1
 
     return srcGrpType
@@ -196,23 +802,29 @@ class Channel:
         log.info(f"Created channel - {self.name}")
 
 
-def createNavButtons(proj, templates):
+def createNavButtons(proj, templates, skipViewIds=()):
     """Insert navigation buttons into default views
 
     Args:
         proj (r1.ProjectFile): Project to insert views into
         templates (TemplateFile): Template file to pull Nav Button template from
+        skipViewIds (iterable, optional): Views that already have a button. Defaults to ().
     """
-    proj.cursor.execute(f'SELECT ViewId FROM Views WHERE Type = "{1000}"')
+    writer = proj.getControlSink()
+    # Views AutoR1 created, including every meter and master page
+    autoViewIds = set(proj.created["Views"]) | set(skipViewIds)
 
-    for vId in (
+    viewIds = [
         row
-        for row, in proj.cursor.fetchall()
-        if row != proj.masterViewId and row != proj.meterViewId
-    ):
-        proj.cursor.execute(
-            f"UPDATE Controls SET PosY = PosY + {NAV_BUTTON_Y+20} WHERE ViewId = {vId}"
-        )
+        for row, in proj.query("viewIdsFromType", (1000,)).fetchall()
+        if row not in autoViewIds
+    ]
+    proj.queryMany(
+        "controlShiftViewBatch",
+        ((NAV_BUTTON_Y + 20,) + batch for batch in r1.idBatches(viewIds)),
+    )
+    for vId in viewIds:
+        proj.created.setdefault(MANIFEST_KIND_NAV_VIEWS, []).append(vId)
         __insertTemplate(
             proj,
             templates,
@@ -221,9 +833,9 @@ def createNavButtons(proj, templates):
             NAV_BUTTON_Y,
             vId,
             MASTER_WINDOW_TITLE,
-            proj.meterViewId + 1,
+            proj.masterViewId,
             -1,
-            proj.cursor,
+            writer,
             None,
             None,
             None,
@@ -231,6 +843,8 @@ def createNavButtons(proj, templates):
             None,
         )
 
+    writer.flush()
+
 
 def removeNavButtons(proj, masterViewId):
     """Remove navigation buttons from default views
@@ -239,76 +853,217 @@ def removeNavButtons(proj, masterViewId):
         proj (r1.ProjectFile): Project to remove views from
         masterViewId (int): ViewID of master view
     """
-    proj.cursor.execute(
-        f'SELECT ViewId FROM Controls WHERE "TargetId" = "{masterViewId}" AND "TargetChannel" = -1'
+    proj.query(
+        "navButtonShiftViews",
+        (-(NAV_BUTTON_Y + 20), masterViewId, proj.masterViewId, proj.meterViewId),
     )
+    proj.query("navButtonDelete", (masterViewId,))
+    log.info(f"Deleted {MASTER_WINDOW_TITLE} nav buttons.")
+
+
+def getAutoViews(proj):
+    """Find AutoR1 views by title, including numbered meter and master pages
+
+    Args:
+        proj (r1.ProjectFile): Project to search
+
+    Returns:
+        dict: ViewId to title of each view found
+    """
+    views = {}
+    for name, viewId in proj.index.getViews().items():
+        if type(name) is not str:
+            continue
+        for title in [METER_WINDOW_TITLE, MASTER_WINDOW_TITLE]:
+            page = name[len(title) + 1 :]
+            if name == title or (name.startswith(title + " ") and page.isdigit()):
+                views[viewId] = name
+    return views
 
-    for vId in (
-        row
-        for row, in proj.cursor.fetchall()
-        if row != proj.masterViewId and row != proj.meterViewId
-    ):
-        proj.cursor.execute(
-            f"UPDATE Controls SET PosY = PosY - {NAV_BUTTON_Y+20} WHERE ViewId = {vId}"
-        )
 
-    proj.cursor.execute(
-        f'DELETE FROM Controls WHERE "TargetId" = "{masterViewId}" AND "TargetChannel" = -1'
+def saveManifest(proj):
+    """Record the ids of all groups, views and controls inserted into a project
+
+    The manifest replaces any previous one and is read back by clean().
+
+    Args:
+        proj (r1.ProjectFile): Project AutoR1 has finished generating
+    """
+    proj.query("manifestCreate")
+    proj.query("manifestClear")
+    proj.queryMany(
+        "manifestInsert",
+        ((kind, id) for kind, ids in proj.created.items() for id in ids),
     )
-    log.info(f"Deleted {MASTER_WINDOW_TITLE} nav buttons.")
+    proj.query("viewUnitsCreate")
+    proj.query("viewUnitsClear")
+    proj.queryMany(
+        "viewUnitsInsert",
+        (
+            (viewId, unit, fingerprint, posX, jId)
+            for viewId, unit, fingerprint, posX, jIds in proj.viewUnits
+            for jId in jIds
+        ),
+    )
+    log.info(f"Saved {MANIFEST_TABLE} and {VIEW_UNITS_TABLE}.")
 
 
-def clean(proj):
-    """Removes all AutoR1 groups, views and controls
+def loadManifest(proj):
+    """Read the ids recorded by saveManifest
 
     Args:
-        proj (r1.ProjectFile): Project file to clean
-        masterViewId (int): ID of master view created by AutoR1
-        meterViewId (int): ID of meter view created by AutoR1
+        proj (r1.ProjectFile): Project to read
 
+    Returns:
+        dict: Kind to list of ids, None if the project has no manifest
     """
-    log.info("Cleaning R1 project.")
+    if proj.query("tableExists", (MANIFEST_TABLE,)).fetchone() is None:
+        return None
+    manifest = {}
+    for kind, id in proj.query("manifestAll").fetchall():
+        manifest.setdefault(kind, []).append(id)
+    if not len(manifest):
+        return None
+    return manifest
 
-    try:
-        masterViewId = proj.getViewIdFromName(MASTER_WINDOW_TITLE)
 
-        proj.cursor.execute(f'DELETE FROM Controls WHERE "ViewId" = "{masterViewId}"')
-        log.info(f"Deleted {MASTER_WINDOW_TITLE} controls.")
+def loadViewUnits(proj):
+    """Read the view units recorded by saveManifest
 
-        proj.cursor.execute(f'DELETE FROM Views WHERE "Name" = "{MASTER_WINDOW_TITLE}"')
-        log.info(f"Deleted {MASTER_WINDOW_TITLE} view.")
+    Args:
+        proj (r1.ProjectFile): Project to read
 
-        removeNavButtons(proj, masterViewId)
-    except:
-        pass
+    Returns:
+        dict: ViewId to {unit: (fingerprint, PosX, [JoinedId])}, None if the project has none
+    """
+    if proj.query("tableExists", (VIEW_UNITS_TABLE,)).fetchone() is None:
+        return None
+    views = {}
+    for viewId, unit, fingerprint, posX, jId in proj.query("viewUnitsAll").fetchall():
+        units = views.setdefault(viewId, {})
+        units.setdefault(unit, (fingerprint, posX, []))[2].append(jId)
+    if not len(views):
+        return None
+    return views
 
-    try:
-        meterViewId = proj.getViewIdFromName(METER_WINDOW_TITLE)
-        proj.cursor.execute(f'DELETE FROM Controls WHERE "ViewId" = "{meterViewId}"')
-        log.info(f"Deleted {METER_WINDOW_TITLE} view controls.")
-        proj.cursor.execute(f'DELETE FROM Views WHERE "Name" = "{METER_WINDOW_TITLE}"')
-        log.info(f"Deleted {METER_WINDOW_TITLE} view.")
-    except:
-        pass
 
-    proj.cursor.execute(f"SELECT Name FROM SourceGroups WHERE Type = 3")
-    rtn = proj.cursor.fetchone()
+def __clearManifest(proj):
+    proj.query("manifestClear")
+    proj.query("viewUnitsCreate")
+    proj.query("viewUnitsClear")
+
+
+def __manifestIsComplete(proj, manifest):
+    """Check a manifest covers everything clean() would otherwise find by name
+
+    Args:
+        proj (r1.ProjectFile): Project to check
+        manifest (dict): Manifest from loadManifest
+
+    Returns:
+        bool: True if removing the recorded ids leaves no AutoR1 items behind
+    """
+    views = set(manifest.get("Views", []))
+    autoViews = getAutoViews(proj)
+    for viewId in autoViews:
+        if viewId not in views:
+            return False
+
+    # Recorded controls outside the recorded views must be nav buttons, anything
+    # else has been reused by R1 for a control AutoR1 did not create
+    masterViewIds = {
+        viewId
+        for viewId, name in autoViews.items()
+        if viewId in views and name.startswith(MASTER_WINDOW_TITLE)
+    }
+    navViews = set(manifest.get(MANIFEST_KIND_NAV_VIEWS, []))
+    for viewId, targetId, targetChannel in proj.query(
+        "manifestControlsOutsideViews"
+    ).fetchall():
+        if (
+            viewId not in navViews
+            or targetId not in masterViewIds
+            or targetChannel != -1
+        ):
+            return False
+
+    groups = proj.index.getGroups()
+    groupIds = set(manifest.get("Groups", []))
+    for gId in groups.getIdsFromName(PARENT_GROUP_TITLE):
+        if gId not in groupIds:
+            return False
+    # Groups added under AutoR1 groups after generation would be orphaned
+    for gId in groupIds:
+        for child in groups.getChildIds(gId):
+            if child not in groupIds:
+                return False
+    return True
+
+
+def __cleanFromManifest(proj, manifest):
+    """Remove everything recorded in a manifest with set-based statements
+
+    Args:
+        proj (r1.ProjectFile): Project file to clean
+        manifest (dict): Manifest from loadManifest
+    """
+    proj.queryMany(
+        "controlShiftViewBatch",
+        (
+            (-(NAV_BUTTON_Y + 20),) + batch
+            for batch in r1.idBatches(manifest.get(MANIFEST_KIND_NAV_VIEWS, []))
+        ),
+    )
+    proj.deleteControls(manifest.get("Controls", []))
+    proj.deleteViews(manifest.get("Views", []))
+    log.info(
+        f"Deleted {MASTER_WINDOW_TITLE} and {METER_WINDOW_TITLE} views and controls."
+    )
+    proj.deleteGroups(manifest.get("Groups", []))
+
+
+def clean(proj):
+    """Removes all AutoR1 groups, views and controls
+
+    Items recorded in the project's manifest are deleted by id. Projects without
+    a manifest, or where it no longer covers every AutoR1 item, are cleaned by name.
+
+    Args:
+        proj (r1.ProjectFile): Project file to clean
+    """
+    log.info("Cleaning R1 project.")
+
+    manifest = loadManifest(proj)
+    if manifest is not None and __manifestIsComplete(proj, manifest):
+        __cleanFromManifest(proj, manifest)
+        __clearManifest(proj)
+        log.info(f"Deleted {PARENT_GROUP_TITLE} group.")
+        return
+    elif manifest is not None:
+        log.info(f"{MANIFEST_TABLE} is out of date, cleaning by name.")
+        __clearManifest(proj)
+
+    autoViews = getAutoViews(proj)
+    for viewId, name in autoViews.items():
+        proj.deleteView(viewId)
+        log.info(f"Deleted {name} view and controls.")
+
+    for viewId, name in autoViews.items():
+        if name.startswith(MASTER_WINDOW_TITLE):
+            removeNavButtons(proj, viewId)
+
+    rtn = proj.query("sourceGroupNameFromType", (r1.SRC_TYPE_SUBARRAY,)).fetchone()
     if rtn is not None:
         subArrayName = rtn[0]
-        proj.cursor.execute(
-            f'  SELECT GroupId FROM Groups WHERE Name = "{subArrayName}" AND ParentId = {proj.pId}'
-        )
-        pId = proj.cursor.fetchone()
+        pId = proj.getGroupIdFromNameAndParent(subArrayName, proj.pId)
         if pId is not None:
-            proj.deleteGroup(pId[0])
+            proj.deleteGroup(pId)
 
-    proj.cursor.execute(
-        f'SELECT GroupId FROM Groups WHERE Name = "{PARENT_GROUP_TITLE}"'
-    )
-    group = proj.cursor.fetchone()
-    if group is not None:
-        pId = group[0]
+    try:
+        pId = proj.getGroupIdFromName(PARENT_GROUP_TITLE)[0]
         proj.deleteGroup(pId)
+    except RuntimeError:
+        pass
     log.info(f"Deleted {PARENT_GROUP_TITLE} group.")
 
 
@@ -324,13 +1079,12 @@ def configureApChannels(proj):
             apGroup += chGrp.channels
 
     if len(apGroup) > 0:
-        proj.createGrp(AP_GROUP_TITLE, proj.pId)
-        proj.apGroupId = proj.getHighestGroupID()
-        for ch in apGroup:
-            proj.cursor.execute(
-                f"  INSERT INTO Groups (Name, ParentId, TargetId, TargetChannel, Type, Flags) "
-                f'  SELECT "{ch.name}", {proj.apGroupId}, {ch.targetId}, {ch.targetChannel}, 1, 0'
-            )
+        rows = [(AP_GROUP_TITLE, proj.pId, 0, -1, 0, 0)]
+        rows += [
+            (ch.name, r1.GroupRef(0), ch.targetId, ch.targetChannel, 1, 0)
+            for ch in apGroup
+        ]
+        proj.apGroupId = proj.createGroups(rows)[0]
 
 
 def __insertTemplate(
@@ -343,7 +1097,7 @@ def __insertTemplate(
     displayName,
     targetId,
     targetChannel,
-    cursor,
+    writer,
     width=None,
     height=None,
     joinedId=None,
@@ -356,161 +1110,413 @@ def __insertTemplate(
         jId = proj.jId
         proj.jId = proj.jId + 1
 
-    tempContents = __getTempControlsFromName(templates, tempName)
+    template = templates.getTemplate(tempName)
+    if template is None:
+        raise RuntimeError(f"{tempName} template not found.")
 
-    for control in tempContents:
-        tProp = targetProp
-        tRec = targetRec
-        tChannel = targetChannel
-        tId = targetId
-        w = width
-        h = height
-        dName = control[7]
-        tType = control[21]
+    writer.extend(
+        template.instantiate(
+            posX,
+            posY,
+            viewId,
+            displayName,
+            jId,
+            targetId,
+            targetChannel,
+            width,
+            height,
+            targetProp,
+            targetRec,
+        )
+    )
 
-        if tId is None:
-            tId = control[22]
+    return list(template.size)
 
-        if tChannel is None:
-            tChannel = control[23]
 
-        if w is None:
-            w = control[4]
+##### View layout #####
+# Views are planned in memory first, emitViewPlan then writes a plan into a project
 
-        if height is None:
-            h = control[5]
 
-        # If item is a Frame or a button to swap views
-        if (control[1] == 12) or (control[1] == 4 and tType == 5):
-            if (
-                (displayName is not None)
-                and (dName != "Fallback")
-                and (dName != "Regular")
-            ):
-                dName = displayName
+class ViewRef:
+    def __init__(self, offset=0):
+        """Target a view relative to the one a plan is emitted as
 
-        if dName is None:
-            dName = ""
+        Args:
+            offset (int, optional): Added to the ViewId of the emitted view. Defaults to 0.
+        """
+        self.offset = offset
 
-        if tProp is None:
-            tProp = control[24]
-        if tRec is None:
-            tRec = control[25]
 
-        for p in r1.DEV_PROP_TYPES:
-            if tProp == p:
-                if tChannel > -1:
-                    tChannel = 0  # Dante + digital info require channel ID to be 0
-                    break
+class Placement:
+    def __init__(
+        self,
+        template,
+        posX,
+        posY,
+        displayName,
+        joinedId,
+        targetId,
+        targetChannel,
+        width=None,
+        height=None,
+        targetProp=None,
+        targetRec=None,
+    ):
+        """A template instance within a ViewPlan, see Template.instantiate for arguments
+
+        targetId may be a ViewRef, joinedId is relative to the start of the plan.
+        """
+        self.template = template
+        self.posX = posX
+        self.posY = posY
+        self.displayName = displayName
+        self.joinedId = joinedId
+        self.targetId = targetId
+        self.targetChannel = targetChannel
+        self.width = width
+        self.height = height
+        self.targetProp = targetProp
+        self.targetRec = targetRec
+
+
+class ViewPlan:
+    def __init__(self, name, templates):
+        """Dimensions and contents of a view, held in memory until emitted
+
+        Args:
+            name (string): Title of view
+            templates (TemplateFile): Templates placed in the view
+        """
+        self.name = name
+        self.templates = templates
+        self.hRes = 0
+        self.vRes = 0
+        # Placements and (joinedId, row) tuples in the order they are written
+        self.items = []
+        # JoinedIds are numbered from 0 and offset when emitted
+        self.joinedIds = 0
+        self.groupJoinedIds = []
+        # Source group name -> JoinedIds of its columns or strips, see ViewFingerprint
+        self.units = {}
+
+    def getTemplate(self, name):
+        template = self.templates.getTemplate(name)
+        if template is None:
+            raise RuntimeError(f"{name} template not found.")
+        return template
+
+    def getSize(self, name):
+        return list(self.getTemplate(name).size)
+
+    def getControls(self, name):
+        return self.getTemplate(name).controls
+
+    def newJoinedId(self):
+        jId = self.joinedIds
+        self.joinedIds += 1
+        return jId
+
+    def place(
+        self,
+        templateName,
+        posX,
+        posY,
+        displayName=None,
+        targetId=None,
+        targetChannel=None,
+        joinedId=None,
+        width=None,
+        height=None,
+        targetProp=None,
+        targetRec=None,
+    ):
+        """Add a template instance to the view
+
+        Args:
+            templateName (string): Name of template
+            posX (int): X position of template origin
+            posY (int): Y position of template origin
+            joinedId (int, optional): JoinedId shared with other items, a new one is used if None. Defaults to None.
+
+        Returns:
+            [int]: Width and height of the template
+        """
+        template = self.getTemplate(templateName)
+        if joinedId is None:
+            joinedId = self.newJoinedId()
+        self.items.append(
+            Placement(
+                template,
+                posX,
+                posY,
+                displayName,
+                joinedId,
+                targetId,
+                targetChannel,
+                width,
+                height,
+                targetProp,
+                targetRec,
+            )
+        )
+        return list(template.size)
+
+    def addUnit(self, unit, joinedId):
+        """Mark every item with a JoinedId as part of a source group's unit
+
+        Args:
+            unit (string): SourceGroup name
+            joinedId (int): JoinedId relative to the start of the plan
+        """
+        self.units.setdefault(unit, []).append(joinedId)
+
+    def addRow(self, joinedId, row):
+        """Add a prepared control, its ViewId and JoinedId are filled in when emitted
+
+        Args:
+            joinedId (int): JoinedId relative to the start of the plan
+            row (tuple): Values ordered as r1.CONTROLS_COLUMNS
+        """
+        self.items.append((joinedId, row))
+
+
+def iterViewPlanRows(plan, viewId, joinedIdBase, tracer=r1.NullTracer()):
+    """Generate the Controls rows of a plan emitted as a given view
 
-        proj.cursor.execute(
-            f'INSERT INTO Controls ("Type", "PosX", "PosY", "Width", "Height", "ViewId", "DisplayName", "JoinedId", "LimitMin", "LimitMax", "MainColor", "SubColor", "LabelColor", "LabelFont", "LabelAlignment", "LineThickness", "ThresholdValue", "Flags", "ActionType", "TargetType", "TargetId", "TargetChannel", "TargetProperty", "TargetRecord", "ConfirmOnMsg", "ConfirmOffMsg", "PictureIdDay", "PictureIdNight", "Font", "Alignment", "Dimension") VALUES ("{str(control[1])}", "{str(control[2]+posX)}", "{str(control[3]+posY)}", "{str(w)}", "{str(h)}", "{str(viewId)}", "{dName}", "{str(jId)}", "{str(control[10])}", "{str(control[11])}", "{str(control[12])}", "{str(control[13])}", "{str(control[14])}", "{str(control[15])}", "{str(control[16])}", "{str(control[17])}", "{str(control[18])}", "{str(control[19])}", "{str(control[20])}", "{str(control[21])}", "{str(tId)}", "{str(tChannel)}", "{str(tProp)}", {tRec}, NULL, NULL, "{str(control[28])}", "{str(control[29])}", "{str(control[30])}", "{str(control[31])}", " ")'
+    Args:
+        plan (ViewPlan): Layout to generate
+        viewId (int): ViewId of the emitted view
+        joinedIdBase (int): JoinedId the plan's JoinedIds are offset by
+        tracer (r1.NullTracer, optional): Records a span for each template placed. Defaults to r1.NullTracer().
+
+    Yields:
+        tuple: Rows ordered as r1.CONTROLS_COLUMNS
+    """
+    for item in plan.items:
+        if isinstance(item, Placement):
+            targetId = item.targetId
+            if isinstance(targetId, ViewRef):
+                targetId = viewId + targetId.offset
+            with tracer.span(
+                item.template.name, "template", target=item.displayName
+            ) as span:
+                rows = item.template.instantiate(
+                    item.posX,
+                    item.posY,
+                    viewId,
+                    item.displayName,
+                    joinedIdBase + item.joinedId,
+                    targetId,
+                    item.targetChannel,
+                    item.width,
+                    item.height,
+                    item.targetProp,
+                    item.targetRec,
+                )
+                span["rows"] = len(rows)
+            yield from rows
+        else:
+            jId, row = item
+            yield row[:5] + (viewId, row[6], joinedIdBase + jId) + row[8:]
+
+
+class ViewFingerprint:
+    def __init__(self, plan, joinedIdBase):
+        """Fingerprint each unit of a view as its rows are generated
+
+        A fingerprint covers every value of a unit's rows except the ViewId, with
+        PosX taken relative to the unit's first row and JoinedIds numbered in order
+        of use, so it only changes when the unit itself would be generated differently.
+
+        Args:
+            plan (ViewPlan): Layout being generated
+            joinedIdBase (int): JoinedId the plan's JoinedIds are offset by
+        """
+        self.owners = {
+            joinedIdBase + jId: unit
+            for unit, jIds in plan.units.items()
+            for jId in jIds
+        }
+        self.units = {}  # unit -> [hash, PosX, [JoinedId]]
+
+    def getUnit(self, row):
+        return self.owners.get(row[7], UNIT_HEADER)
+
+    def add(self, row):
+        unit = self.getUnit(row)
+        entry = self.units.get(unit)
+        if entry is None:
+            entry = self.units[unit] = [hashlib.sha256(), row[1], []]
+        h, posX, jIds = entry
+        if row[7] not in jIds:
+            jIds.append(row[7])
+        # Columns 5 and 7 are ViewId and JoinedId
+        h.update(
+            repr(
+                (row[0], row[1] - posX)
+                + row[2:5]
+                + (row[6], jIds.index(row[7]))
+                + row[8:]
+            ).encode()
         )
 
-    return __getTempSize(templates, tempName)
+    def track(self, rows):
+        """Fingerprint rows while passing them on
 
+        Args:
+            rows (iterable): Rows from iterViewPlanRows
 
-def __getTempControlsFromName(templates, tempName):
-    for t in templates.templates:
-        if t.name == tempName:
-            return t.controls
-    return -1
+        Yields:
+            tuple: Each row unchanged
+        """
+        for row in rows:
+            self.add(row)
+            yield row
 
+    def getUnits(self):
+        """
+        Returns:
+            dict: Unit to (fingerprint, PosX of first row, [JoinedId])
+        """
+        return {
+            unit: (h.hexdigest(), posX, jIds)
+            for unit, (h, posX, jIds) in self.units.items()
+        }
 
-def __getTempSize(templates, tempName):
-    templates.cursor.execute(
-        f'SELECT JoinedId FROM "main"."Sections" WHERE Name = "{tempName}"'
-    )
-    rtn = templates.cursor.fetchone()
-    if rtn is not None:
-        jId = rtn[0]
-    else:
-        log.info(f"{tempName} template not found.")
-        return -1
 
-    templates.cursor.execute(
-        f"SELECT PosX, PosY, Width, Height FROM Controls WHERE JoinedId = {jId}"
-    )
-    rtn = templates.cursor.fetchall()
-    if rtn is not None:
-        maxWidth, maxHeight = 0, 0
-        for row in rtn:
-            PosX, PosY, Width, Height = row
-            if PosX + Width > maxWidth:
-                maxWidth = PosX + Width
-            if PosY + Height > maxHeight:
-                maxHeight = PosY + Height
-        return [maxWidth, maxHeight]
-    else:
-        log.info(f"{tempName} template controls not found.")
-        return -1
+def emitViewPlan(proj, plan, writer):
+    """Create the view described by a plan and stream its controls into a sink
 
+    The fingerprint of each unit is added to proj.viewUnits.
 
-def createMeterView(proj, templates):
-    # Get width + height of title to offset starting x + y
-    _, titleH = __getTempSize(templates, "Meters Title")
-    meterGrpW, meterGrpH = __getTempSize(templates, "Meters Group")
-    meterW, meterH = __getTempSize(templates, "Meter")
+    Args:
+        proj (r1.ProjectFile): Project to create the view in
+        plan (ViewPlan): Layout to write
+        writer (r1.ControlSink): Sink controls are passed to
 
-    proj.meterJoinedIDs = []
+    Returns:
+        int: ViewId of the new view
+    """
+    with proj.span("emitViewPlan", view=plan.name, items=len(plan.items)):
+        viewId = proj.createView(plan.name, plan.hRes, plan.vRes)
+        base = proj.jId
+        fingerprint = ViewFingerprint(plan, base)
+        writer.extend(
+            fingerprint.track(iterViewPlanRows(plan, viewId, base, proj.tracer))
+        )
+    proj.jId = base + plan.joinedIds
+    proj.viewUnits += [
+        (viewId, unit) + entry for unit, entry in fingerprint.getUnits().items()
+    ]
+    return viewId
+
+
+class ViewBudget:
+    def __init__(self, maxControls=VIEW_MAX_CONTROLS, maxWidth=VIEW_MAX_WIDTH):
+        """Limits a generated view is kept within, layouts that exceed them are paginated
+
+        Args:
+            maxControls (int, optional): Most controls placed in one view. Defaults to VIEW_MAX_CONTROLS.
+            maxWidth (int, optional): Widest HRes of one view. Defaults to VIEW_MAX_WIDTH.
+        """
+        self.maxControls = maxControls
+        self.maxWidth = maxWidth
+
+
+def getPageTitle(title, page, pages):
+    """
+    Args:
+        title (string): Title of the unpaginated view
+        page (int): Page index, from 0
+        pages (int): Number of pages
+
+    Returns:
+        string: Title of the page, numbered from 1 when there is more than one page
+    """
+    if pages == 1:
+        return title
+    return f"{title} {page + 1}"
+
+
+def __paginate(costs, width, budget, fixedControls, fixedWidth):
+    """Split items into pages that fit a budget, every page holds at least one item
+
+    Args:
+        costs ([int]): Number of controls of each item
+        width (int): Width taken by each item
+        budget (ViewBudget): Limits of each page
+        fixedControls (int): Controls on every page regardless of items
+        fixedWidth (int): Width of every page regardless of items
+
+    Returns:
+        [[int]]: Indexes of the items on each page
+    """
+    pages = [[]]
+    controls = fixedControls
+    for idx, cost in enumerate(costs):
+        page = pages[-1]
+        if len(page) and (
+            controls + cost > budget.maxControls
+            or fixedWidth + (width * (len(page) + 1)) > budget.maxWidth
+        ):
+            page = []
+            pages.append(page)
+            controls = fixedControls
+        page.append(idx)
+        controls += cost
+    return pages
+
+
+def __placePageNavButtons(plan, title, page, pages, posY):
+    """Add buttons to the previous and next page beside a view's first nav button
+
+    Args:
+        plan (ViewPlan): Page to add buttons to
+        title (string): Title of the unpaginated view
+        page (int): Page index, from 0
+        pages (int): Number of pages
+        posY (int): Y position of the nav buttons
+    """
+    navW, _ = plan.getSize("Nav Button")
+    for slot, target in enumerate([page - 1, page + 1]):
+        if 0 <= target < pages:
+            plan.place(
+                "Nav Button",
+                NAV_BUTTON_X + ((navW + METER_SPACING_X) * (slot + 1)),
+                posY,
+                getPageTitle(title, target, pages),
+                ViewRef(target - page),
+                -1,
+            )
+
+
+def planMeterViews(proj, templates, budget=None):
+    """Lay out the meter view without touching the project
+
+    Args:
+        proj (r1.ProjectFile): Project with SourceGroups discovered
+        templates (TemplateFile): Templates to place
+        budget (ViewBudget, optional): Limits of each page. Defaults to VIEW_MAX_CONTROLS and VIEW_MAX_WIDTH.
+
+    Returns:
+        [ViewPlan]: One plan per page, groupJoinedIds holds each column's meter JoinedId
+    """
+    if budget is None:
+        budget = ViewBudget()
+
+    # Get width + height of title to offset starting x + y
+    _, titleH = templates.getTemplate("Meters Title").size
+    meterGrpW, meterGrpH = templates.getTemplate("Meters Group").size
+    meterW, meterH = templates.getTemplate("Meter").size
 
     # Get height of metering frame to get x and y spacing for each meter
     spacingX = max(meterW, meterGrpW) + METER_SPACING_X
     spacingY = meterH + METER_SPACING_Y
 
-    ####### CREATE VIEW #######
-    HRes = (spacingX * getChannelMeterGroupTotal(proj)[0]) + METER_SPACING_X
-    VRes = titleH + meterGrpH + (spacingY * getChannelMeterGroupTotal(proj)[1]) + 100
-    proj.cursor.execute(
-        f'INSERT INTO Views("Type","Name","Icon","Flags","HomeViewIndex","NaviBarIndex","HRes","VRes","ZoomLevel","ScalingFactor","ScalingPosX","ScalingPosY","ReferenceVenueObjectId") VALUES (1000,"{METER_WINDOW_TITLE}",NULL,4,NULL,-1,{HRes},{VRes},100,NULL,NULL,NULL,NULL);'
-    )
-    proj.cursor.execute(f"SELECT max(ViewId) FROM Views")
-    rtn = proj.cursor.fetchone()
-    if rtn is not None:
-        proj.meterViewId = rtn[0]
-
-    ###### INSERT HEADER ######
-    posX = METER_VIEW_STARTX
-    posY = METER_VIEW_STARTY
-    __insertTemplate(
-        proj,
-        templates,
-        "Nav Button",
-        NAV_BUTTON_X,
-        posY + NAV_BUTTON_Y,
-        proj.meterViewId,
-        MASTER_WINDOW_TITLE,
-        proj.meterViewId + 1,
-        -1,
-        proj.cursor,
-        None,
-        None,
-        None,
-        None,
-        None,
-    )
-    posY += (
-        __insertTemplate(
-            proj,
-            templates,
-            "Meters Title",
-            posX,
-            posY,
-            proj.meterViewId,
-            None,
-            None,
-            None,
-            proj.cursor,
-            None,
-            None,
-            None,
-            None,
-            None,
-        )[1]
-        + METER_SPACING_Y
-    )
-    startY = posY
+    groupTotal, channelTotal = getChannelMeterGroupTotal(proj)
 
+    columns = []
+    columnUnits = []
     for srcGrp in proj.sourceGroups:
         for idx, chGrp in enumerate(srcGrp.channelGroups):
             # Skip TOPs and SUBs group if L/R groups are present
@@ -522,50 +1528,105 @@ def createMeterView(proj, templates):
                 and (idx == 0 or idx == 3)
             ):
                 continue
+            columns.append(chGrp)
+            columnUnits.append(srcGrp.name)
 
-            dim = __insertTemplate(
-                proj,
-                templates,
-                "Meters Group",
-                posX,
-                posY,
-                proj.meterViewId,
-                chGrp.name,
-                chGrp.groupId,
-                None,
-                proj.cursor,
-                None,
-                None,
-                None,
-                None,
-                None,
-            )
-            posY += dim[1] + 10
+    groupControls = len(templates.getTemplate("Meters Group").controls)
+    meterControls = len(templates.getTemplate("Meter").controls)
+    headerControls = (3 * len(templates.getTemplate("Nav Button").controls)) + len(
+        templates.getTemplate("Meters Title").controls
+    )
+    pages = __paginate(
+        [groupControls + (meterControls * len(c.channels)) for c in columns],
+        spacingX,
+        budget,
+        headerControls,
+        METER_SPACING_X,
+    )
 
-            for ch in chGrp.channels:
-                __insertTemplate(
-                    proj,
-                    templates,
-                    "Meter",
+    plans = []
+    for page, pageColumns in enumerate(pages):
+        plan = ViewPlan(getPageTitle(METER_WINDOW_TITLE, page, len(pages)), templates)
+        if len(pages) == 1:
+            plan.hRes = (spacingX * groupTotal) + METER_SPACING_X
+        else:
+            plan.hRes = (spacingX * len(pageColumns)) + METER_SPACING_X
+        plan.vRes = titleH + meterGrpH + (spacingY * channelTotal) + 100
+
+        ###### HEADER ######
+        startY = METER_VIEW_STARTY
+        # Master view is created straight after the meter pages
+        plan.place(
+            "Nav Button",
+            NAV_BUTTON_X,
+            startY + NAV_BUTTON_Y,
+            MASTER_WINDOW_TITLE,
+            ViewRef(len(pages) - page),
+            -1,
+        )
+        __placePageNavButtons(
+            plan, METER_WINDOW_TITLE, page, len(pages), startY + NAV_BUTTON_Y
+        )
+        startY += (
+            plan.place("Meters Title", METER_VIEW_STARTX, startY)[1] + METER_SPACING_Y
+        )
+
+        ###### METER GRID ######
+        # Every column and row position is computed up front from the grid spacing
+        colX = [METER_VIEW_STARTX + (spacingX * col) for col in range(len(pageColumns))]
+        rowY = [
+            startY + meterGrpH + 10 + (spacingY * row)
+            for row in range(max([len(columns[c].channels) for c in pageColumns] + [0]))
+        ]
+
+        for col, posX in zip(pageColumns, colX):
+            chGrp = columns[col]
+            with proj.tracer.span(
+                chGrp.name,
+                "sourceGroup",
+                sourceGroup=columnUnits[col],
+                meters=len(chGrp.channels),
+            ):
+                groupJoinedId = plan.newJoinedId()
+                plan.place(
+                    "Meters Group",
                     posX,
-                    posY,
-                    proj.meterViewId,
-                    ch.name,
-                    ch.targetId,
-                    ch.targetChannel,
-                    proj.cursor,
-                    None,
-                    None,
-                    proj.jId,
-                    None,
-                    None,
+                    startY,
+                    chGrp.name,
+                    chGrp.groupId,
+                    joinedId=groupJoinedId,
                 )
-                posY += spacingY
 
-            posX += spacingX
-            posY = startY
-            proj.meterJoinedIDs.append(proj.jId)
-            proj.jId = proj.jId + 1
+                meterJoinedId = plan.newJoinedId()
+                plan.addUnit(columnUnits[col], groupJoinedId)
+                plan.addUnit(columnUnits[col], meterJoinedId)
+                for ch, posY in zip(chGrp.channels, rowY):
+                    plan.place(
+                        "Meter",
+                        posX,
+                        posY,
+                        ch.name,
+                        ch.targetId,
+                        ch.targetChannel,
+                        joinedId=meterJoinedId,
+                    )
+                plan.groupJoinedIds.append(meterJoinedId)
+
+        plans.append(plan)
+
+    return plans
+
+
+def createMeterView(proj, templates, budget=None):
+    writer = proj.getControlSink()
+    proj.meterViewIds = []
+    proj.meterJoinedIDs = []
+    for plan in planMeterViews(proj, templates, budget):
+        joinedIdBase = proj.jId
+        proj.meterViewIds.append(emitViewPlan(proj, plan, writer))
+        proj.meterJoinedIDs += [joinedIdBase + jId for jId in plan.groupJoinedIds]
+    proj.meterViewId = proj.meterViewIds[0]
+    writer.flush()
 
 
 def getChannelMasterGroupTotal(proj):
@@ -599,29 +1660,46 @@ def getChannelMeterGroupTotal(proj):
     return [i, j]
 
 
-def __getSubArrayGroup(proj):
+def __discoverChannels(proj, rootIds):
+    """Find every amplifier channel below a set of groups in a single pass
+
+    Args:
+        proj (r1.ProjectFile): Project file to search
+        rootIds ([int]): GroupIDs to walk down from
+
+    Channels kept by regenerate that have not been created again yet are skipped,
+    a full generation would not have created them at this point either.
+
+    Returns:
+        dict: GroupID of each root to a list of rows - GroupId, Name, TargetId, TargetChannel, cabinet name, CabinetId, Type and L/R/C sub array suffix matches
+    """
+    with proj.span("discoverChannels", roots=len(rootIds)) as span:
+        proj.query("discoveryRootsCreate")
+        proj.query("discoveryRootsClear")
+        proj.queryMany("discoveryRootsInsert", ((rootId,) for rootId in rootIds))
+
+        channels = {rootId: [] for rootId in rootIds}
+        rows = proj.query("groupTreeChannels").fetchall()
+        kept = proj.getKeptGroupIds()
+        if len(kept):
+            rows = [row for row in rows if row[1] not in kept]
+        for row in rows:
+            channels[row[0]].append(row[1:])
+        span["channels"] = len(rows)
+    return channels
+
+
+def __getSubArrayGroup(proj, name):
+    rootIds = [row[0] for row in proj.query("groupIdsFromName", (name,)).fetchall()]
+    devs = []
+    for rows in __discoverChannels(proj, rootIds).values():
+        devs += rows
+    devs.sort(key=lambda row: (row[5], row[0]))
+
     subGroups = []
-    str = ["L", "R", "C"]
-    for s in str:
-        proj.cursor.execute(
-            f" WITH RECURSIVE "
-            f"   devs(GroupId, Name, ParentId, TargetId, TargetChannel, Type) AS ( "
-            f"      SELECT GroupId, Name, ParentId, TargetId, TargetChannel, Type FROM Groups WHERE Name = (SELECT Name FROM SourceGroups WHERE Type = 3) "
-            f"      UNION "
-            f"      SELECT Groups.GroupId, Groups.Name, Groups.ParentId, Groups.TargetId, Groups.TargetChannel, Groups.Type FROM Groups, devs WHERE Groups.ParentId = devs.GroupId "
-            f"   ) "
-            f" SELECT GroupId, devs.Name, TargetId, TargetChannel, CabinetsAdditionalData.Name, Cabinets.CabinetId FROM devs "
-            f" JOIN Cabinets "
-            f" ON devs.TargetId = Cabinets.DeviceId "
-            f" AND devs.TargetChannel = Cabinets.AmplifierChannel "
-            f" JOIN CabinetsAdditionalData "
-            f" ON Cabinets.CabinetId = CabinetsAdditionalData.CabinetId "
-            f" WHERE Linked = 0 "
-            f" /* Sub arrays always end with either L/C/R, two numbers, a dash and a further two numbers */"
-            f' AND devs.Name LIKE "% {s}__%" '
-        )
-        rtn = proj.cursor.fetchall()
-        if rtn is not None and len(rtn):
+    for idx in range(3):  # L, R, C
+        rtn = [row[:6] for row in devs if row[7 + idx]]
+        if len(rtn):
             subGroups.append(rtn)
     return subGroups
 
@@ -632,26 +1710,26 @@ def createSubLRCGroups(proj):
     Args:
         proj (r1.ProjectFile): Project file to create groups in
     """
-    proj.cursor.execute(
-        f"SELECT Name FROM SourceGroups WHERE Type = {r1.SRC_TYPE_SUBARRAY}"
-    )
-    rtn = proj.cursor.fetchone()
+    rtn = proj.query("sourceGroupNameFromType", (r1.SRC_TYPE_SUBARRAY,)).fetchone()
     if rtn is not None:
         name = rtn[0]
-        proj.createGrp(name, proj.pId)
-        mId = proj.getHighestGroupID()
-
-        proj.createGrp(name + " SUBs", mId)
-        mId = proj.getHighestGroupID()
+        mId = proj.createGroups(
+            [
+                (name, proj.pId, 0, -1, 0, 0),
+                (name + " SUBs", r1.GroupRef(0), 0, -1, 0, 0),
+            ]
+        )[1]
 
         str = [" SUBs L", " SUBs R", " SUBs C"]
-        subArrayGroups = __getSubArrayGroup(proj)
+        rows = []
+        subArrayGroups = __getSubArrayGroup(proj, name)
         for idx, subArrayGroup in enumerate(subArrayGroups):
-            proj.createGrp(name + str[idx], mId)
-            pId = proj.getHighestGroupID()
+            pId = r1.GroupRef(len(rows))
+            rows.append((name + str[idx], mId, 0, -1, 0, 0))
 
             for subDevs in subArrayGroup:
-                proj.createGrp(subDevs[1], pId, subDevs[2], subDevs[3], 1, 0)
+                rows.append((subDevs[1], pId, subDevs[2], subDevs[3], 1, 0))
+        proj.createGroups(rows)
 
 
 def addSubCtoSubL(proj):
@@ -661,30 +1739,33 @@ def addSubCtoSubL(proj):
             if chGrp.type == TYPE_SUBS_L:
                 pId = chGrp.groupId
 
+    rows = []
     for srcGrp in proj.sourceGroups:
         for chGrp in srcGrp.channelGroups:
             if chGrp.type == TYPE_SUBS_C:
                 for channel in chGrp.channels:
-                    proj.createGrp(
-                        channel.name, pId, channel.targetId, channel.targetChannel, 1, 0
+                    rows.append(
+                        (
+                            channel.name,
+                            pId,
+                            channel.targetId,
+                            channel.targetChannel,
+                            1,
+                            0,
+                        )
                     )
+    proj.createGroups(rows)
 
 
 def hasSubGroups(proj):
-    proj.cursor.execute(
-        f"SELECT Name FROM SourceGroups WHERE Type = {r1.SRC_TYPE_SUBARRAY}"
-    )
-    rtn = proj.cursor.fetchone()
+    rtn = proj.query("sourceGroupNameFromType", (r1.SRC_TYPE_SUBARRAY,)).fetchone()
     groupCount = 0
     if rtn is not None:
         name = rtn[0]
 
-        str = [" SUBs L", " SUBs R", " SUBs C"]
-        for s in str:
-            q = f'SELECT * FROM Groups WHERE Name = "{name + s}"'
-            proj.cursor.execute(q)
-            rtn = proj.cursor.fetchone()
-            if rtn is not None:
+        roles = getGroupRoles(proj)
+        for role in [ROLE_SUBS_L, ROLE_SUBS_R, ROLE_SUBS_C]:
+            if roles.hasRole(name, role):
                 groupCount += 1
     return groupCount
 
@@ -714,90 +1795,36 @@ def getSrcGrpInfo(proj):
     Args:
         proj (r1.ProjectFile): Proj file to perform discovery on
     """
-    proj.cursor.execute(f"PRAGMA case_sensitive_like=ON;")
+    __writeGroupRoles(proj, getGroupRoles(proj))
 
     # Discover all SourceGroups, related R1 Groups and attributes
-    proj.cursor.execute(
-        f" SELECT Views.ViewId, Views.Name, SourceGroups.SourceGroupId, NextSourceGroupId, SourceGroups.Type, ArrayProcessingEnable,  "
-        f" ArraySightId, System, masterGroup.GroupId as MasterGroupId, masterGroup.Name as MasterGroupName, topsGroup.GroupId as TopGroupId, topsGroup.Name as TopGroupName,  "
-        f" topsLGroup.GroupId as TopLeftGroupId, topsLGroup.Name as TopLeftGroupName, topsRGroup.GroupId as TopRightGroupId, topsRGroup.Name as TopRightGroupName,  "
-        f" subsGroup.GroupId as SubGroupId, subsGroup.Name as SubGroupName, subsLGroup.GroupId as SubLeftGroupId, subsLGroup.Name as SubLeftGroupName, subsRGroup.GroupId as "
-        f" SubRightGroupId, subsRGroup.Name as SubRightGroupName, subsCGroup.GroupId as SubCGroupId, subsCGroup.Name as SubCGroupName, i.DisplayName as xover "
-        f" FROM SourceGroups "
-        f" /* Combine additional source group data */ "
-        f" JOIN SourceGroupsAdditionalData  "
-        f" ON SourceGroups.SourceGroupId = SourceGroupsAdditionalData.SourceGroupId "
-        f" /* Combine view info */ "
-        f" JOIN Views "
-        f" ON Views.Name = SourceGroups.Name "
-        f" /* Combine R1 groups to Source Groups - We only have the name to go on here */ "
-        f" JOIN Groups masterGroup "
-        f" ON SourceGroups.name = masterGroup.Name "
-        f" /* Fetch TOPs groups which may or may not have L/R subgroups */ "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% TOPs") topsGroup '
-        f" ON topsGroup.ParentId = masterGroup.GroupId "
-        f" /* Fetch L/R TOP groups which will be under the main TOPs groups */ "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% TOPs L" ) topsLGroup '
-        f" ON topsLGroup.ParentId  = topsGroup.GroupId "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% TOPs R" ) topsRGroup '
-        f" ON topsRGroup.ParentId  = topsGroup.GroupId "
-        f" /* Fetch the SUBs groups */ "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% SUBs") subsGroup '
-        f" ON subsGroup.ParentId  = masterGroup.GroupId "
-        f" /* Fetch L/R/C SUB groups we created earlier */ "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% SUBs L" ) subsLGroup '
-        f" ON subsLGroup.ParentId  = subsGroup.GroupId "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% SUBs R" ) subsRGroup '
-        f" ON subsRGroup.ParentId  = subsGroup.GroupId "
-        f' LEFT OUTER JOIN (SELECT GroupId, Name, ParentId FROM Groups WHERE Name LIKE "% SUBs C" ) subsCGroup '
-        f" /* Fetch crossover info for subs */ "
-        f" ON subsCGroup.ParentId  = subsGroup.GroupId "
-        f' LEFT OUTER JOIN (SELECT * FROM Controls WHERE DisplayName = "100Hz" OR DisplayName = "Infra") i '
-        f" ON i.ViewId  = Views.ViewId "
-        f" /* Skip unused channels group */ "
-        f' WHERE SourceGroups.name != "Unused channels" '
-        f" /* Skip second half of stereo pairs */"
-        f" AND OrderIndex != -1 "
-        f" /* Skip duplicate groups in Master group _only for arrays_. We want L/R groups for arrays. */ "
-        f' AND (SourceGroups.Type == 1 AND masterGroup.ParentId != (SELECT GroupId FROM Groups WHERE Name == "Master"))  '
-        f" /* Skip existing Sub array group in Master */ "
-        f' OR (SourceGroups.Type == 3 AND masterGroup.ParentId != (SELECT GroupId FROM Groups WHERE Name == "Master"))  '
-        f" /* Get point source groups from Master group */ "
-        f' OR (SourceGroups.Type == 2 AND masterGroup.ParentId == (SELECT GroupId FROM Groups WHERE Name == "Master")) '
-        f" /* Device only groups */"
-        f" OR SourceGroups.Type == 4 "
-        f"  ORDER BY SourceGroups.OrderIndex ASC "
-    )
+    proj.query("sourceGroupDiscovery")
 
     rtn = proj.cursor.fetchall()
 
     for row in rtn:
         proj.sourceGroups.append(SourceGroup(row))
 
-    # Discover all channels of previously discovered groups
-    for idx, srcGrp in enumerate(proj.sourceGroups):
-        for idy, devGrp in enumerate(srcGrp.channelGroups):
-            proj.cursor.execute(
-                f"  WITH RECURSIVE devs(GroupId, Name, ParentId, TargetId, TargetChannel, Type, Flags) AS ( "
-                f"       SELECT Groups.GroupId, Groups.Name, Groups.ParentId, Groups.TargetId, Groups.TargetChannel, Groups.Type, Groups.Flags FROM Groups WHERE Groups.ParentId = {devGrp.groupId} "
-                f"       UNION "
-                f"       SELECT Groups.GroupId, Groups.Name, Groups.ParentId, Groups.TargetId, Groups.TargetChannel, Groups.Type, Groups.Flags FROM Groups, devs WHERE Groups.ParentId = devs.GroupId "
-                f"   ) "
-                f"    "
-                f"  SELECT GroupId, devs.Name, TargetId, TargetChannel, CabinetsAdditionalData.Name, Cabinets.CabinetId FROM devs "
-                f"  JOIN Cabinets "
-                f"  ON devs.TargetId = Cabinets.DeviceId "
-                f"  AND devs.TargetChannel = Cabinets.AmplifierChannel "
-                f"  JOIN CabinetsAdditionalData "
-                f"  ON Cabinets.CabinetId = CabinetsAdditionalData.CabinetId "
-                f"  AND Linked = 0 "
-                f"  WHERE devs.type = 1 "
-            )
-            rtn = proj.cursor.fetchall()
+    # Discover all channels of previously discovered groups in one pass
+    channels = __discoverChannels(
+        proj,
+        [
+            devGrp.groupId
+            for srcGrp in proj.sourceGroups
+            for devGrp in srcGrp.channelGroups
+        ],
+    )
+    for srcGrp in proj.sourceGroups:
+        with proj.tracer.span(
+            srcGrp.name, "sourceGroup", groups=len(srcGrp.channelGroups)
+        ) as span:
+            for devGrp in srcGrp.channelGroups:
+                rtn = [row[:6] for row in channels[devGrp.groupId] if row[6] == 1]
 
-            for row in rtn:
-                proj.sourceGroups[idx].channelGroups[idy].channels.append(Channel(row))
-            log.info(f"Assigned {len(rtn)} channels to {devGrp.name}")
+                for row in rtn:
+                    devGrp.channels.append(Channel(row))
+                log.info(f"Assigned {len(rtn)} channels to {devGrp.name}")
+            span["channels"] = sum(len(g.channels) for g in srcGrp.channelGroups)
 
 
 def getMainGroupCount(proj):
@@ -815,108 +1842,29 @@ def getMainGroupCount(proj):
     return len(groups)
 
 
-def createMasterView(proj, templates):
-    # Get width + height of templates used
-    masterTempWidth, masterTempHeight = __getTempSize(templates, "Master Main")
-    arraySightTempWidth, _ = __getTempSize(templates, "Master ArraySight")
-    _, masterTitleTempHeight = __getTempSize(templates, "Master Title")
-    meterTempWidth, meterTempHeight = __getTempSize(templates, "Group LR AP CPL2")
-    meterTempBuffer = 200
+def planMasterViews(proj, templates, budget=None):
+    """Lay out the master view without touching the project
 
-    # For testing
-    proj.masterJoinedIDs = []
-
-    ####### CREATE VIEW #######
-    HRes = (
-        masterTempWidth
-        + arraySightTempWidth
-        + ((METER_SPACING_X + meterTempWidth) * getChannelMasterGroupTotal(proj))
-        + meterTempBuffer
-    )
-    VRes = masterTitleTempHeight + max([meterTempHeight, masterTempHeight]) + 60
-    proj.cursor.execute(
-        f'INSERT INTO Views("Type","Name","Icon","Flags","HomeViewIndex","NaviBarIndex","HRes","VRes","ZoomLevel","ScalingFactor","ScalingPosX","ScalingPosY","ReferenceVenueObjectId") VALUES (1000,"{MASTER_WINDOW_TITLE}",NULL,4,NULL,-1,{HRes},{VRes},100,NULL,NULL,NULL,NULL);'
-    )
-    proj.cursor.execute(f"SELECT max(ViewId) FROM Views")
-    rtn = proj.cursor.fetchone()
-    if rtn is not None:
-        proj.masterViewId = rtn[0]
+    Args:
+        proj (r1.ProjectFile): Project with SourceGroups discovered and the meter view created
+        templates (TemplateFile): Templates to place
+        budget (ViewBudget, optional): Limits of each page. Defaults to VIEW_MAX_CONTROLS and VIEW_MAX_WIDTH.
 
-    posX, posY = 10, 10
-    __insertTemplate(
-        proj,
-        templates,
-        "Nav Button",
-        NAV_BUTTON_X,
-        posY + NAV_BUTTON_Y,
-        proj.masterViewId,
-        METER_WINDOW_TITLE,
-        proj.meterViewId,
-        -1,
-        proj.cursor,
-    )
-    posY += (
-        __insertTemplate(
-            proj,
-            templates,
-            "Master Title",
-            posX,
-            posY,
-            proj.masterViewId,
-            None,
-            None,
-            None,
-            proj.cursor,
-        )[1]
-        + METER_SPACING_Y
-    )
-    posX += (
-        __insertTemplate(
-            proj,
-            templates,
-            "Master Main",
-            posX,
-            posY,
-            proj.masterViewId,
-            None,
-            proj.mId,
-            None,
-            proj.cursor,
-        )[0]
-        + (METER_SPACING_X / 2)
-    )
-    arraySightTempX, arraySightTempY = __insertTemplate(
-        proj,
-        templates,
-        "Master ArraySight",
-        posX,
-        posY,
-        proj.masterViewId,
-        None,
-        0,
-        None,
-        proj.cursor,
-    )
+    Returns:
+        [ViewPlan]: One plan per page, groupJoinedIds holds (JoinedId, SourceGroup index) of each group
+    """
+    if budget is None:
+        budget = ViewBudget()
 
-    if getApStatus(proj):
-        posX += (
-            __insertTemplate(
-                proj,
-                templates,
-                "THC",
-                posX,
-                posY + arraySightTempY + (METER_SPACING_Y / 2),
-                proj.masterViewId,
-                None,
-                proj.apGroupId,
-                None,
-                proj.cursor,
-            )[0]
-            + (METER_SPACING_X * 4)
-        )
-    else:
-        posX += arraySightTempX + (METER_SPACING_X * 4)
+    # Get width + height of templates used
+    masterTempWidth, masterTempHeight = templates.getTemplate("Master Main").size
+    arraySightTempWidth, _ = templates.getTemplate("Master ArraySight").size
+    _, masterTitleTempHeight = templates.getTemplate("Master Title").size
+    meterTempWidth, meterTempHeight = templates.getTemplate("Group LR AP CPL2").size
+    meterTempBuffer = 200
+    apEnabled = getApStatus(proj)
 
+    strips = []
     for idy, srcGrp in enumerate(proj.sourceGroups):
         for idx, chGrp in enumerate(srcGrp.channelGroups):
 
@@ -930,6 +1878,7 @@ def createMasterView(proj, templates):
                 continue
 
             templateName = "Group"
+            lrGroups = None
             if len(srcGrp.channelGroups) >= 3:  # Stereo groups
                 lrGroups = [
                     srcGrp.channelGroups[idx + 1],
@@ -940,117 +1889,417 @@ def createMasterView(proj, templates):
                 templateName += " AP"
             if srcGrp.cabFamily in ["GSL", "KSL"]:
                 templateName += " CPL2"
+            strips.append((idy, srcGrp, chGrp, templateName, lrGroups))
 
-            tempContents = __getTempControlsFromName(templates, templateName)
-            metCh = 0  # Current channel of stereo pair
-            mutCh = 0
+    navControls = len(templates.getTemplate("Nav Button").controls)
+    headerControls = (3 * navControls) + sum(
+        len(templates.getTemplate(name).controls)
+        for name in ["Master Title", "Master Main", "Master ArraySight", "THC"]
+    )
+    pages = __paginate(
+        [len(templates.getTemplate(s[3]).controls) + navControls for s in strips],
+        METER_SPACING_X + meterTempWidth,
+        budget,
+        headerControls,
+        masterTempWidth + arraySightTempWidth + meterTempBuffer,
+    )
 
-            for control in tempContents:
-                (
-                    _,
-                    controlType,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    displayName,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    _,
-                    flag,
-                    _,
-                    _,
-                    _,
-                    targetChannel,
-                    targetProperty,
-                    *_,
-                ) = control
-                targetId = chGrp.groupId
-
-                # Update Infra/100hz button text
-                if (
-                    (chGrp.type < TYPE_TOPS or chGrp.type > TYPE_TOPS_R)
-                    and displayName == "CUT"
-                    and srcGrp.xover is not None
-                ):
-                    displayName = srcGrp.xover
-                    log.info(f"{chGrp.name} - Enabling {srcGrp.xover}")
-
-                # Meters, these require a TargetChannel
-                if controlType == r1.CTRL_METER:
-                    if "Group LR" in templateName:
-                        targetId, targetChannel = (
-                            lrGroups[metCh].channels[0].targetId,
-                            lrGroups[metCh].channels[0].targetChannel,
-                        )
-                        metCh += 1
-                    else:
-                        targetId = chGrp.channels[0].targetId
-                        targetChannel = chGrp.channels[0].targetChannel
-
-                elif controlType == r1.CTRL_BUTTON:
-                    if "Group LR" in templateName and (
-                        targetProperty == "Config_Mute"
-                    ):  # Mute
-                        targetId = lrGroups[mutCh].groupId
-                        mutCh += 1
-
-                    if displayName == "View EQ":
-                        targetId = srcGrp.viewId + 1
-
-                elif controlType == r1.CTRL_FRAME:
-                    if displayName:
-                        displayName = chGrp.name
-                elif controlType == r1.CTRL_INPUT:
-                    if targetProperty == "ChStatus_MsDelay" and (
-                        "fill" in chGrp.name.lower() or chGrp.type > TYPE_TOPS_L
-                    ):
-                        flag = 14
-                        log.info(f"{chGrp.name} - Setting relative delay")
-
-                query = f'INSERT INTO Controls ("Type", "PosX", "PosY", "Width", "Height", "ViewId", "DisplayName", "JoinedId", "LimitMin", "LimitMax", "MainColor", "SubColor", \
-                    "LabelColor", "LabelFont", "LabelAlignment", "LineThickness", "ThresholdValue", "Flags", "ActionType", "TargetType", "TargetId", "TargetChannel", "TargetProperty", \
-                        "TargetRecord", "ConfirmOnMsg", "ConfirmOffMsg", "PictureIdDay", "PictureIdNight", "Font", "Alignment", "Dimension") VALUES ("{str(controlType)}", \
-                            "{str(control[2]+posX)}", "{str(control[3]+posY)}", "{str(control[4])}", "{str(control[5])}", "{str(proj.masterViewId)}", "{displayName if displayName else ""}", "{str(proj.jId)}", \
-                                "{str(control[10])}", "{str(control[11])}", "{str(control[12])}", "{str(control[13])}", "{str(control[14])}", "{str(control[15])}", "{str(control[16])}", \
-                                    "{str(control[17])}", "{str(control[18])}", "{str(flag)}", "{str(control[20])}", "{str(control[21])}", "{str(targetId)}", {str(targetChannel)}, \
-                                        "{str(targetProperty)}", {control[25]}, NULL, NULL, "{str(control[28])}", "{str(control[29])}", "{str(control[30])}", "{str(control[31])}", "  ")'
-
-                # Remove CPL if not supported by channel / if channel doesn't have infra, cut button becomes infra
-                if (
-                    controlType == r1.CTRL_INPUT
-                    and targetProperty == "Config_Filter3"
-                    and (chGrp.type < TYPE_TOPS or chGrp.type > TYPE_TOPS_R)
-                    and srcGrp.xover is not None
-                ):
-                    log.info(f"{chGrp.name} - Skipping CPL")
-                else:
-                    proj.cursor.execute(query)
-
-            proj.masterJoinedIDs.append((proj.jId, idy))
-
-            __insertTemplate(
-                proj,
-                templates,
-                "Nav Button",
+    plans = []
+    for page, pageStrips in enumerate(pages):
+        plan = ViewPlan(getPageTitle(MASTER_WINDOW_TITLE, page, len(pages)), templates)
+        if len(pages) == 1:
+            stripTotal = getChannelMasterGroupTotal(proj)
+        else:
+            stripTotal = len(pageStrips)
+        plan.hRes = (
+            masterTempWidth
+            + arraySightTempWidth
+            + ((METER_SPACING_X + meterTempWidth) * stripTotal)
+            + meterTempBuffer
+        )
+        plan.vRes = (
+            masterTitleTempHeight + max([meterTempHeight, masterTempHeight]) + 60
+        )
+
+        posX, posY = 10, 10
+        plan.place(
+            "Nav Button",
+            NAV_BUTTON_X,
+            posY + NAV_BUTTON_Y,
+            METER_WINDOW_TITLE,
+            proj.meterViewId,
+            -1,
+        )
+        __placePageNavButtons(
+            plan, MASTER_WINDOW_TITLE, page, len(pages), posY + NAV_BUTTON_Y
+        )
+        posY += plan.place("Master Title", posX, posY)[1] + METER_SPACING_Y
+        posX += plan.place("Master Main", posX, posY, None, proj.mId)[0] + (
+            METER_SPACING_X / 2
+        )
+        arraySightTempX, arraySightTempY = plan.place(
+            "Master ArraySight", posX, posY, None, 0
+        )
+
+        if apEnabled:
+            posX += plan.place(
+                "THC",
                 posX,
-                posY,
-                proj.masterViewId,
+                posY + arraySightTempY + (METER_SPACING_Y / 2),
+                None,
+                proj.apGroupId,
+            )[0] + (METER_SPACING_X * 4)
+        else:
+            posX += arraySightTempX + (METER_SPACING_X * 4)
+
+        for idy, srcGrp, chGrp, templateName, lrGroups in (
+            strips[i] for i in pageStrips
+        ):
+            with proj.tracer.span(
                 chGrp.name,
-                srcGrp.viewId,
-                -1,
-                proj.cursor,
-            )
+                "sourceGroup",
+                sourceGroup=srcGrp.name,
+                template=templateName,
+            ) as span:
+                itemCount = len(plan.items)
+                tempContents = plan.getControls(templateName)
+                groupJoinedId = plan.newJoinedId()
+                metCh = 0  # Current channel of stereo pair
+                mutCh = 0
+
+                for control in tempContents:
+                    (
+                        _,
+                        controlType,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        displayName,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        _,
+                        flag,
+                        _,
+                        _,
+                        _,
+                        targetChannel,
+                        targetProperty,
+                        *_,
+                    ) = control
+                    targetId = chGrp.groupId
+
+                    # Update Infra/100hz button text
+                    if (
+                        (chGrp.type < TYPE_TOPS or chGrp.type > TYPE_TOPS_R)
+                        and displayName == "CUT"
+                        and srcGrp.xover is not None
+                    ):
+                        displayName = srcGrp.xover
+                        log.info(f"{chGrp.name} - Enabling {srcGrp.xover}")
+
+                    # Meters, these require a TargetChannel
+                    if controlType == r1.CTRL_METER:
+                        if "Group LR" in templateName:
+                            targetId, targetChannel = (
+                                lrGroups[metCh].channels[0].targetId,
+                                lrGroups[metCh].channels[0].targetChannel,
+                            )
+                            metCh += 1
+                        else:
+                            targetId = chGrp.channels[0].targetId
+                            targetChannel = chGrp.channels[0].targetChannel
+
+                    elif controlType == r1.CTRL_BUTTON:
+                        if "Group LR" in templateName and (
+                            targetProperty == "Config_Mute"
+                        ):  # Mute
+                            targetId = lrGroups[mutCh].groupId
+                            mutCh += 1
+
+                        if displayName == "View EQ":
+                            targetId = srcGrp.viewId + 1
+
+                    elif controlType == r1.CTRL_FRAME:
+                        if displayName:
+                            displayName = chGrp.name
+                    elif controlType == r1.CTRL_INPUT:
+                        if targetProperty == "ChStatus_MsDelay" and (
+                            "fill" in chGrp.name.lower() or chGrp.type > TYPE_TOPS_L
+                        ):
+                            flag = 14
+                            log.info(f"{chGrp.name} - Setting relative delay")
+
+                    # Remove CPL if not supported by channel / if channel doesn't have infra, cut button becomes infra
+                    if (
+                        controlType == r1.CTRL_INPUT
+                        and targetProperty == "Config_Filter3"
+                        and (chGrp.type < TYPE_TOPS or chGrp.type > TYPE_TOPS_R)
+                        and srcGrp.xover is not None
+                    ):
+                        log.info(f"{chGrp.name} - Skipping CPL")
+                    else:
+                        plan.addRow(
+                            groupJoinedId,
+                            (
+                                controlType,
+                                control[2] + posX,
+                                control[3] + posY,
+                                control[4],
+                                control[5],
+                                None,  # ViewId
+                                displayName if displayName else "",
+                                None,  # JoinedId
+                                *control[10:19],
+                                flag,
+                                control[20],
+                                control[21],
+                                targetId,
+                                targetChannel,
+                                targetProperty,
+                                control[25],
+                                None,
+                                None,
+                                *control[28:32],
+                                "  ",
+                            ),
+                        )
+
+                plan.groupJoinedIds.append((groupJoinedId, idy))
+                plan.addUnit(srcGrp.name, groupJoinedId)
+
+                plan.place(
+                    "Nav Button",
+                    posX,
+                    posY,
+                    chGrp.name,
+                    srcGrp.viewId,
+                    -1,
+                    joinedId=groupJoinedId,
+                )
+                # The JoinedId after each group is left unused
+                plan.newJoinedId()
+
+                posX += meterTempWidth + METER_SPACING_X
+                span["items"] = len(plan.items) - itemCount
+
+        plans.append(plan)
+
+    return plans
+
+
+def createMasterView(proj, templates, budget=None):
+    writer = proj.getControlSink()
+    proj.masterViewIds = []
+    proj.masterJoinedIDs = []
+    for plan in planMasterViews(proj, templates, budget):
+        joinedIdBase = proj.jId
+        proj.masterViewIds.append(emitViewPlan(proj, plan, writer))
+        proj.masterJoinedIDs += [
+            (joinedIdBase + jId, idy) for jId, idy in plan.groupJoinedIds
+        ]
+    proj.masterViewId = proj.masterViewIds[0]
+    writer.flush()
+
+
+def __updateView(proj, plan, viewId, units, writer):
+    """Bring an existing view in line with a plan, touching only the units that differ
 
-            posX += meterTempWidth + METER_SPACING_X
+    Args:
+        proj (r1.ProjectFile): Project containing the view
+        plan (ViewPlan): Layout the view should have
+        viewId (int): ViewId of the view
+        units (dict): Units of the view from loadViewUnits
+        writer (r1.ControlSink): Sink replaced units are passed to
 
-            proj.jId = proj.jId + 1
+    Returns:
+        ([int], [int]): ControlIds and JoinedIds removed from the view
+    """
+    base = proj.jId
+    fingerprint = ViewFingerprint(plan, base)
+    rows = list(fingerprint.track(iterViewPlanRows(plan, viewId, base)))
+    proj.jId = base + plan.joinedIds
+
+    kept = set()
+    shifts = {}  # Distance moved -> JoinedIds
+    for unit, (digest, posX, jIds) in fingerprint.getUnits().items():
+        old = units.get(unit)
+        if old is not None and old[0] == digest:
+            kept.add(unit)
+            if posX != old[1]:
+                shifts.setdefault(posX - old[1], []).extend(old[2])
+            jIds = old[2]
+        proj.viewUnits.append((viewId, unit, digest, posX, jIds))
+
+    removedJoinedIds = [
+        jId for unit, (_, _, jIds) in units.items() if unit not in kept for jId in jIds
+    ]
+    removedControls = []
+    for batch in r1.idBatches(removedJoinedIds):
+        removedControls += [
+            row[0]
+            for row in proj.query(
+                "controlIdsFromJoinedBatch", (viewId,) + batch
+            ).fetchall()
+        ]
+    proj.deleteControls(removedControls)
+
+    # Later columns move over as a block rather than being generated again
+    proj.queryMany(
+        "controlShiftXBatch",
+        (
+            (dx, viewId) + batch
+            for dx, jIds in shifts.items()
+            for batch in r1.idBatches(jIds)
+        ),
+    )
+    proj.query("viewResize", (plan.hRes, plan.vRes, viewId))
+    writer.extend(row for row in rows if fingerprint.getUnit(row) not in kept)
+
+    log.info(
+        f"Updated {plan.name} - {len(kept)} units kept, {sum(len(j) for j in shifts.values())} "
+        f"JoinedIds moved, {len(fingerprint.units) - len(kept)} units generated, "
+        f"{len(removedControls)} controls removed."
+    )
+    return removedControls, removedJoinedIds
+
+
+def regenerate(proj, templates, budget=None):
+    """Update the AutoR1 items of a project in place, re-emitting only changed source groups
+
+    Groups are rebuilt reusing every recorded group that would be created again
+    unchanged, see r1.ProjectFile.keepGroups, so controls targeting them keep their
+    fingerprints. Each meter column and master strip is compared with the fingerprint
+    saved by saveManifest, unchanged ones are kept and moved to their new position,
+    changed and new ones are generated and removed ones deleted.
+
+    Projects without view units, with an out of date manifest or with paginated
+    views are left for a full clean and generate. Pagination is only known once
+    groups have been rebuilt, in that case the rebuilt groups are left for clean()
+    to remove by name.
+
+    Args:
+        proj (r1.ProjectFile): Project AutoR1 has previously generated
+        templates (TemplateFile): Templates to place
+        budget (ViewBudget, optional): Limits of each page. Defaults to VIEW_MAX_CONTROLS and VIEW_MAX_WIDTH.
+
+    Returns:
+        bool: True if the project was updated, False if it needs generating in full
+    """
+    manifest = loadManifest(proj)
+    units = loadViewUnits(proj)
+    if manifest is None or units is None or not __manifestIsComplete(proj, manifest):
+        log.info("No usable manifest, generating in full.")
+        return False
+
+    views = {name: viewId for viewId, name in getAutoViews(proj).items()}
+    viewIds = set(views.values())
+    if (
+        set(views) != {METER_WINDOW_TITLE, MASTER_WINDOW_TITLE}
+        or set(units) != viewIds
+        or set(manifest.get("Views", [])) != viewIds
+    ):
+        log.info("Views have been paginated or changed, generating in full.")
+        return False
+
+    proj.keepGroups(manifest.get("Groups", []))
+    createParentGroup(proj)
+    createSubLRCGroups(proj)
+    # getSrcGrpInfo would find groups not created again by now, only the AP group
+    # and channels created after it can still be reused
+    groups = proj.index.getGroups()
+    proj.deleteKeptGroups(
+        gId
+        for gId in proj.getKeptGroupIds()
+        if groups.rows[gId][r1.GROUPS_COL_Type] == 0
+        and groups.getName(gId) != AP_GROUP_TITLE
+    )
+    getSrcGrpInfo(proj)
+    configureApChannels(proj)
+
+    proj.meterViewId = views[METER_WINDOW_TITLE]
+    proj.masterViewId = views[MASTER_WINDOW_TITLE]
+    proj.meterViewIds = [proj.meterViewId]
+    proj.masterViewIds = [proj.masterViewId]
+    meterPlans = planMeterViews(proj, templates, budget)
+    masterPlans = planMasterViews(proj, templates, budget)
+    if len(meterPlans) > 1 or len(masterPlans) > 1:
+        log.info("Views need paginating, generating in full.")
+        proj.keepGroups([])
+        proj.sourceGroups = []
+        proj.created["Groups"] = []
+        return False
+
+    writer = proj.getControlSink()
+    removedControls, removedJoinedIds = __updateView(
+        proj, meterPlans[0], proj.meterViewId, units[proj.meterViewId], writer
+    )
+    controls, joinedIds = __updateView(
+        proj, masterPlans[0], proj.masterViewId, units[proj.masterViewId], writer
+    )
+    writer.flush()
+    removedControls = set(removedControls + controls)
+    removedJoinedIds = set(removedJoinedIds + joinedIds)
+
+    # Carry over everything still in the project so the next manifest is complete
+    proj.created["Views"] += [proj.meterViewId, proj.masterViewId]
+    proj.created["Controls"] += [
+        id for id in manifest.get("Controls", []) if id not in removedControls
+    ]
+    proj.created["JoinedIds"] += [
+        id for id in manifest.get("JoinedIds", []) if id not in removedJoinedIds
+    ]
+    navViews = manifest.get(MANIFEST_KIND_NAV_VIEWS, [])
+    proj.created[MANIFEST_KIND_NAV_VIEWS] = list(navViews)
+
+    # Only views added since the last run need a nav button
+    createNavButtons(proj, templates, navViews)
+    addSubCtoSubL(proj)
+    proj.deleteKeptGroups()
+    return True
+
+
+def createParentGroup(proj):
+    proj.pId = proj.createGrp(PARENT_GROUP_TITLE, 1)[0]
+
+
+# Every stage of a full generation in the order they run, with the names of the
+# arguments each takes after the project, see getStages
+GENERATE_STAGES = [
+    (clean, ()),
+    (createParentGroup, ()),
+    (createSubLRCGroups, ()),
+    (getSrcGrpInfo, ()),
+    (configureApChannels, ()),
+    (createMeterView, ("templates", "budget")),
+    (createMasterView, ("templates", "budget")),
+    (createNavButtons, ("templates",)),
+    (addSubCtoSubL, ()),
+    (saveManifest, ()),
+]
+
+
+def getStages(templates, budget=None):
+    """Stages of a full generation with their arguments
+
+    Args:
+        templates (TemplateFile): Templates to use
+        budget (ViewBudget, optional): Limits of each generated view. Defaults to None.
+
+    Returns:
+        [(function, tuple)]: Each stage and the arguments it is called with after the project
+    """
+    values = {"templates": templates, "budget": budget}
+    return [
+        (stage, tuple(values[name] for name in names))
+        for stage, names in GENERATE_STAGES
+    ]
@@ -0,0 +1,39 @@
+# Benchmarks run by src/microbench.py, see its docstring for the conventions
+import autor1.autor1 as autor1
+
+
+def runStagesBefore(proj, templates, name=None):
+    # Stages of a full generation up to the one named, all of them if None
+    for stage, stageArgs in autor1.getStages(templates):
+        if stage.__name__ == name:
+            return
+        stage(proj, *stageArgs)
+
+
+def bench_templateFile(templatePath):
+    return lambda: autor1.TemplateFile(templatePath).close()
+
+
+def bench_createSubLRCGroups(proj, templates):
+    runStagesBefore(proj, templates, "createSubLRCGroups")
+    return lambda: autor1.createSubLRCGroups(proj)
+
+
+def bench_getSrcGrpInfo(proj, templates):
+    runStagesBefore(proj, templates, "getSrcGrpInfo")
+    return lambda: autor1.getSrcGrpInfo(proj)
+
+
+def bench_createMeterView(proj, templates):
+    runStagesBefore(proj, templates, "createMeterView")
+    return lambda: autor1.createMeterView(proj, templates)
+
+
+def bench_createMasterView(proj, templates):
+    runStagesBefore(proj, templates, "createMasterView")
+    return lambda: autor1.createMasterView(proj, templates)
+
+
+def bench_clean(proj, templates):
+    runStagesBefore(proj, templates)
+    return lambda: autor1.clean(proj)
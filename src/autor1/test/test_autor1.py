@@ -1,9 +1,13 @@
+import json
 import logging
+import pickle
 import sqlite3
 import sys
 import os
+import time
 import pytest
 import r1py.r1py as r1
+import r1py.synthetic as synthetic
 import autor1.autor1 as autor1
 from shutil import copyfile
 
@@ -22,6 +26,23 @@ PROJECTS = [
     ("AC10.16 default.dbpr", 4, 7, 0, 2),
 ]
 
+# Most statements each stage may execute from Python, whatever the size of the project.
+# A query issued once per group, channel or view makes these grow with the project.
+QUERY_BUDGETS = {
+    "clean": 12,
+    "createParentGroup": 2,
+    "createSubLRCGroups": 24,
+    "getSrcGrpInfo": 9,
+    "configureApChannels": 6,
+    "createMeterView": 2,
+    "createMasterView": 2,
+    "createNavButtons": 4,
+    "addSubCtoSubL": 3,
+    "saveManifest": 6,
+}
+# Statements allowed for each page of the meter and master views
+PAGE_QUERY_BUDGET = 1
+
 
 # Before all tests
 @pytest.fixture(scope="session", autouse=True)
@@ -46,7 +67,41 @@ def testConfig(request):
     proj.cleanPath = cleanPath
     proj.expectedMasterItems = request.param[1]
     proj.expectedMeterItems = request.param[2]
-    return request.param + (proj,)
+    yield request.param + (proj,)
+    # Uncommitted writes would otherwise lock the file when it is next copied
+    proj.close()
+
+
+@pytest.fixture(scope="module")
+def templates():
+    templates = autor1.TemplateFile(TEMP_FILE)
+    yield templates
+    templates.close()
+
+
+def runStagesBefore(proj, templates, name=None, budget=None):
+    # Stages of a full generation up to the one named, all of them if None
+    for stage, stageArgs in autor1.getStages(templates, budget):
+        if stage.__name__ == name:
+            return
+        stage(proj, *stageArgs)
+
+
+def dumpTables(proj, tables=("Controls", "Groups", "Views")):
+    # Every row of each table, ordered by id
+    rows = {}
+    for table in tables:
+        proj.cursor.execute(f"SELECT * FROM {table} ORDER BY 1")
+        rows[table] = proj.cursor.fetchall()
+    return rows
+
+
+def dumpViews(proj):
+    # Name, size and number of controls of each view, comparable between projects
+    proj.cursor.execute(
+        "SELECT Views.Name, HRes, VRes, count(ControlId) FROM Views LEFT JOIN Controls ON Controls.ViewId = Views.ViewId GROUP BY Views.ViewId ORDER BY Views.Name"
+    )
+    return proj.cursor.fetchall()
 
 
 @pytest.mark.order(1)
@@ -61,6 +116,217 @@ def test_loadTemplateSuccess():
     assert type(template) is autor1.TemplateFile
 
 
+@pytest.mark.order(2)
+def test_templateIndex():
+    templates = autor1.TemplateFile(TEMP_FILE)
+    assert templates.getTemplate("abcd") is None
+
+    for t in templates.templates:
+        assert templates.getTemplate(t.name) is t
+        # Controls are only read once requested
+        assert t._controls is None
+
+        templates.cursor.execute(
+            "SELECT PosX, PosY, Width, Height FROM Controls WHERE JoinedId = ?",
+            (t.joinedId,),
+        )
+        geometry = templates.cursor.fetchall()
+        maxWidth, maxHeight = 0, 0
+        for PosX, PosY, Width, Height in geometry:
+            maxWidth = max(maxWidth, PosX + Width)
+            maxHeight = max(maxHeight, PosY + Height)
+        assert t.size == [maxWidth, maxHeight]
+
+        assert len(t.controls) == len(geometry)
+        assert t.controls is t._controls
+    templates.close()
+
+
+@pytest.mark.order(2)
+def test_templateInstantiate():
+    templates = autor1.TemplateFile(TEMP_FILE)
+
+    navButton = templates.getTemplate("Nav Button")
+    rows = navButton.instantiate(10, 20, 1001, "Title", 5000, 2000, -1)
+    control = navButton.controls[0]
+    assert len(rows) == len(navButton.controls)
+    assert len(rows[0]) == len(r1.CONTROLS_COLUMNS)
+    assert rows[0][1:8] == (
+        control[2] + 10,
+        control[3] + 20,
+        control[4],
+        control[5],
+        1001,
+        "Title",
+        5000,
+    )
+    assert rows[0][20] == 2000
+
+    meters = templates.getTemplate("Meters Group")
+    rows = meters.instantiate(0, 0, 1001, "Title", 5000, 2000, 3, width=1)
+    for control, row in zip(meters.controls, rows):
+        assert row[3] == 1 and row[4] == control[5]
+        # Fallback and Regular frames keep their names
+        if control[7] in ["Fallback", "Regular"]:
+            assert row[6] == control[7]
+        if control[24] in r1.DEV_PROP_TYPES:
+            assert row[21] == 0
+        else:
+            assert row[21] == 3
+    templates.close()
+
+
+@pytest.mark.order(2)
+def test_templateNullColumns():
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = "./Projects/Output/test_templateNullColumns.dbpr"
+    copyfile("./Projects/test_init.dbpr", path)
+    templates = autor1.TemplateFile(TEMP_FILE)
+    columns = [r[1] for r in templates.cursor.execute("PRAGMA table_info(Controls)")]
+
+    # Every value copied from the template, other than geometry, left empty
+    navButton = templates.getTemplate("Nav Button")
+    control = list(navButton.controls[0])
+    for name in columns[columns.index("LimitMin") : columns.index("Dimension")]:
+        control[columns.index(name)] = None
+    template = autor1.Template(
+        navButton.sections, [tuple(control)], None, navButton.size
+    )
+
+    proj = r1.ProjectFile(path)
+    writer = r1.ControlWriter(proj)
+    writer.extend(template.instantiate(0, 0, 1001, None, proj.jId, None, None))
+    writer.flush()
+    typeColumns = ", ".join(f'typeof("{c}")' for c in r1.CONTROLS_COLUMNS)
+    types = proj.cursor.execute(
+        f"SELECT {typeColumns} FROM Controls WHERE JoinedId = ?", (proj.jId,)
+    ).fetchone()
+    row = proj.cursor.execute(
+        "SELECT * FROM Controls WHERE JoinedId = ?", (proj.jId,)
+    ).fetchone()
+    proj.close()
+    templates.close()
+
+    # Written as NULL, not the string 'None'
+    assert "None" not in row
+    for name, valueType in zip(r1.CONTROLS_COLUMNS, types):
+        if name in columns and control[columns.index(name)] is None:
+            assert valueType == "null", name
+    assert types[r1.CONTROLS_COLUMNS.index("TargetProperty")] == "null"
+    assert types[r1.CONTROLS_COLUMNS.index("PictureIdDay")] == "null"
+
+
+@pytest.mark.order(2)
+def test_templateCache():
+    try:
+        os.mkdir("./Projects/Output/", 0o777)
+    except:
+        pass
+    tempPath = "./Projects/Output/templates.r2t"
+    cachePath = tempPath + ".cache"
+    copyfile(TEMP_FILE, tempPath)
+
+    parsed = autor1.TemplateFile(tempPath, cachePath)
+    assert not parsed.fromCache
+    assert os.path.isfile(cachePath)
+
+    cached = autor1.TemplateFile(tempPath, cachePath)
+    assert cached.fromCache
+    for t in parsed.templates:
+        c = cached.getTemplate(t.name)
+        assert c.sections == t.sections
+        assert c.size == t.size
+        assert c.controls == t.controls
+    cached.close()
+
+    # Any change to the template file makes the cache stale
+    stat = os.stat(tempPath)
+    os.utime(tempPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    assert not autor1.TemplateFile(tempPath, cachePath).fromCache
+    assert autor1.TemplateFile(tempPath, cachePath).fromCache
+    parsed.close()
+
+
+class PickledCall:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        # Creates path if unpickled
+        return (open, (self.path, "w"))
+
+
+@pytest.mark.order(2)
+def test_templateCacheInvalid():
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    tempPath = "./Projects/Output/templates-invalid.r2t"
+    cachePath = tempPath + ".cache"
+    markerPath = "./Projects/Output/templates-invalid.unpickled"
+    copyfile(TEMP_FILE, tempPath)
+    if os.path.exists(markerPath):
+        os.remove(markerPath)
+
+    fingerprint = list(autor1.getTemplateFingerprint(tempPath))
+    contents = [
+        pickle.dumps(PickledCall(markerPath)),
+        b"\x00\xff",
+        b"[]",
+        json.dumps({"version": autor1.TEMPLATE_CACHE_VERSION}).encode(),
+        json.dumps(
+            {
+                "version": autor1.TEMPLATE_CACHE_VERSION,
+                "fingerprint": fingerprint,
+                "templates": [[[1, "Short"], [], [0, 0]]],
+                "names": [],
+            }
+        ).encode(),
+    ]
+    # Anything that is not a cache written for this template file is parsed again and replaced
+    for content in contents:
+        with open(cachePath, "wb") as f:
+            f.write(content)
+        templates = autor1.TemplateFile(tempPath, cachePath)
+        assert not templates.fromCache
+        assert len(templates.templates)
+        templates.close()
+        assert autor1.TemplateFile(tempPath, cachePath).fromCache
+    assert not os.path.exists(markerPath)
+
+
+@pytest.mark.order(2)
+def test_outputCache():
+    cacheDir = "./Projects/Output/outputCache"
+    if os.path.isdir(cacheDir):
+        for f in os.listdir(cacheDir):
+            os.remove(os.path.join(cacheDir, f))
+    digest = autor1.getTemplateFingerprint(TEMP_FILE)[2]
+    paths = ["./Projects/" + p[0] for p in PROJECTS[1:]]
+    # One entry has to go once all three are stored
+    cache = autor1.OutputCache(cacheDir, sum(os.path.getsize(p) for p in paths) - 1)
+
+    keys = [cache.getKey(p, digest) for p in paths]
+    assert keys[0] == cache.getKey(paths[0], digest)
+    assert keys[0] != cache.getKey(paths[0], digest, (100, 200))
+    assert keys[0] != cache.getKey(paths[0], "0" * 64)
+
+    dst = "./Projects/Output/outputCache.dbpr"
+    assert not cache.fetch(keys[0], dst)
+    cache.store(keys[0], paths[0])
+    cache.store(keys[1], paths[1])
+    assert cache.fetch(keys[0], dst)
+    with open(dst, "rb") as a, open(paths[0], "rb") as b:
+        assert a.read() == b.read()
+
+    # Least recently used entry is evicted first
+    stat = os.stat(cache.getEntryPath(keys[0]))
+    os.utime(cache.getEntryPath(keys[1]), ns=(stat.st_atime_ns, stat.st_mtime_ns - 1))
+    cache.store(keys[2], paths[2])
+    assert cache.fetch(keys[0], dst)
+    assert not cache.fetch(keys[1], dst)
+    assert cache.stats == {"hits": 2, "misses": 2, "stores": 3, "evictions": 1}
+    assert "2 hits" in cache.getSummary()
+
+
 @pytest.mark.order(3)
 def test_getHighestGroupID(testConfig):
     loadedProject = testConfig[-1]
@@ -84,6 +350,27 @@ def test_getSrcGroupType(testConfig):
         assert autor1.getSrcGroupType(loadedProject, name) >= 1000
 
 
+@pytest.mark.order(4)
+def test_groupRoles(testConfig):
+    loadedProject = testConfig[-1]
+    roles = autor1.getGroupRoles(loadedProject)
+    assert roles is autor1.getGroupRoles(loadedProject)
+
+    for id in loadedProject.getSourceGroupIds():
+        name = loadedProject.getSourceGroupNameFromId(id)
+        for role in [autor1.ROLE_TOPS, autor1.ROLE_SUBS]:
+            loadedProject.cursor.execute(
+                "SELECT GroupId FROM Groups WHERE Name = ?", (name + " " + role,)
+            )
+            assert roles.hasRole(name, role) == (
+                loadedProject.cursor.fetchone() is not None
+            )
+
+    for gId, (base, role) in roles.roles.items():
+        assert role in autor1.ROLE_SUFFIXES or role == autor1.ROLE_MASTER
+        assert gId in roles.bases[(base, role)]
+
+
 @pytest.mark.order(5)
 def test_getApStatus(testConfig):
     loadedProject = testConfig[-1]
@@ -217,3 +504,303 @@ def test_cleanProjectFile(testConfig):
         assert cleanProj.cursor.fetchone() is None
 
     cleanProj.close()
+
+
+@pytest.mark.order(9)
+def test_cleanFromManifest(testConfig, templates):
+    path = "./Projects/" + testConfig[0]
+    manifestPath = "./Projects/Output/" + testConfig[0] + "-manifest.dbpr"
+    copyfile(path, manifestPath)
+
+    proj = r1.ProjectFile(manifestPath, groupTree=True)
+    initTables = dumpTables(proj)
+    runStagesBefore(proj, templates)
+    proj.close()
+
+    proj = r1.ProjectFile(manifestPath)
+    manifest = autor1.loadManifest(proj)
+    assert len(manifest["Views"]) == 2
+    assert len(manifest["Controls"]) > 0
+
+    autor1.clean(proj)
+    assert autor1.loadManifest(proj) is None
+    assert dumpTables(proj) == initTables
+    proj.close()
+
+
+@pytest.mark.order(9)
+def test_abortedGeneration(templates):
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = "./Projects/Output/test_abortedGeneration.dbpr"
+    copyfile("./Projects/test_init.dbpr", path)
+
+    proj = r1.ProjectFile(path, groupTree=True, processingIndexes=True)
+    runStagesBefore(proj, templates, "createMasterView")
+    # Killed before close(), nothing generated so far reaches the file
+    proj.db.close()
+
+    db = sqlite3.connect(path)
+    assert not db.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE 'r1py_%'"
+    ).fetchall()
+    assert not db.execute(
+        "SELECT ViewId FROM Views WHERE Name LIKE ?", (autor1.PARENT_GROUP_TITLE + "%",)
+    ).fetchall()
+    assert not db.execute(
+        "SELECT GroupId FROM Groups WHERE Name = ?", (autor1.PARENT_GROUP_TITLE,)
+    ).fetchall()
+    db.close()
+
+
+@pytest.mark.order(9)
+def test_cleanReusedControlId(templates):
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = "./Projects/Output/test_cleanReusedControlId.dbpr"
+    copyfile("./Projects/test_init.dbpr", path)
+
+    proj = r1.ProjectFile(path, groupTree=True)
+    runStagesBefore(proj, templates)
+    # R1 reused the id of a deleted meter control for one in a default view
+    controlId = proj.created["Controls"][0]
+    proj.cursor.execute(
+        "UPDATE Controls SET ViewId = ?, TargetId = 0, TargetChannel = 0 WHERE ControlId = ?",
+        (proj.created[autor1.MANIFEST_KIND_NAV_VIEWS][0], controlId),
+    )
+    proj.close()
+
+    proj = r1.ProjectFile(path)
+    autor1.clean(proj)
+    assert not len(autor1.getAutoViews(proj))
+    proj.cursor.execute(
+        "SELECT count(*) FROM Controls WHERE ControlId = ?", (controlId,)
+    )
+    assert proj.cursor.fetchone()[0] == 1
+    proj.close()
+
+
+@pytest.mark.order(9)
+def test_viewPlan(testConfig, templates):
+    path = "./Projects/Output/" + testConfig[0] + "-plan.dbpr"
+    copyfile("./Projects/" + testConfig[0], path)
+
+    proj = r1.ProjectFile(path)
+    runStagesBefore(proj, templates, "createMeterView")
+
+    viewCount = len(proj.index.getViews())
+    plans = autor1.planMeterViews(proj, templates)
+    assert len(plans) == 1
+    plan = plans[0]
+    # Planning does not write anything
+    assert len(proj.index.getViews()) == viewCount
+    assert len(plan.groupJoinedIds) == testConfig[2]
+
+    jId = proj.jId
+    writer = r1.ControlWriter(proj)
+    viewId = autor1.emitViewPlan(proj, plan, writer)
+    assert proj.jId == jId + plan.joinedIds
+    assert writer.flush() == sum(len(p.template.controls) for p in plan.items)
+
+    proj.cursor.execute("SELECT HRes, VRes FROM Views WHERE ViewId = ?", (viewId,))
+    assert proj.cursor.fetchone() == (plan.hRes, plan.vRes)
+    proj.close()
+
+
+@pytest.mark.order(9)
+@pytest.mark.parametrize("useManifest", [True, False])
+def test_paginatedViews(testConfig, templates, useManifest):
+    path = f"./Projects/Output/{testConfig[0]}-paged-{useManifest}.dbpr"
+    copyfile("./Projects/" + testConfig[0], path)
+    budget = autor1.ViewBudget(maxControls=400, maxWidth=2000)
+
+    proj = r1.ProjectFile(path, groupTree=True)
+    initTables = dumpTables(proj)
+    runStagesBefore(proj, templates, "addSubCtoSubL", budget)
+
+    assert len(proj.meterJoinedIDs) == testConfig[2]
+    assert len(proj.masterJoinedIDs) == testConfig[1]
+    assert len(proj.meterViewIds) > 1
+    for title, viewIds in [
+        (autor1.METER_WINDOW_TITLE, proj.meterViewIds),
+        (autor1.MASTER_WINDOW_TITLE, proj.masterViewIds),
+    ]:
+        for page, viewId in enumerate(viewIds):
+            proj.cursor.execute(
+                "SELECT Name, HRes FROM Views WHERE ViewId = ?", (viewId,)
+            )
+            name, hRes = proj.cursor.fetchone()
+            assert name == autor1.getPageTitle(title, page, len(viewIds))
+            assert hRes <= budget.maxWidth
+            proj.cursor.execute(
+                "SELECT count(*) FROM Controls WHERE ViewId = ?", (viewId,)
+            )
+            assert proj.cursor.fetchone()[0] <= budget.maxControls
+
+    # Default views link to the first master page
+    proj.cursor.execute(
+        "SELECT DISTINCT TargetId FROM Controls WHERE ViewId IN (SELECT ViewId FROM Views WHERE Name NOT LIKE 'AUTO%') AND TargetChannel = -1 AND DisplayName = ?",
+        (autor1.MASTER_WINDOW_TITLE,),
+    )
+    assert proj.cursor.fetchall() == [(proj.masterViewIds[0],)]
+
+    if useManifest:
+        autor1.saveManifest(proj)
+    proj.close()
+
+    proj = r1.ProjectFile(path)
+    autor1.clean(proj)
+    assert dumpTables(proj) == initTables
+    proj.close()
+
+
+@pytest.mark.order(9)
+def test_regenerate(testConfig, templates):
+    path = f"./Projects/Output/{testConfig[0]}-regenerate.dbpr"
+    fullPath = f"./Projects/Output/{testConfig[0]}-regenerate-full.dbpr"
+    copyfile("./Projects/" + testConfig[0], path)
+
+    # Hide a point source so it appears to be added after the first run
+    proj = r1.ProjectFile(path, groupTree=True)
+    assert not autor1.regenerate(proj, templates)
+    proj.cursor.execute(
+        "SELECT SourceGroupId, Name FROM SourceGroups WHERE Type = 2 AND OrderIndex != -1 ORDER BY SourceGroupId"
+    )
+    srcId, name = proj.cursor.fetchone()
+    proj.cursor.execute(
+        "UPDATE SourceGroups SET Name = ? WHERE SourceGroupId = ?",
+        (name + " hidden", srcId),
+    )
+    runStagesBefore(proj, templates)
+    proj.cursor.execute(
+        "UPDATE SourceGroups SET Name = ? WHERE SourceGroupId = ?", (name, srcId)
+    )
+    proj.close()
+    copyfile(path, fullPath)
+
+    proj = r1.ProjectFile(path, groupTree=True)
+    assert autor1.regenerate(proj, templates)
+    autor1.saveManifest(proj)
+    assert name in [unit for _, unit, *_ in proj.viewUnits]
+    proj.close()
+
+    full = r1.ProjectFile(fullPath, groupTree=True)
+    runStagesBefore(full, templates)
+    proj = r1.ProjectFile(path)
+    assert dumpViews(proj) == dumpViews(full)
+    full.close()
+
+    # Nothing changed since, a rerun writes no groups and no controls
+    proj.close()
+    proj = r1.ProjectFile(path, groupTree=True)
+    tables = ("Groups", "Controls", "sqlite_sequence")
+    initTables = dumpTables(proj, tables)
+    assert autor1.regenerate(proj, templates)
+    autor1.saveManifest(proj)
+    assert dumpTables(proj, tables) == initTables
+
+    # Paginated views are always generated in full
+    proj.close()
+    proj = r1.ProjectFile(path, groupTree=True)
+    assert not autor1.regenerate(proj, templates, autor1.ViewBudget(maxControls=400))
+    proj.close()
+
+
+@pytest.mark.order(9)
+@pytest.mark.parametrize(
+    "arrays, subs, apEnable, subArray",
+    [(1, 1, False, True), (4, 2, True, True), (3, 2, False, False)],
+)
+def test_syntheticProject(templates, arrays, subs, apEnable, subArray):
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = f"./Projects/Output/synthetic-{arrays}-{subs}-{apEnable}-{subArray}.dbpr"
+    synthetic.createProject(
+        path,
+        "./Projects/test_init.dbpr",
+        arrays=arrays,
+        subs=subs,
+        apEnable=apEnable,
+        subArray=subArray,
+        channels=3,
+    )
+
+    proj = r1.ProjectFile(path, groupTree=True)
+    runStagesBefore(proj, templates, "saveManifest")
+    assert autor1.hasSubGroups(proj) == (3 if subArray else 0)
+    assert autor1.getApStatus(proj) == apEnable
+
+    # A L and R column for each array, L, R and C columns for the SUB array
+    assert len(proj.meterJoinedIDs) == 2 * (arrays + subs) + 3 * subArray
+    assert len(proj.masterJoinedIDs) == arrays + subs + subArray
+    proj.close()
+
+
+@pytest.mark.order(9)
+def test_templateSpans(monkeypatch, templates):
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = "./Projects/Output/test_templateSpans.dbpr"
+    copyfile("./Projects/test_init.dbpr", path)
+    instantiate = autor1.Template.instantiate
+
+    def slowInstantiate(self, *args, **kwargs):
+        time.sleep(0.001)
+        return instantiate(self, *args, **kwargs)
+
+    monkeypatch.setattr(autor1.Template, "instantiate", slowInstantiate)
+    proj = r1.ProjectFile(path, groupTree=True)
+    proj.tracer = r1.Tracer()
+    runStagesBefore(proj, templates, "createMasterView")
+
+    spans = [e for e in proj.tracer.events if e["cat"] == "template"]
+    assert len(spans)
+    for span in spans:
+        # Generating the rows is timed, not only passing them on
+        assert span["dur"] >= 1000 and span["args"]["rows"] > 0
+    proj.close()
+
+
+@pytest.mark.order(9)
+@pytest.mark.parametrize("project", [p[0] for p in PROJECTS] + [2, 8])
+def test_queryBudgets(templates, project):
+    os.makedirs("./Projects/Output/", exist_ok=True)
+    path = f"./Projects/Output/{project}-queries.dbpr"
+    if isinstance(project, int):
+        # Synthetic projects of growing size
+        synthetic.createProject(
+            path,
+            "./Projects/test_init.dbpr",
+            arrays=project,
+            subs=project,
+            apEnable=True,
+            channels=4,
+        )
+    else:
+        copyfile("./Projects/" + project, path)
+    # Larger projects have more pages
+    viewBudget = autor1.ViewBudget(maxControls=400, maxWidth=2000)
+
+    stages = autor1.getStages(templates, viewBudget)
+    assert [stage.__name__ for stage, _ in stages] == list(QUERY_BUDGETS)
+
+    # The second run also cleans up after the first
+    for _ in range(2):
+        proj = r1.ProjectFile(
+            path, groupTree=True, processingIndexes=True, sqlTrace=True
+        )
+        for stage, stageArgs in stages:
+            name = stage.__name__
+            before = proj.sqlTrace.getCalls()
+            stage(proj, *stageArgs)
+            calls = {
+                shape: count - before.get(shape, 0)
+                for shape, count in proj.sqlTrace.getCalls().items()
+                if count != before.get(shape, 0)
+            }
+
+            budget = QUERY_BUDGETS[name]
+            if name == "createMeterView":
+                budget += PAGE_QUERY_BUDGET * len(proj.meterViewIds)
+            elif name == "createMasterView":
+                budget += PAGE_QUERY_BUDGET * len(proj.masterViewIds)
+            assert sum(calls.values()) <= budget, f"{name} executed {calls}"
+        if project == 8:
+            assert len(proj.meterViewIds) > 1 and len(proj.masterViewIds) > 1
+        proj.close()
@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import re
+import types
+import pytest
+import r1py.r1py as r1
+import autor1.autor1 as autor1
+from shutil import copyfile, rmtree
+
+TEMP_FILE = "./dist/templates.r2t"
+MAIN_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "__main__.py")
+
+# The command line entry point, loaded under its own name so it is not run
+spec = importlib.util.spec_from_file_location("autor1main", MAIN_FILE)
+main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(main)
+
+
+def makeFolder(name):
+    folder = os.path.abspath("./Projects/Output/" + name)
+    if os.path.isdir(folder):
+        rmtree(folder)
+    os.makedirs(folder)
+    return folder
+
+
+@pytest.mark.order(9)
+def test_cacheLink():
+    folder = makeFolder("cacheLink")
+    projectPath = os.path.join(folder, "project.dbpr")
+    copyfile("./Projects/test_init.dbpr", projectPath)
+    args = main.parseArgs(
+        [folder, "--cache", os.path.join(folder, "cache"), "--cache-link"]
+    )
+    cache = autor1.OutputCache(args.cacheDir, 1 << 30, args.cacheLink)
+    digest = autor1.getTemplateFingerprint(TEMP_FILE)[2]
+    options = main.getCacheOptions(args)
+    templates = autor1.TemplateFile(TEMP_FILE)
+
+    key = cache.getKey(projectPath, digest, options)
+    assert main.processProject(projectPath, templates, args) == 0
+    autoPath = main.getAutoPath(projectPath)
+    cache.store(key, autoPath)
+    assert cache.fetch(key, autoPath)
+    assert os.path.samefile(autoPath, cache.getEntryPath(key))
+    with open(cache.getEntryPath(key), "rb") as f:
+        stored = f.read()
+
+    # A changed project misses, generating it must not write through the link
+    copyfile("./Projects/test_init_2.dbpr", projectPath)
+    assert not cache.fetch(cache.getKey(projectPath, digest, options), autoPath)
+    assert main.processProject(projectPath, templates, args) == 0
+    assert not os.path.samefile(autoPath, cache.getEntryPath(key))
+    with open(cache.getEntryPath(key), "rb") as f:
+        assert f.read() == stored
+    templates.close()
+
+
+@pytest.mark.order(9)
+@pytest.mark.parametrize("fastWrite", [False, True])
+def test_failedProject(monkeypatch, fastWrite):
+    folder = makeFolder(f"failedProject-{fastWrite}")
+    projectPath = os.path.join(folder, "project.dbpr")
+    copyfile("./Projects/test_init.dbpr", projectPath)
+    args = main.parseArgs([folder] + (["--fast-write"] if fastWrite else []))
+    templates = autor1.TemplateFile(TEMP_FILE)
+
+    def planMasterViews(proj, templates, budget=None):
+        raise RuntimeError("Failed")
+
+    # Fails once the earlier stages have written to the project
+    monkeypatch.setattr(autor1, "planMasterViews", planMasterViews)
+    with pytest.raises(RuntimeError):
+        main.processProject(projectPath, templates, args)
+    assert not os.path.exists(main.getAutoPath(projectPath))
+    templates.close()
+
+
+@pytest.mark.order(9)
+def test_profileProject(monkeypatch, capsys):
+    folder = makeFolder("profileProject")
+    copyfile("./Projects/test_init.dbpr", os.path.join(folder, "project.dbpr"))
+    templates = autor1.TemplateFile(TEMP_FILE)
+    args = main.parseArgs([folder, "--profile"])
+    os.makedirs(os.path.join(folder, "LOGS"))
+    # As main sets it, files are named after the log
+    args.profile = os.path.join(folder, "LOGS", "run")
+
+    monkeypatch.chdir(folder)
+    monkeypatch.setattr(main, "tracer", r1.Tracer())
+    assert main.runProfiledProject("project.dbpr", templates, args) == 0
+    templates.close()
+    # Memory is measured in a dry run, the project is generated and traced once
+    assert capsys.readouterr().out.count("Finished generating") == 1
+    assert len([e for e in main.tracer.events if e["cat"] == "project"]) == 1
+    assert os.path.isfile("./LOGS/run-project.prof")
+    assert os.path.isfile("project_AUTO.dbpr")
+    with open("./LOGS/run-project-profile.txt") as f:
+        summary = f.read()
+
+    assert "autor1/autor1.py:" in summary and "r1py/r1py.py:" in summary
+    assert "Memory held after" in summary
+    # Own times never add up to more than the whole run
+    elapsed = float(re.search(r"status 0, ([0-9.]+)s", summary)[1])
+    own = re.findall(r"^ +\d+ +([0-9.]+) +[0-9.]+  (?:autor1|r1py)/", summary, re.M)
+    assert len(own) and sum(float(t) for t in own) <= elapsed
+
+
+def test_getOwnTimes():
+    ours = os.path.abspath(autor1.__file__)
+    outer = (ours, 1, "outer")
+    inner = (ours, 2, "inner")
+    key = ("~", 0, "<built-in method builtins.sorted>")
+    enter = ("contextlib.py", 1, "__enter__")
+    # outer sorts with inner as the key and enters a context manager that runs inner
+    stats = types.SimpleNamespace(
+        stats={
+            outer: (1, 1, 0.1, 1.5, {}),
+            key: (1, 1, 0.1, 0.9, {outer: (1, 1, 0.1, 0.9)}),
+            enter: (1, 1, 0.2, 0.5, {outer: (1, 1, 0.2, 0.5)}),
+            inner: (2, 2, 1.1, 1.1, {key: (1, 1, 0.8, 0.8), enter: (1, 1, 0.3, 0.3)}),
+        }
+    )
+    own = main.getOwnTimes(stats)
+    assert own == pytest.approx({outer: 0.4, inner: 1.1})
+    assert sum(own.values()) == pytest.approx(1.5)
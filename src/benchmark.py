@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+import sys
+import os
+import argparse
+import math
+import json
+import time
+import tempfile
+import subprocess
+from shutil import copyfile, rmtree
+import r1py.r1py as r1
+import r1py.synthetic as synthetic
+import autor1.autor1 as autor1
+
+############################## CONSTANTS ##############################
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_FILE = os.path.join(SRC_DIR, "..", "Projects", "test_init.dbpr")
+TEMP_FILE = os.path.join(SRC_DIR, "..", "dist", "templates.r2t")
+MAIN_FILE = os.path.join(SRC_DIR, "__main__.py")
+
+# Stages whose time grows faster than size ** MAX_EXPONENT are flagged
+MAX_EXPONENT = 1.5
+# Stages faster than this at every size are too noisy to fit
+MIN_FIT_TIME = 0.01
+
+
+# Removing the output of a previous run, the first clean has nothing to delete
+RECLEAN_STAGE = "clean (rerun)"
+MAIN_STAGE = "main"
+
+############################## FUNCTIONS ##############################
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Time each AutoR1 stage on synthetic projects of growing size and report how it scales.",
+    )
+    parser.add_argument(
+        "-n",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[2, 4, 8, 16],
+        help="Number of TOPs arrays of each project, SUBs arrays are half as many",
+    )
+    parser.add_argument(
+        "-k",
+        "--channels",
+        type=int,
+        default=8,
+        help="Cabinets on each side of every array",
+    )
+    parser.add_argument(
+        "--ap", action="store_true", help="Enable array processing on TOPs arrays"
+    )
+    parser.add_argument(
+        "--no-sub-array",
+        dest="subArray",
+        action="store_false",
+        help="Do not add a SUB array with L/R/C positions",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs of each size, the fastest is reported",
+    )
+    parser.add_argument(
+        "--no-indexes",
+        dest="indexes",
+        action="store_false",
+        help="Do not create temporary processing indexes",
+    )
+    parser.add_argument(
+        "--no-main",
+        dest="main",
+        action="store_false",
+        help="Do not time the full command line pipeline",
+    )
+    parser.add_argument(
+        "--seed", default=SEED_FILE, help="Initialised project to copy the schema from"
+    )
+    parser.add_argument("--templates", default=TEMP_FILE, help="Template file")
+    parser.add_argument("--json", default=None, help="Also write results to a file")
+    return parser.parse_args(argv)
+
+
+def getProjectSize(path):
+    proj = r1.ProjectFile(path)
+    size = {
+        "cabinets": proj.cursor.execute("SELECT count(*) FROM Cabinets").fetchone()[0],
+        "groups": proj.getGroupCount(),
+    }
+    proj.close()
+    return size
+
+
+def timeStages(path, templates, indexes=True):
+    """Run every stage on a copy of a project, timing each one
+
+    Args:
+        path (string): Project to copy
+        templates (autor1.TemplateFile): Templates to use
+        indexes (bool, optional): Create temporary processing indexes. Defaults to True.
+
+    Returns:
+        dict: Seconds taken by each stage, by stage name
+    """
+    workPath = os.path.splitext(path)[0] + "_work.dbpr"
+    copyfile(path, workPath)
+    times = {}
+
+    proj = r1.ProjectFile(workPath, groupTree=True, processingIndexes=indexes)
+    for stage, stageArgs in autor1.getStages(templates):
+        startTime = time.perf_counter()
+        stage(proj, *stageArgs)
+        times[stage.__name__] = time.perf_counter() - startTime
+    proj.close()
+
+    proj = r1.ProjectFile(workPath, groupTree=True, processingIndexes=indexes)
+    startTime = time.perf_counter()
+    autor1.clean(proj)
+    times[RECLEAN_STAGE] = time.perf_counter() - startTime
+    proj.close()
+
+    os.remove(workPath)
+    return times
+
+
+def timeMain(path, templatePath):
+    """Time the command line on a folder holding one project, including start up
+
+    Returns:
+        float: Seconds taken
+    """
+    folder = tempfile.mkdtemp(dir=os.path.dirname(path))
+    copyfile(path, os.path.join(folder, os.path.basename(path)))
+    copyfile(templatePath, os.path.join(folder, "templates.r2t"))
+
+    startTime = time.perf_counter()
+    subprocess.run(
+        [sys.executable, MAIN_FILE, folder],
+        cwd=folder,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - startTime
+
+
+def getExponent(sizes, times):
+    """Least squares slope of log(time) against log(size)
+
+    A stage doing a constant amount of work per item scales with an exponent near 1,
+    one querying once per item against a growing table nearer 2.
+
+    Returns:
+        float: Exponent, None if the stage is too fast to measure
+    """
+    if len(sizes) < 2 or max(times) < MIN_FIT_TIME:
+        return None
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    xMean = sum(xs) / len(xs)
+    yMean = sum(ys) / len(ys)
+    num = sum((x - xMean) * (y - yMean) for x, y in zip(xs, ys))
+    den = sum((x - xMean) ** 2 for x in xs)
+    return num / den if den else None
+
+
+def printReport(results):
+    sizes = [r["size"]["cabinets"] for r in results["runs"]]
+    names = list(results["runs"][0]["times"])
+    width = max(len(n) for n in names)
+
+    print("Cabinets".ljust(width) + "".join(f"{s:>10}" for s in sizes) + "  Exponent")
+    for name in names:
+        exponent = results["exponents"][name]
+        line = name.ljust(width)
+        line += "".join(f"{r['times'][name] * 1000:>8.1f}ms" for r in results["runs"])
+        if exponent is None:
+            line += "         -"
+        else:
+            line += f"{exponent:>10.2f}"
+            if exponent > MAX_EXPONENT:
+                line += "  <- superlinear"
+        print(line)
+
+
+def main():
+    args = parseArgs(sys.argv[1:])
+    templates = autor1.TemplateFile(args.templates)
+    workDir = tempfile.mkdtemp(prefix="autor1-benchmark-")
+
+    runs = []
+    for n in sorted(args.sizes):
+        path = synthetic.createProject(
+            os.path.join(workDir, f"synthetic_{n}.dbpr"),
+            args.seed,
+            arrays=n,
+            subs=max(n // 2, 1),
+            apEnable=args.ap,
+            subArray=args.subArray,
+            channels=args.channels,
+        )
+        best = {}
+        for _ in range(args.repeat):
+            times = timeStages(path, templates, args.indexes)
+            times["total"] = sum(times.values())
+            if args.main:
+                times[MAIN_STAGE] = timeMain(path, args.templates)
+            for name, t in times.items():
+                best[name] = min(best.get(name, t), t)
+        runs.append({"arrays": n, "size": getProjectSize(path), "times": best})
+        print(f"Finished {n} arrays in {best['total']:.3f}s.")
+    templates.close()
+    rmtree(workDir)
+
+    sizes = [r["size"]["cabinets"] for r in runs]
+    results = {
+        "runs": runs,
+        "exponents": {
+            name: getExponent(sizes, [r["times"][name] for r in runs])
+            for name in runs[0]["times"]
+        },
+    }
+    printReport(results)
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    flagged = [n for n, e in results["exponents"].items() if e and e > MAX_EXPONENT]
+    if flagged:
+        print(f"Superlinear stages: {', '.join(flagged)}")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
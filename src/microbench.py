@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""Time the hot functions of r1py and autor1 against the test projects
+
+Benchmarks live in src/<package>/bench/bench_*.py next to the tests. Each is a
+function named bench_* whose arguments are chosen by name from:
+    proj - r1.ProjectFile of a fresh copy of a test project
+    templates - autor1.TemplateFile
+    templatePath - Path of the template file
+It does any untimed set up and returns the function to time. Benchmarks taking a
+proj run once per test project.
+
+Results are saved as JSON and can be compared against an earlier run, slowdowns
+that are both significant and larger than a threshold fail the run.
+"""
+
+import sys
+import os
+import argparse
+import gc
+import glob
+import importlib
+import inspect
+import json
+import math
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from shutil import copyfile, rmtree
+import r1py.r1py as r1
+import autor1.autor1 as autor1
+
+############################## CONSTANTS ##############################
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(SRC_DIR, "..", "Projects")
+TEMP_FILE = os.path.join(SRC_DIR, "..", "dist", "templates.r2t")
+LOGDIR = "./LOGS/"
+BENCH_PACKAGES = ["r1py", "autor1"]
+PROJECTS = [
+    "test_init_AP.dbpr",
+    "test_init.dbpr",
+    "test_init_2.dbpr",
+    "AC10.16 default.dbpr",
+]
+RESULTS_VERSION = 1
+
+############################## FUNCTIONS ##############################
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(
+        prog="microbench",
+        description="Time the hot functions of r1py and autor1 against the test projects.",
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        default=None,
+        help="Only run benchmarks whose name contains this",
+    )
+    parser.add_argument(
+        "-p",
+        "--passes",
+        type=int,
+        default=10,
+        help="Timed passes of each benchmark, each on a fresh copy of the project",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Results file, defaults to a timestamped file in the LOGS folder",
+    )
+    parser.add_argument(
+        "-c",
+        "--compare",
+        default=None,
+        help="Earlier results file to compare against",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Smallest relative slowdown of the median reported as a regression",
+    )
+    parser.add_argument(
+        "--min-delta",
+        dest="minDelta",
+        type=float,
+        default=0.5,
+        help="Smallest slowdown of the median in ms reported as a regression, below it timings are mostly noise",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.01,
+        help="Significance level of the slowdown",
+    )
+    parser.add_argument("--templates", default=TEMP_FILE, help="Template file")
+    return parser.parse_args(argv)
+
+
+def findBenchmarks(pattern=None):
+    """
+    Returns:
+        [(string, function)]: Name and function of each benchmark, in file order
+    """
+    benchmarks = []
+    for package in BENCH_PACKAGES:
+        files = glob.glob(os.path.join(SRC_DIR, package, "bench", "bench_*.py"))
+        for path in sorted(files):
+            moduleName = os.path.splitext(os.path.basename(path))[0]
+            module = importlib.import_module(f"{package}.bench.{moduleName}")
+            for name, fn in inspect.getmembers(module, inspect.isfunction):
+                if not name.startswith("bench_") or fn.__module__ != module.__name__:
+                    continue
+                fullName = f"{package}.{name[len('bench_'):]}"
+                if pattern is None or pattern in fullName:
+                    benchmarks.append((fullName, fn))
+    benchmarks.sort(key=lambda b: b[1].__code__.co_firstlineno)
+    benchmarks.sort(key=lambda b: BENCH_PACKAGES.index(b[0].split(".")[0]))
+    return benchmarks
+
+
+def timePass(fn, templatePath, projectPath=None, workDir=None):
+    """Run the set up of a benchmark then time the function it returns
+
+    Returns:
+        float: Seconds taken
+    """
+    args = inspect.signature(fn).parameters
+    kwargs = {}
+    proj = None
+    if projectPath is not None:
+        workPath = os.path.join(workDir, os.path.basename(projectPath))
+        copyfile(projectPath, workPath)
+        proj = r1.ProjectFile(workPath, groupTree=True, processingIndexes=True)
+        kwargs["proj"] = proj
+    templates = None
+    if "templates" in args:
+        templates = autor1.TemplateFile(templatePath)
+        kwargs["templates"] = templates
+    if "templatePath" in args:
+        kwargs["templatePath"] = templatePath
+
+    timed = fn(**kwargs)
+    gc.collect()
+    gc.disable()
+    try:
+        startTime = time.perf_counter()
+        timed()
+        elapsed = time.perf_counter() - startTime
+    finally:
+        gc.enable()
+        if templates is not None:
+            templates.close()
+        if proj is not None:
+            proj.close()
+    return elapsed
+
+
+def runBenchmarks(benchmarks, passes, templatePath):
+    """
+    Returns:
+        dict: Seconds taken by every pass, by benchmark and project name
+    """
+    workDir = tempfile.mkdtemp(prefix="autor1-microbench-")
+    results = {}
+    try:
+        for name, fn in benchmarks:
+            if "proj" in inspect.signature(fn).parameters:
+                cases = [
+                    (f"{name}[{p}]", os.path.join(PROJECT_DIR, p)) for p in PROJECTS
+                ]
+            else:
+                cases = [(name, None)]
+            for caseName, projectPath in cases:
+                # Warm up file system and import caches, not recorded
+                timePass(fn, templatePath, projectPath, workDir)
+                results[caseName] = [
+                    timePass(fn, templatePath, projectPath, workDir)
+                    for _ in range(passes)
+                ]
+                print(
+                    f"{caseName:<50}{statistics.median(results[caseName]) * 1000:>10.2f}ms"
+                )
+    finally:
+        rmtree(workDir)
+    return results
+
+
+def getSlowdownPValue(baseline, current):
+    """One sided Mann-Whitney U test that current samples are slower than baseline
+
+    Makes no assumption about the distribution of timings, which are skewed by
+    outliers. Uses the normal approximation, reasonable from about 8 samples each.
+
+    Returns:
+        float: p-value
+    """
+    ranked = sorted([(t, 0) for t in baseline] + [(t, 1) for t in current])
+    ranks = [0] * len(ranked)
+    i = 0
+    while i < len(ranked):
+        # Ties share their average rank
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        i = j + 1
+
+    n1, n2 = len(baseline), len(current)
+    u = sum(r for r, (_, g) in zip(ranks, ranked) if g) - n2 * (n2 + 1) / 2
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sd == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compareResults(baseline, current, threshold, alpha, minDelta=0):
+    """
+    Args:
+        baseline (dict): Earlier results
+        current (dict): New results
+        threshold (float): Smallest relative slowdown of the median that is a regression
+        alpha (float): Significance level
+        minDelta (float, optional): Smallest slowdown of the median in seconds that is a regression. Defaults to 0.
+
+    Returns:
+        [string]: Names of regressed benchmarks
+    """
+    regressions = []
+    for key in ["python", "platform"]:
+        if baseline.get(key) != current.get(key):
+            print(
+                f"Baseline {key} {baseline.get(key)} differs from {current.get(key)}, timings may not be comparable."
+            )
+
+    print(f"{'Benchmark':<50}{'Baseline':>12}{'Current':>12}{'Change':>9}{'p':>8}")
+    for name, samples in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = statistics.median(baseline["results"][name])
+        after = statistics.median(samples)
+        change = after / before - 1 if before else 0
+        p = getSlowdownPValue(baseline["results"][name], samples)
+        line = f"{name:<50}{before * 1000:>10.2f}ms{after * 1000:>10.2f}ms{change:>+9.1%}{p:>8.3f}"
+        if change > threshold and after - before > minDelta and p < alpha:
+            line += "  <- regression"
+            regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    args = parseArgs(sys.argv[1:])
+
+    benchmarks = findBenchmarks(args.filter)
+    if not len(benchmarks):
+        print("No benchmarks found.")
+        sys.exit(1)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "passes": args.passes,
+        "results": runBenchmarks(benchmarks, args.passes, args.templates),
+    }
+
+    output = args.output
+    if output is None:
+        if not os.path.exists(LOGDIR):
+            os.makedirs(LOGDIR)
+        timestamp = datetime.now().strftime("%d-%b-%Y-%H-%M-%S")
+        output = LOGDIR + timestamp + "-microbench.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}.")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("version") != RESULTS_VERSION:
+            print(f"Unsupported results file {args.compare}.")
+            sys.exit(1)
+        regressions = compareResults(
+            baseline, results, args.threshold, args.alpha, args.minDelta / 1000
+        )
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
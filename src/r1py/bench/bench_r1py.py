@@ -0,0 +1,11 @@
+# Benchmarks run by src/microbench.py, see its docstring for the conventions
+
+
+def bench_deleteGroup(proj):
+    groupId = proj.getGroupIdFromName("Left/Right")[0]
+    return lambda: proj.deleteGroup(groupId)
+
+
+def bench_deleteMasterGroup(proj):
+    groupId = proj.getGroupIdFromName("Master")[0]
+    return lambda: proj.deleteGroup(groupId)
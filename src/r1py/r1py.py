@@ -1,8 +1,15 @@
 import sqlite3
 import logging
-from abc import ABCMeta
+import json
+from abc import ABC, ABCMeta, abstractmethod
+import os
 import os.path
+import re
 import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 
 log = logging.getLogger(__name__)
 # log.addHandler(logging.StreamHandler(sys.stdout))
@@ -69,21 +76,372 @@ SOURCEGROUPS_TYPE_PointSource = 2
 SOURCEGROUPS_TYPE_SUBarray = 3
 SOURCEGROUPS_TYPE_Device = 3
 
+GROUPS_COL_GroupId = 0
+GROUPS_COL_Name = 1
+GROUPS_COL_ParentId = 2
+GROUPS_COL_Type = 5
+
+# Number of ids bound per set-based statement, unused slots are padded with NULL
+ID_BATCH_SIZE = 250
+
 CONTROLS_TargetType_Group = 0
 CONTROLS_TargetType_Device = 2
 CONTROLS_TargetType_View = 5
 
+# Columns written when inserting a new control, in the order rows are passed to ControlWriter
+CONTROLS_COLUMNS = [
+    "Type",
+    "PosX",
+    "PosY",
+    "Width",
+    "Height",
+    "ViewId",
+    "DisplayName",
+    "JoinedId",
+    "LimitMin",
+    "LimitMax",
+    "MainColor",
+    "SubColor",
+    "LabelColor",
+    "LabelFont",
+    "LabelAlignment",
+    "LineThickness",
+    "ThresholdValue",
+    "Flags",
+    "ActionType",
+    "TargetType",
+    "TargetId",
+    "TargetChannel",
+    "TargetProperty",
+    "TargetRecord",
+    "ConfirmOnMsg",
+    "ConfirmOffMsg",
+    "PictureIdDay",
+    "PictureIdNight",
+    "Font",
+    "Alignment",
+    "Dimension",
+]
+CONTROLS_INSERT = "INSERT INTO Controls ({}) VALUES ({})".format(
+    ", ".join(f'"{c}"' for c in CONTROLS_COLUMNS),
+    ", ".join("?" * len(CONTROLS_COLUMNS)),
+)
+
+# Indexes created while a project is being processed, R1 projects ship without them.
+# They are always dropped again before the project is saved.
+PROCESSING_INDEXES = {
+    "r1py_Groups_ParentId": "Groups(ParentId)",
+    "r1py_Groups_Name": "Groups(Name)",
+    "r1py_Controls_ViewId": "Controls(ViewId)",
+    "r1py_Controls_JoinedId": "Controls(JoinedId)",
+    "r1py_Controls_Target": "Controls(TargetId, TargetChannel)",
+    "r1py_Cabinets_Channel": "Cabinets(DeviceId, AmplifierChannel)",
+}
+
+##### Pragmas used when writing an in-memory database out with saveAs #####
+# The output is written to a temporary file and renamed once complete, so
+# journaling and syncing each page buys nothing.
+FAST_WRITE_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -65536,  # KiB
+}
+
+##### Named, parameterised statements #####
+# Values are always bound rather than formatted into the SQL so each statement
+# text stays constant and sqlite3 can reuse the prepared statement from its cache.
+STATEMENT_CACHE_SIZE = 256
+
+QUERIES = {
+    "tableExists": "SELECT * FROM sqlite_master WHERE name = ? AND type = 'table'",
+    "groupById": "SELECT * FROM Groups WHERE GroupId = ?",
+    "groupRootAndChildren": "SELECT * FROM Groups WHERE GroupId = 1 OR ParentId = 1",
+    "groupChildren": "SELECT GroupId FROM Groups WHERE ParentId = ?",
+    "groupName": "SELECT Name FROM Groups WHERE GroupId = ?",
+    "groupParent": "SELECT ParentId FROM Groups WHERE GroupId = ?",
+    "groupIdsFromName": "SELECT GroupId FROM Groups WHERE Name = ? ORDER BY GroupId",
+    "groupMaxId": "SELECT max(GroupId) FROM Groups",
+    "groupRange": "SELECT * FROM Groups WHERE GroupId BETWEEN ? AND ? ORDER BY GroupId ASC",
+    "groupInsert": "INSERT INTO Groups (Name, ParentId, TargetId, TargetChannel, Type, Flags) VALUES (?, ?, ?, ?, ?, ?)",
+    "groupDelete": "DELETE FROM Groups WHERE GroupId = ?",
+    "groupDeleteBatch": f"DELETE FROM Groups WHERE GroupId IN ({', '.join('?' * ID_BATCH_SIZE)})",
+    "groupDeleteSubtree": (
+        # Starts with DELETE so sqlite3 still opens a transaction for it
+        " DELETE FROM Groups WHERE GroupId IN ( "
+        "   WITH RECURSIVE subtree(GroupId) AS ( "
+        "      SELECT ? "
+        "      UNION "
+        "      SELECT Groups.GroupId FROM Groups JOIN subtree ON Groups.ParentId = subtree.GroupId "
+        "   ) "
+        "   SELECT GroupId FROM subtree "
+        " ) "
+    ),
+    "groupAll": "SELECT * FROM Groups ORDER BY GroupId ASC",
+    "sourceGroupIds": "SELECT SourceGroupId FROM SourceGroups WHERE Name != 'Unused channels'",
+    "sourceGroupIdsSkipRight": "SELECT SourceGroupId FROM SourceGroups WHERE Name != 'Unused channels' AND OrderIndex != -1",
+    "sourceGroupAll": "SELECT SourceGroupId, Name FROM SourceGroups ORDER BY SourceGroupId ASC",
+    "sourceGroupNameFromType": "SELECT Name FROM SourceGroups WHERE Type = ?",
+    "viewAll": "SELECT ViewId, Name FROM Views ORDER BY ViewId ASC",
+    "viewInsert": 'INSERT INTO Views("Type","Name","Icon","Flags","HomeViewIndex","NaviBarIndex","HRes","VRes","ZoomLevel","ScalingFactor","ScalingPosX","ScalingPosY","ReferenceVenueObjectId") VALUES (1000,?,NULL,4,NULL,-1,?,?,100,NULL,NULL,NULL,NULL)',
+    "viewIdsFromType": "SELECT ViewId FROM Views WHERE Type = ?",
+    "viewDelete": "DELETE FROM Views WHERE ViewId = ?",
+    "viewDeleteBatch": f"DELETE FROM Views WHERE ViewId IN ({', '.join('?' * ID_BATCH_SIZE)})",
+    "controlMaxId": "SELECT max(ControlId) FROM Controls",
+    "controlMaxJoinedId": "SELECT JoinedId FROM Controls ORDER BY JoinedId DESC LIMIT 1",
+    "controlDeleteFromView": "DELETE FROM Controls WHERE ViewId = ?",
+    "controlDeleteFromViewBatch": f"DELETE FROM Controls WHERE ViewId IN ({', '.join('?' * ID_BATCH_SIZE)})",
+    "controlDeleteBatch": f"DELETE FROM Controls WHERE ControlId IN ({', '.join('?' * ID_BATCH_SIZE)})",
+    "controlInsert": CONTROLS_INSERT,
+}
+
+
+def registerQueries(queries):
+    """Add named statements to the shared query registry
+
+    Args:
+        queries (dict): Statement name to SQL text. Values must be bound with '?' placeholders.
+
+    Raises:
+        ValueError: A different statement is already registered under the same name
+    """
+    for name, sql in queries.items():
+        if name in QUERIES and QUERIES[name] != sql:
+            raise ValueError(f"Query {name} is already registered")
+        QUERIES[name] = sql
+
+
+##### SQL statement tracing #####
+
+# Literals in traced statements, replaced with ? so each statement shape is counted once.
+# Quoted identifiers are matched so their contents are left alone.
+SQL_LITERAL_PATTERN = re.compile(
+    r"""(?P<ident>"(?:[^"]|"")*")|[xX]'[0-9a-fA-F]*'|'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b|\bNULL\b""",
+    re.IGNORECASE,
+)
+# Statements EXPLAIN QUERY PLAN is captured for
+SQL_PLAN_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def normaliseSql(sql):
+    """Reduce a statement to its shape, with literals replaced by ? and whitespace collapsed
+
+    Args:
+        sql (string): Statement as passed to the trace callback, with bound values expanded
+
+    Returns:
+        string: Statement shape
+    """
+    sql = SQL_LITERAL_PATTERN.sub(
+        lambda m: m.group("ident") if m.group("ident") else "?", sql
+    )
+    return " ".join(sql.split())
+
+
+class TracedStatement(object):
+    def __init__(self, sql):
+        """Totals for every statement sharing a shape
+
+        Args:
+            sql (string): First statement seen with this shape
+        """
+        self.sql = sql
+        self.count = 0
+        self.calls = 0  # Times executed from Python, executemany counts once
+        self.seconds = 0.0
+        self.plan = None  # [string] of EXPLAIN QUERY PLAN, indented by depth
+
+
+class SqlTrace(object):
+    def __init__(self):
+        """Count, time and capture the query plan of every statement run on a connection
+
+        Statements are counted by the connection's trace callback. Trigger programs
+        are reported as their triggering statement, so they add to its count. Time is
+        measured by TracingCursor and TracingConnection around each call that steps a
+        statement, including fetching its rows, less the time spent in the callback.
+        """
+        self.statements = {}  # shape -> TracedStatement
+        self.current = None
+        self.pendingPlans = []
+        self.paused = False
+        self.overhead = 0.0  # Seconds spent in callback
+        self.calls = 0
+        # (prefix, shape) of the running executemany, its rows are not normalised one by one
+        self.many = None
+
+    def callback(self, sql):
+        if self.paused:
+            return
+        startTime = time.perf_counter()
+        if self.many is not None and sql.startswith(self.many[0]):
+            shape = self.many[1]
+        else:
+            shape = normaliseSql(sql)
+        statement = self.statements.get(shape)
+        if statement is None:
+            statement = self.statements[shape] = TracedStatement(sql)
+            if shape.upper().startswith(SQL_PLAN_STATEMENTS):
+                self.pendingPlans.append(statement)
+        statement.count += 1
+        self.current = statement
+        self.overhead += time.perf_counter() - startTime
+
+    def addTime(self, statement, seconds):
+        if statement is not None:
+            statement.seconds += seconds
+
+    def capturePlans(self, db):
+        """Run EXPLAIN QUERY PLAN for statement shapes seen for the first time
+
+        Called once the statement has run, the trace callback cannot use the connection itself.
+
+        Args:
+            db (sqlite3.Connection): Connection the statements ran on
+        """
+        if not len(self.pendingPlans):
+            return
+        pending, self.pendingPlans = self.pendingPlans, []
+        self.paused = True
+        try:
+            cursor = sqlite3.Cursor(db)
+            for statement in pending:
+                try:
+                    rows = cursor.execute("EXPLAIN QUERY PLAN " + statement.sql)
+                    depths = {0: -1}
+                    statement.plan = []
+                    for id, parent, _, detail in rows.fetchall():
+                        depths[id] = depths.get(parent, -1) + 1
+                        statement.plan.append(("  " * depths[id]) + detail)
+                except sqlite3.Error as e:
+                    statement.plan = [f"No plan - {e}"]
+            cursor.close()
+        finally:
+            self.paused = False
+
+    def getCount(self):
+        """
+        Returns:
+            int: Statements run since tracing started, each row of executemany counted
+        """
+        return sum(s.count for s in self.statements.values())
+
+    def getCalls(self):
+        """Statements executed from Python, the number that grows when a query is issued per row
+
+        Returns:
+            dict: Shape to number of calls, of every shape called at least once
+        """
+        return {shape: s.calls for shape, s in self.statements.items() if s.calls}
+
+    def getReport(self, limit=None):
+        """Describe every statement shape, the most time consuming first
+
+        Plans scanning a whole table are marked, with the number of runs these are
+        where missing indexes and queries issued once per row show up.
+
+        Args:
+            limit (int, optional): Number of shapes to include. Defaults to None, all of them.
+
+        Returns:
+            string: Report
+        """
+        statements = sorted(
+            self.statements.items(), key=lambda s: (-s[1].seconds, -s[1].count)
+        )
+        lines = [
+            f"SQL trace - {len(statements)} statement shapes, {self.getCount()} runs from {self.calls} calls, "
+            f"{sum(s.seconds for _, s in statements) * 1000:.3f}ms, "
+            f"{self.overhead * 1000:.3f}ms tracing overhead"
+        ]
+        for shape, statement in statements[:limit]:
+            scan = any(
+                line.lstrip().startswith("SCAN ") and "INDEX" not in line
+                for line in statement.plan or []
+            )
+            lines.append(
+                f"{statement.count:>8} x {statement.seconds * 1000:>10.3f}ms"
+                f"{'  [SCAN]' if scan else ''}  {shape}"
+            )
+            for line in statement.plan or []:
+                lines.append(f"{'':>29}{line}")
+        return "\n".join(lines)
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor timing each call against the statement the trace callback last saw"""
+
+    def __timed(self, fn, *args):
+        trace = self.connection.sqlTrace
+        overhead = trace.overhead
+        startTime = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - startTime - (trace.overhead - overhead)
+            if fn.__name__.startswith("execute"):
+                self.statement = trace.current
+                trace.calls += 1
+                if trace.current is not None:
+                    trace.current.calls += 1
+            trace.addTime(getattr(self, "statement", None), elapsed)
+            trace.capturePlans(self.connection)
+
+    def execute(self, *args):
+        return self.__timed(super().execute, *args)
+
+    def executemany(self, sql, *args):
+        # Expanded rows keep the statement text up to the first parameter
+        trace = self.connection.sqlTrace
+        trace.many = (sql.split("?")[0], normaliseSql(sql))
+        try:
+            return self.__timed(super().executemany, sql, *args)
+        finally:
+            trace.many = None
+
+    def executescript(self, *args):
+        return self.__timed(super().executescript, *args)
+
+    def fetchone(self):
+        return self.__timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self.__timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self.__timed(super().fetchall)
+
+    def __next__(self):
+        return self.__timed(super().__next__)
+
+
+class TracingConnection(sqlite3.Connection):
+    """Connection whose cursors are TracingCursors, commits are timed too"""
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        overhead = self.sqlTrace.overhead
+        startTime = time.perf_counter()
+        super().commit()
+        elapsed = time.perf_counter() - startTime - (self.sqlTrace.overhead - overhead)
+        self.sqlTrace.addTime(self.sqlTrace.current, elapsed)
+
+
 ##### An R1 SQL File (.dbpr project file or .r1t template file) #####
 
 
 class sqlDbFile(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self, path):
+    def __init__(self, path, inMemory=False, sqlTrace=False):
         """Load existing SQL database file
 
         Args:
             f (string): Path to database file
+            inMemory (bool, optional): Work on an in-memory copy, the file is never modified. Defaults to False.
+            sqlTrace (bool, optional): Count, time and explain every statement, see SqlTrace. The report is logged on close. Defaults to False.
 
         Raises:
             Exception: If file does not exist
@@ -92,23 +450,295 @@ class sqlDbFile(object):
             raise Exception("File does not exist.")
 
         self.f = path
-        self.db = sqlite3.connect(self.f)
+        self.inMemory = inMemory
+        self.sqlTrace = SqlTrace() if sqlTrace else None
+        factory = TracingConnection if sqlTrace else sqlite3.Connection
+        if inMemory:
+            self.db = sqlite3.connect(
+                ":memory:", cached_statements=STATEMENT_CACHE_SIZE, factory=factory
+            )
+            src = sqlite3.connect(self.f)
+            try:
+                src.backup(self.db)
+            finally:
+                src.close()
+        else:
+            self.db = sqlite3.connect(
+                self.f, cached_statements=STATEMENT_CACHE_SIZE, factory=factory
+            )
+        if sqlTrace:
+            self.db.sqlTrace = self.sqlTrace
+            self.db.set_trace_callback(self.sqlTrace.callback)
         self.cursor = self.db.cursor()
         log.info("Loaded file - " + self.f)
 
-    def close(self):
+    def query(self, name, params=()):
+        """Execute a statement from the query registry
+
+        Args:
+            name (string): Name of statement in QUERIES
+            params (tuple, optional): Values bound to the statement placeholders. Defaults to ().
+
+        Returns:
+            sqlite3.Cursor: Cursor holding any result rows
+        """
+        return self.cursor.execute(QUERIES[name], params)
+
+    def queryMany(self, name, seq):
+        """Execute a statement from the query registry once for each set of values
+
+        Args:
+            name (string): Name of statement in QUERIES
+            seq (iterable): Sequence of parameter tuples
+
+        Returns:
+            sqlite3.Cursor: Cursor used to run the statement
+        """
+        return self.cursor.executemany(QUERIES[name], seq)
+
+    def saveAs(self, path, pragmas=FAST_WRITE_PRAGMAS):
+        """Write the database to a new file with the backup API
+
+        Pages are copied into a temporary file beside path which is synced and
+        then renamed over path, so path is either left untouched or complete.
+
+        Args:
+            path (string): Destination file, replaced if it exists
+            pragmas (dict, optional): Pragmas applied to the destination before copying. Defaults to FAST_WRITE_PRAGMAS.
+        """
+        self.db.commit()
+        fd, tmpPath = tempfile.mkstemp(
+            suffix=".tmp",
+            prefix=os.path.basename(path) + ".",
+            dir=os.path.dirname(os.path.abspath(path)),
+        )
+        os.close(fd)
+        try:
+            dst = sqlite3.connect(tmpPath)
+            try:
+                for name, value in pragmas.items():
+                    dst.execute(f"PRAGMA {name} = {value}")
+                self.db.backup(dst)
+            finally:
+                dst.close()
+            with open(tmpPath, "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(tmpPath, path)
+        except:
+            os.remove(tmpPath)
+            raise
+        log.info(f"Saved {self.f} to {path}")
+
+    def close(self, commit=True):
+        """
+        Args:
+            commit (bool, optional): Commit changes, otherwise they are rolled back. Defaults to True.
+        """
+        if not commit:
+            self.db.rollback()
         # This can fail on Windows in some cases
         try:
             self.db.commit()
         except:
             pass
         self.db.close()
+        if self.sqlTrace is not None:
+            log.info(self.sqlTrace.getReport())
+
+
+def idBatches(ids):
+    """Split ids into fixed size tuples for set-based statements
+
+    Args:
+        ids ([int]): Ids to split
+
+    Returns:
+        [tuple]: Tuples of ID_BATCH_SIZE ids, the last padded with None
+    """
+    ids = list(ids)
+    batches = []
+    for i in range(0, len(ids), ID_BATCH_SIZE):
+        batch = ids[i : i + ID_BATCH_SIZE]
+        batches.append(tuple(batch + [None] * (ID_BATCH_SIZE - len(batch))))
+    return batches
+
+
+##### In-memory index of the Groups table #####
+
+
+class GroupTree(object):
+    def __init__(self, rows):
+        """Index Groups rows by id, parent and name
+
+        Args:
+            rows ([tuple]): Complete rows from the Groups table
+        """
+        self.rows = {}
+        self.children = {}
+        self.names = {}
+        # Incremented on every change so derived data can tell when it is stale
+        self.version = 0
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        """Add a single Groups row to the index
+
+        Args:
+            row (tuple): Complete row from the Groups table
+        """
+        groupId = row[GROUPS_COL_GroupId]
+        self.rows[groupId] = row
+        self.children.setdefault(row[GROUPS_COL_ParentId], []).append(groupId)
+        self.names.setdefault(row[GROUPS_COL_Name], []).append(groupId)
+        self.version += 1
+
+    def remove(self, groupId):
+        """Remove a single group from the index, children are left in place
+
+        Args:
+            groupId (int): GroupID to remove
+        """
+        row = self.rows.pop(groupId)
+        if row[GROUPS_COL_ParentId] in self.children:
+            self.children[row[GROUPS_COL_ParentId]].remove(groupId)
+        self.names[row[GROUPS_COL_Name]].remove(groupId)
+        self.children.pop(groupId, None)
+        self.version += 1
+
+    def getName(self, groupId):
+        return self.rows[groupId][GROUPS_COL_Name]
+
+    def getParentId(self, groupId):
+        return self.rows[groupId][GROUPS_COL_ParentId]
+
+    def getChildIds(self, groupId):
+        return list(self.children.get(groupId, []))
+
+    def getIdsFromName(self, name):
+        return list(self.names.get(name, []))
+
+    def getSubtreeIds(self, groupId):
+        """Get a group and all of its descendants
+
+        Args:
+            groupId (int): GroupID at the top of the subtree
+
+        Returns:
+            [int]: GroupIDs with every child listed before its parent
+        """
+        order = []
+        stack = [(groupId, False)]
+        while len(stack):
+            gId, visited = stack.pop()
+            if visited:
+                order.append(gId)
+                continue
+            stack.append((gId, True))
+            for child in reversed(self.children.get(gId, [])):
+                stack.append((child, False))
+        return order
+
+    def getAncestorIds(self, groupId):
+        """Get the chain of parents above a group
+
+        Args:
+            groupId (int): GroupID to start from
+
+        Returns:
+            [int]: GroupIDs from the direct parent up to the root
+        """
+        ancestors = []
+        parentId = self.getParentId(groupId)
+        while parentId in self.rows and parentId not in ancestors:
+            ancestors.append(parentId)
+            parentId = self.getParentId(parentId)
+        return ancestors
+
+
+##### Cached lookups for Views, SourceGroups and Groups #####
+
+
+class ProjectIndex(object):
+    def __init__(self, proj):
+        """Lazily load the small name/id tables of a project into dictionaries
+
+        Each table is read once on first use and held until invalidated by a
+        method that changes it.
+
+        Args:
+            proj (ProjectFile): Project to index
+        """
+        self.proj = proj
+        self.tables = {}
+
+    def invalidate(self, *tables):
+        """Drop cached tables so they are reloaded on next use
+
+        Args:
+            tables (string): Names of tables to drop, all tables if none given
+        """
+        for table in tables or list(self.tables):
+            self.tables.pop(table, None)
+
+    def getViews(self):
+        """
+        Returns:
+            dict: View name to ViewId
+        """
+        if "Views" not in self.tables:
+            views = {}
+            for viewId, name in self.proj.query("viewAll").fetchall():
+                views.setdefault(name, viewId)
+            self.tables["Views"] = views
+        return self.tables["Views"]
+
+    def getSourceGroups(self):
+        """
+        Returns:
+            (dict, dict): SourceGroupId to name and name to SourceGroupId
+        """
+        if "SourceGroups" not in self.tables:
+            idToName, nameToId = {}, {}
+            for srcId, name in self.proj.query("sourceGroupAll").fetchall():
+                idToName[srcId] = name
+                nameToId.setdefault(name, srcId)
+            self.tables["SourceGroups"] = (idToName, nameToId)
+        return self.tables["SourceGroups"]
+
+    def getGroups(self):
+        """
+        Returns:
+            GroupTree: The project's own tree index if built, otherwise a cached copy
+        """
+        if self.proj.groupTree is not None:
+            return self.proj.groupTree
+        if "Groups" not in self.tables:
+            self.tables["Groups"] = GroupTree(self.proj.query("groupAll").fetchall())
+        return self.tables["Groups"]
+
+
+class GroupRef(object):
+    def __init__(self, index):
+        """Parent placeholder for ProjectFile.createGroups
+
+        Args:
+            index (int): Position of a row earlier in the same batch
+        """
+        self.index = index
 
 
 # Load project file + get joined id for new entries
 class ProjectFile(sqlDbFile):
-    def __init__(self, f):
-        super().__init__(f)  # Inherit from parent class
+    def __init__(
+        self,
+        f,
+        groupTree=False,
+        processingIndexes=False,
+        inMemory=False,
+        sqlTrace=False,
+    ):
+        super().__init__(f, inMemory, sqlTrace)  # Inherit from parent class
         self.mId = 0
         self.meterViewId = -1
         self.masterViewId = -1
@@ -116,10 +746,112 @@ class ProjectFile(sqlDbFile):
         self.pId = -1
         self.groups = []
         self.sourceGroups = []
+        # (ViewId, unit, fingerprint, PosX, [JoinedId]) of generated views, see autor1.saveManifest
+        self.viewUnits = []
+        self.groupTree = None
+        self.index = ProjectIndex(self)
+        self.processingIndexes = []
+        # Ids of rows inserted through this object, by table
+        self.created = {"Groups": [], "Views": [], "Controls": [], "JoinedIds": []}
+        # Existing groups handed back in place of identical new ones, see keepGroups
+        self.keptGroups = {}
+        # Where generated controls go, see getControlSink
+        self.controlSink = None
+        # Records spans of processing, see span
+        self.tracer = NullTracer()
 
         if self.isInitialised():
             self.mId = self.getMasterID()
             self.getNextJoinedID()
+            if groupTree:
+                self.buildGroupTree()
+            if processingIndexes:
+                self.createProcessingIndexes()
+
+    def close(self, commit=True):
+        try:
+            if commit:
+                self.dropProcessingIndexes()
+        finally:
+            super().close(commit)
+
+    def saveAs(self, path, pragmas=FAST_WRITE_PRAGMAS):
+        # Processing indexes are never part of a saved project
+        self.dropProcessingIndexes()
+        super().saveAs(path, pragmas)
+
+    def createProcessingIndexes(self):
+        """Add indexes used while generating, see PROCESSING_INDEXES
+
+        These are removed by dropProcessingIndexes, which close() always calls
+        before committing so the saved project keeps the schema R1 expects.
+
+        sqlite3 runs CREATE INDEX outside of a transaction, committing it at once.
+        A transaction is opened first so the indexes share it with everything
+        generated afterwards, ControlWriter included. Only close() and saveAs()
+        commit it, a crash before then leaves the file as it was.
+        """
+        if not self.db.in_transaction:
+            self.cursor.execute("BEGIN")
+        for name, columns in PROCESSING_INDEXES.items():
+            if name in self.processingIndexes:
+                continue
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+            self.processingIndexes.append(name)
+        log.info(f"Created {len(self.processingIndexes)} processing indexes.")
+
+    def dropProcessingIndexes(self):
+        """Remove all indexes added by createProcessingIndexes"""
+        while len(self.processingIndexes):
+            name = self.processingIndexes.pop()
+            self.cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            log.info(f"Dropped processing index {name}.")
+
+    @contextmanager
+    def span(self, name, category="autor1", **args):
+        """Time a block of code with tracer, recording the number of rows it changed
+
+        Args:
+            name (string): Name shown for the span
+            category (string, optional): Category used to filter spans. Defaults to "autor1".
+            **args: Values shown with the span
+
+        Yields:
+            dict: Arguments of the span, values added inside the block are recorded
+        """
+        if not self.tracer.enabled:
+            yield args
+            return
+        changes = self.db.total_changes
+        with self.tracer.span(name, category, **args) as spanArgs:
+            yield spanArgs
+            spanArgs["rows"] = self.db.total_changes - changes
+
+    def getControlSink(self):
+        """Get the sink generated controls should be written to
+
+        Returns:
+            ControlSink: controlSink if one has been set, otherwise a new ControlWriter for this project
+        """
+        if self.controlSink is not None:
+            return self.controlSink
+        return ControlWriter(self)
+
+    def buildGroupTree(self):
+        """Load the Groups table into an in-memory GroupTree with a single scan
+
+        Once built the tree is kept in sync by createGrp and deleteGroup.
+
+        Returns:
+            GroupTree: The loaded index
+        """
+        self.groupTree = GroupTree(self.query("groupAll").fetchall())
+        log.info(f"Indexed {len(self.groupTree.rows)} groups.")
+        return self.groupTree
+
+    def dropGroupTree(self):
+        """Discard the in-memory Groups index, lookups go back to querying the project"""
+        self.groupTree = None
 
     def getGroupCount(self):
         """Get total number of entries in Group table
@@ -127,8 +859,7 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: Number of items in Group table
         """
-        self.cursor.execute(f"SELECT * FROM Groups")
-        return len(self.cursor.fetchall())
+        return len(self.index.getGroups().rows)
 
     def isInitialised(self):
         """Checks if initial R1 setup has been performed
@@ -136,20 +867,13 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: 1 if initialised, 0 if not
         """
-        self.cursor.execute(
-            f"SELECT * FROM sqlite_master WHERE name ='Groups' and type='table'"
-        )
-        if self.cursor.fetchone() is None:
+        if self.query("tableExists", ("Groups",)).fetchone() is None:
             return 0
 
-        self.cursor.execute(
-            f"SELECT * FROM sqlite_master WHERE name ='Views' and type='table'"
-        )
-        if self.cursor.fetchone() is None:
+        if self.query("tableExists", ("Views",)).fetchone() is None:
             return 0
 
-        self.cursor.execute(f"SELECT * FROM Groups WHERE GroupId = 1 or ParentId = 1")
-        rtn = self.cursor.fetchall()
+        rtn = self.query("groupRootAndChildren").fetchall()
         if rtn is None or len(rtn) < 3:
             return 0
 
@@ -161,21 +885,74 @@ class ProjectFile(sqlDbFile):
         Args:
             gId (int): GroupID to delete
         """
-        self.cursor.execute(f"SELECT GroupId FROM Groups WHERE ParentId = {groupID}")
-        children = self.cursor.fetchall()
-        for child in children:
-            self.deleteGroup(child[0])
+        if self.groupTree is not None:
+            self.__deleteGroupTree(groupID)
+            return
+        self.index.invalidate("Groups")
+
+        name = self.query("groupName", (groupID,)).fetchone()[0]
+        deleted = self.query("groupDeleteSubtree", (groupID,)).rowcount
+        log.info(f"Deleted {name} ({groupID}) and {deleted - 1} groups below it")
+
+    def __deleteGroupTree(self, groupID):
+        """Delete a subtree found through the in-memory index using batched deletes
+
+        Args:
+            groupID (int): GroupID at the top of the subtree
+        """
+        tree = self.groupTree
+        subtree = tree.getSubtreeIds(groupID)
+        for gId in subtree:
+            pId = tree.getParentId(gId)
+            pName = tree.getName(pId) if pId in tree.rows else None
+            log.info(f"Deleting {tree.getName(gId)} ({gId}) from {pName}")
 
-        # Logging
-        self.cursor.execute(f"SELECT Name FROM Groups WHERE GroupId = {groupID}")
-        name = self.cursor.fetchone()[0]
-        self.cursor.execute(f"SELECT ParentId FROM Groups WHERE GroupId = {groupID}")
-        pId = self.cursor.fetchone()[0]
-        self.cursor.execute(f"SELECT Name FROM Groups WHERE GroupId = {pId}")
-        pName = self.cursor.fetchone()[0]
-        log.info(f"Deleting {name} ({groupID}) from {pName}")
+        self.queryMany("groupDeleteBatch", idBatches(subtree))
+        for gId in subtree:
+            tree.remove(gId)
 
-        self.cursor.execute(f"DELETE FROM Groups WHERE GroupId = {groupID}")
+    def deleteGroups(self, groupIds):
+        """Delete a set of groups with batched deletes, children are not followed
+
+        Args:
+            groupIds ([int]): GroupIDs to delete
+        """
+        groupIds = list(groupIds)
+        self.queryMany("groupDeleteBatch", idBatches(groupIds))
+        if self.groupTree is not None:
+            for gId in groupIds:
+                if gId in self.groupTree.rows:
+                    self.groupTree.remove(gId)
+        else:
+            self.index.invalidate("Groups")
+        log.info(f"Deleted {len(groupIds)} groups.")
+
+    def getChildGroupIds(self, groupID):
+        """Get GroupIDs of the direct children of a group
+
+        Args:
+            groupID (int): Parent GroupID
+
+        Returns:
+            [int]: GroupIDs of child groups
+        """
+        return self.index.getGroups().getChildIds(groupID)
+
+    def getGroupIdFromNameAndParent(self, name, parentId):
+        """Get the GroupID of a named group directly under a parent
+
+        Args:
+            name (string): Name of group to find
+            parentId (int): GroupID of parent
+
+        Returns:
+            int: GroupID of matching group or None if not found
+        """
+        groups = self.index.getGroups()
+        for gId in groups.getIdsFromName(name):
+            if groups.getParentId(gId) == parentId:
+                return gId
+        return None
 
     def getMasterID(self):
         """Find GroupID of the default Master group
@@ -186,13 +963,10 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: GroupID of Master group
         """
-        self.cursor.execute(
-            'SELECT "GroupId" FROM Groups WHERE "ParentId" = 1 AND "Name" = "Master"'
-        )
-        rtn = self.cursor.fetchone()
+        rtn = self.getGroupIdFromNameAndParent("Master", 1)
         if rtn is None:
             raise RuntimeError("Cannot find Master group")
-        return rtn[0]
+        return rtn
 
     def getSourceGroupIds(self, skipRightGroups=False):
         """Get IDs of all SourceGroups in project
@@ -206,12 +980,8 @@ class ProjectFile(sqlDbFile):
         Returns:
             [int]: Array of IDs
         """
-        query = 'SELECT SourceGroupId from SourceGroups WHERE Name != "Unused channels"'
-        if skipRightGroups:
-            query += "AND OrderIndex != -1"
-
-        self.cursor.execute(query)
-        sourceGroups = self.cursor.fetchall()
+        query = "sourceGroupIdsSkipRight" if skipRightGroups else "sourceGroupIds"
+        sourceGroups = self.query(query).fetchall()
         if sourceGroups is not None:
             array = []
             for group in sourceGroups:
@@ -233,10 +1003,9 @@ class ProjectFile(sqlDbFile):
         Returns:
             string: Name of discovered SourceGroup
         """
-        self.cursor.execute(f"SELECT Name from SourceGroups WHERE SourceGroupId = {id}")
-        rtn = self.cursor.fetchone()
-        if rtn is not None:
-            return rtn[0]
+        idToName, _ = self.index.getSourceGroups()
+        if id in idToName:
+            return idToName[id]
         else:
             raise RuntimeError(f"Could not find SourceGroup with id {id}")
 
@@ -252,12 +1021,9 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: ID of discovered SourceGroup
         """
-        self.cursor.execute(
-            "SELECT SourceGroupId from SourceGroups WHERE Name = {name}"
-        )
-        rtn = self.cursor.fetchone()
-        if rtn is not None:
-            return rtn[0]
+        _, nameToId = self.index.getSourceGroups()
+        if name in nameToId:
+            return nameToId[name]
         else:
             raise RuntimeError(f"Could not find SourceGroup with name {name}")
 
@@ -268,10 +1034,7 @@ class ProjectFile(sqlDbFile):
             RuntimeError: Initial R1 setup hasn't been ran as no controls are not present
         """
 
-        self.cursor.execute(
-            "SELECT JoinedId from Controls ORDER BY JoinedId DESC LIMIT 1"
-        )
-        rtn = self.cursor.fetchone()
+        rtn = self.query("controlMaxJoinedId").fetchone()
         if rtn is not None:
             self.jId = rtn[0] + 1
         else:
@@ -285,8 +1048,7 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: GroupID found
         """
-        self.cursor.execute(f"SELECT max(GroupId) FROM Groups")
-        return self.cursor.fetchone()[0]
+        return self.query("groupMaxId").fetchone()[0]
 
     def createGrp(
         self, title, parentId=1, targetId=0, targetChannel=-1, type=0, flags=0
@@ -307,21 +1069,153 @@ class ProjectFile(sqlDbFile):
         if parentId < 1:
             raise Exception("Parent with GroupID {parentId} does not exist")
 
-        self.cursor.execute(
-            f"  INSERT INTO Groups (Name, ParentId, TargetId, TargetChannel, Type, Flags)"
-            f'  SELECT "{title}", {parentId}, {targetId}, {targetChannel}, {type}, {flags}'
+        keptId = self.__takeKeptGroup(
+            (title, parentId, targetId, targetChannel, type, flags)
         )
+        if keptId is not None:
+            return self.query("groupById", (keptId,)).fetchone()
 
-        self.cursor.execute(f"SELECT * FROM Groups ORDER BY GroupId DESC LIMIT 1;")
-        groupId = self.cursor.fetchone()
+        self.query(
+            "groupInsert", (title, parentId, targetId, targetChannel, type, flags)
+        )
+
+        groupId = self.query("groupById", (self.cursor.lastrowid,)).fetchone()
+        self.created["Groups"].append(groupId[GROUPS_COL_GroupId])
 
         # Get parent name for logging
-        self.cursor.execute(f"SELECT Name FROM Groups WHERE GroupId = {parentId}")
-        pName = self.cursor.fetchone()[0]
+        if self.groupTree is not None:
+            self.groupTree.add(groupId)
+            pName = self.groupTree.getName(parentId)
+        else:
+            self.index.invalidate("Groups")
+            pName = self.query("groupName", (parentId,)).fetchone()[0]
         log.info(f"Inserted {title} under {pName}")
 
         return groupId
 
+    def createGroups(self, rows):
+        """Enter many groups or amp channels into the group table
+
+        Rows are inserted in order with executemany. A parent can be a GroupRef to a row
+        earlier in the same batch, the batch is split wherever a row refers to one that
+        has not been inserted yet. Rows matching a kept group reuse it, see keepGroups.
+
+        Args:
+            rows ([tuple]): (title, parentId, targetId, targetChannel, type, flags) for each item, see createGrp
+
+        Returns:
+            [int]: GroupIDs of the new items, in the order of rows
+        """
+        ids = []
+        pending = []
+        for row in rows:
+            parentId = row[1]
+            if isinstance(parentId, GroupRef):
+                if parentId.index >= len(ids):
+                    if parentId.index >= len(ids) + len(pending):
+                        raise ValueError(
+                            f"GroupRef {parentId.index} is not an earlier row"
+                        )
+                    ids += self.__insertGroups(pending)
+                    pending = []
+                parentId = ids[parentId.index]
+            if parentId < 1:
+                raise Exception(f"Parent with GroupID {parentId} does not exist")
+            row = (row[0], parentId) + tuple(row[2:])
+            keptId = self.__takeKeptGroup(row)
+            if keptId is None:
+                pending.append(row)
+                continue
+            ids += self.__insertGroups(pending)
+            pending = []
+            ids.append(keptId)
+        ids += self.__insertGroups(pending)
+        return ids
+
+    def keepGroups(self, groupIds):
+        """Hand back existing groups in place of identical ones created afterwards
+
+        createGrp and createGroups reuse a kept group, without writing anything, for
+        a row with the same name, parent, target, channel, type and flags. A tree
+        created again in the same order so keeps its GroupIds. Replaces any groups
+        kept before, an empty list stops reusing groups.
+
+        Args:
+            groupIds ([int]): GroupIDs that may be reused
+        """
+        tree = self.index.getGroups()
+        self.keptGroups = {}
+        for gId in groupIds:
+            if gId in tree.rows:
+                self.keptGroups.setdefault(tuple(tree.rows[gId][1:]), []).append(gId)
+
+    def getKeptGroupIds(self):
+        """
+        Returns:
+            set: GroupIDs kept by keepGroups that have not been reused
+        """
+        return {gId for ids in self.keptGroups.values() for gId in ids}
+
+    def deleteKeptGroups(self, groupIds=None):
+        """Delete groups kept by keepGroups that have not been reused
+
+        Args:
+            groupIds (iterable, optional): Kept GroupIDs to delete. Defaults to all of them.
+        """
+        kept = self.getKeptGroupIds()
+        groupIds = kept if groupIds is None else kept & set(groupIds)
+        for key, ids in list(self.keptGroups.items()):
+            ids = [gId for gId in ids if gId not in groupIds]
+            if len(ids):
+                self.keptGroups[key] = ids
+            else:
+                del self.keptGroups[key]
+        if len(groupIds):
+            self.deleteGroups(sorted(groupIds))
+
+    def __takeKeptGroup(self, row):
+        """
+        Args:
+            row (tuple): (title, parentId, targetId, targetChannel, type, flags) of a new group
+
+        Returns:
+            int: GroupID of a matching kept group, now counted as created, or None
+        """
+        ids = self.keptGroups.get(row)
+        if not ids:
+            return None
+        keptId = ids.pop(0)
+        if not len(ids):
+            del self.keptGroups[row]
+        self.created["Groups"].append(keptId)
+        return keptId
+
+    def __insertGroups(self, rows):
+        """Insert rows with resolved parents and keep the indexes in sync
+
+        Args:
+            rows ([tuple]): Rows as passed to groupInsert
+
+        Returns:
+            [int]: GroupIDs of the new items
+        """
+        if not len(rows):
+            return []
+        self.queryMany("groupInsert", rows)
+        # GroupId is AUTOINCREMENT so the rows just written hold the highest ids
+        lastId = self.query("groupMaxId").fetchone()[0]
+        firstId = lastId - len(rows) + 1
+        ids = list(range(firstId, lastId + 1))
+        self.created["Groups"] += ids
+
+        if self.groupTree is not None:
+            for row in self.query("groupRange", (firstId, lastId)).fetchall():
+                self.groupTree.add(row)
+        else:
+            self.index.invalidate("Groups")
+        log.info(f"Inserted {len(rows)} groups.")
+        return ids
+
     def getGroupIdFromName(self, name):
         """Get GroupIDs of groups matching provided name
 
@@ -334,12 +1228,10 @@ class ProjectFile(sqlDbFile):
         Returns:
             [int]: array of GroupIDs of matching groups
         """
-        self.cursor.execute(f'SELECT GroupId FROM Groups WHERE Name = "{name}"')
-
-        rtn = self.cursor.fetchone()
-        if rtn is None:
+        ids = self.index.getGroups().getIdsFromName(name)
+        if not len(ids):
             raise RuntimeError("Could not find group")
-        return rtn
+        return (ids[0],)
 
     def getViewIdFromName(self, name):
         """Get a View's ViewID from it's name
@@ -353,10 +1245,293 @@ class ProjectFile(sqlDbFile):
         Returns:
             int: Retrieved ViewId
         """
-        self.cursor.execute(f'SELECT ViewId FROM Views WHERE Name = "{name}"')
-
-        rtn = self.cursor.fetchone()
-        if rtn is not None:
-            return rtn[0]
+        views = self.index.getViews()
+        if name in views:
+            return views[name]
         else:
             raise RuntimeError("View not found")
+
+    def createView(self, name, hRes, vRes):
+        """Insert a new view
+
+        Args:
+            name (string): Title of view
+            hRes (int): Width of view
+            vRes (int): Height of view
+
+        Returns:
+            int: ViewId of the new view
+        """
+        self.query("viewInsert", (name, hRes, vRes))
+        viewId = self.cursor.lastrowid
+        self.created["Views"].append(viewId)
+        self.index.invalidate("Views")
+        log.info(f"Created view {name}")
+        return viewId
+
+    def deleteView(self, viewId):
+        """Delete a view and all controls placed within it
+
+        Args:
+            viewId (int): ViewId of view to delete
+        """
+        self.query("controlDeleteFromView", (viewId,))
+        self.query("viewDelete", (viewId,))
+        self.index.invalidate("Views")
+
+    def deleteViews(self, viewIds):
+        """Delete a set of views and all controls placed within them with batched deletes
+
+        Args:
+            viewIds ([int]): ViewIds of views to delete
+        """
+        batches = idBatches(viewIds)
+        self.queryMany("controlDeleteFromViewBatch", batches)
+        self.queryMany("viewDeleteBatch", batches)
+        self.index.invalidate("Views")
+
+    def deleteControls(self, controlIds):
+        """Delete a set of controls with batched deletes
+
+        Args:
+            controlIds ([int]): ControlIds to delete
+        """
+        self.queryMany("controlDeleteBatch", idBatches(controlIds))
+
+
+##### Sinks for generated Controls rows #####
+
+
+class ControlSink(ABC):
+    def __init__(self):
+        """Receive generated Controls rows, subclasses decide where they go
+
+        Sinks can be used as context managers, flush() is called on a clean exit.
+        """
+        self.count = 0
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        if excType is None:
+            self.flush()
+        return False
+
+    def add(self, row):
+        """Pass a control to the sink
+
+        Args:
+            row (tuple): Values ordered as CONTROLS_COLUMNS
+        """
+        if len(row) != len(CONTROLS_COLUMNS):
+            raise ValueError(
+                f"Expected {len(CONTROLS_COLUMNS)} values for control, got {len(row)}"
+            )
+        self.write(row)
+
+    def extend(self, rows):
+        """Pass many controls to the sink
+
+        Args:
+            rows (iterable): Rows with values ordered as CONTROLS_COLUMNS
+        """
+        for row in rows:
+            self.add(row)
+
+    @abstractmethod
+    def write(self, row):
+        """Take one validated control, implemented by each sink
+
+        Args:
+            row (tuple): Values ordered as CONTROLS_COLUMNS
+        """
+
+    def flush(self):
+        """Finish writing any pending controls
+
+        Returns:
+            int: Number of controls written since the last flush
+        """
+        written, self.pending = self.pending, 0
+        return written
+
+
+class ControlWriter(ControlSink):
+    def __init__(self, proj):
+        """Buffer rows destined for the Controls table of a project
+
+        Rows are held in memory and written with a single prepared statement
+        when flush() is called or the writer is used as a context manager.
+
+        Args:
+            proj (ProjectFile): Project to write controls into
+        """
+        super().__init__()
+        self.proj = proj
+        self.rows = []
+
+    def __exit__(self, excType, excValue, tb):
+        if excType is not None:
+            self.rows = []
+        return super().__exit__(excType, excValue, tb)
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        """Write all queued controls in one statement
+
+        Rows join the project's open transaction and are committed with everything
+        else generated when the project is closed or saved, never by the writer.
+
+        Returns:
+            int: Number of controls written
+        """
+        if not len(self.rows):
+            return 0
+
+        self.proj.queryMany("controlInsert", self.rows)
+
+        written = len(self.rows)
+        # ControlId is AUTOINCREMENT so the rows just written hold the highest ids
+        lastId = self.proj.query("controlMaxId").fetchone()[0]
+        self.proj.created["Controls"] += range(lastId - written + 1, lastId + 1)
+        jIdCol = CONTROLS_COLUMNS.index("JoinedId")
+        self.proj.created["JoinedIds"] += sorted({row[jIdCol] for row in self.rows})
+        self.count += written
+        self.rows = []
+        log.info(f"Inserted {written} controls.")
+        return written
+
+
+class JsonLinesSink(ControlSink):
+    def __init__(self, path):
+        """Write each control as a JSON object keyed by column name, one per line
+
+        Args:
+            path (string): File to write, replaced if it exists
+        """
+        super().__init__()
+        self.f = open(path, "w")
+
+    def write(self, row):
+        self.f.write(json.dumps(dict(zip(CONTROLS_COLUMNS, row))) + "\n")
+        self.count += 1
+        self.pending += 1
+
+    def flush(self):
+        self.f.flush()
+        return super().flush()
+
+    def close(self):
+        self.f.close()
+
+
+class NullSink(ControlSink):
+    """Discard controls, only counting them"""
+
+    def write(self, row):
+        self.count += 1
+        self.pending += 1
+
+
+##### Span tracing #####
+
+
+class NullTracer(object):
+    """Tracer that records nothing, the default of every ProjectFile"""
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name, category="autor1", **args):
+        """Time a block of code, see Tracer.span
+
+        Yields:
+            dict: Arguments of the span, values added inside the block are recorded
+        """
+        yield args
+
+    def popEvents(self):
+        return []
+
+    def addEvents(self, events):
+        pass
+
+
+class Tracer(NullTracer):
+    enabled = True
+
+    def __init__(self):
+        """Record timed, nested spans as Chrome trace events
+
+        Timestamps come from the system wide monotonic clock so events recorded by
+        worker processes can be merged into the main process' trace with addEvents.
+        """
+        self.events = []
+
+    @contextmanager
+    def span(self, name, category="autor1", **args):
+        """Time a block of code
+
+        Args:
+            name (string): Name shown for the span
+            category (string, optional): Category used to filter spans. Defaults to "autor1".
+            **args: Values shown with the span
+
+        Yields:
+            dict: Arguments of the span, values added inside the block are recorded
+        """
+        startTime = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": startTime / 1000,
+                    "dur": (time.perf_counter_ns() - startTime) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+    def popEvents(self):
+        """Remove and return all recorded events, used to pass them between processes
+
+        Returns:
+            [dict]: Trace events
+        """
+        events, self.events = self.events, []
+        return events
+
+    def addEvents(self, events):
+        self.events += events
+
+    def save(self, path):
+        """Write all events as a Chrome trace, viewable in chrome://tracing or Perfetto
+
+        Args:
+            path (string): File to write, replaced if it exists
+        """
+        origin = min((e["ts"] for e in self.events), default=0)
+        events = [dict(e, ts=e["ts"] - origin) for e in self.events]
+        for pid in sorted({e["pid"] for e in events}):
+            events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {
+                        "name": "autor1" if pid == os.getpid() else f"worker {pid}"
+                    },
+                }
+            )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        log.info(f"Saved {len(self.events)} trace events to {path}.")
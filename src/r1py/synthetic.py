@@ -0,0 +1,352 @@
+import sqlite3
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Tables copied unchanged from the seed project, they hold no source group data
+SEED_TABLES = [
+    "ControlTypes",
+    "TargetTypes",
+    "ViewTypes",
+    "TableVersions",
+    "ProjectInformation",
+    "ProjectSettings",
+    "ProjectStateArrayCalc",
+    "ProjectStateNoizCalc",
+    "SimulationProperties",
+    "SimulationPropertiesFrequencies",
+    "VenueObjects",
+    "VenueObjectPoints",
+    "VenueObjectsCircular",
+    "VenueObjectsEllipsoidal",
+    "ViewProperties",
+    "ViewPropertiesPoints",
+]
+# Default views of an initialised project, the Overview is emptied
+SEED_VIEWS = "SELECT * FROM seed.Views WHERE Type IN (1, 3) OR Name = 'Overview'"
+
+# Controls of the seed reused as prototypes for the controls of source group views
+PROTOTYPE_QUERIES = {
+    "frame": "SELECT * FROM seed.Controls WHERE Type = 12 ORDER BY ControlId LIMIT 1",
+    "meter": "SELECT * FROM seed.Controls WHERE Type = 1 ORDER BY ControlId LIMIT 1",
+    "infra": "SELECT * FROM seed.Controls WHERE DisplayName = 'Infra' ORDER BY ControlId LIMIT 1",
+}
+
+SRC_TYPE_ARRAY = 1
+SRC_TYPE_SUBARRAY = 3
+SRC_TYPE_UNUSED = 5
+
+AMP_MODEL = "D80"
+AMP_CHANNELS = 4
+
+TOPS_SYSTEM, TOPS_CABINET = "KSL", "KSL8"
+SUBS_SYSTEM, SUBS_CABINET = "SL-SUB", "SL-SUB"
+SUBARRAY_SYSTEM, SUBARRAY_CABINET = "V-Series", "V-SUB"
+
+
+class SyntheticProject:
+    def __init__(self, path, seedPath):
+        """Start a new initialised R1 project with the schema of an existing one
+
+        The file holds the seed's schema and lookup tables, the root, Master and
+        Left/Right groups and the default views. Source groups are added with
+        addArray and addSubArray.
+
+        Args:
+            path (string): File to create, replaced if it exists
+            seedPath (string): Any initialised .dbpr project
+
+        Raises:
+            Exception: If seedPath does not exist
+        """
+        if not os.path.isfile(seedPath):
+            raise Exception("Seed file does not exist.")
+        if os.path.exists(path):
+            os.remove(path)
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.cursor = self.db.cursor()
+        self.cursor.execute("ATTACH DATABASE ? AS seed", (seedPath,))
+
+        schema = self.cursor.execute(
+            "SELECT type, sql FROM seed.sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        # Tables first so indexes and triggers can refer to them
+        for _, sql in sorted(schema, key=lambda row: row[0] != "table"):
+            self.cursor.execute(sql)
+        for table in SEED_TABLES:
+            self.cursor.execute(f"INSERT INTO main.{table} SELECT * FROM seed.{table}")
+        self.cursor.execute(f"INSERT INTO main.Views {SEED_VIEWS}")
+        # Alignment refers to source groups of the seed
+        self.cursor.execute(
+            "UPDATE main.ViewProperties SET SourceGroupForAlignmentId = NULL, CabinetForAlignmentId = NULL"
+        )
+
+        self.columns = [
+            row[1] for row in self.cursor.execute("PRAGMA table_info(Controls)")
+        ]
+        self.prototypes = {}
+        for name, query in PROTOTYPE_QUERIES.items():
+            row = self.cursor.execute(query).fetchone()
+            if row is None:
+                raise Exception(f"Seed project has no {name} control.")
+            self.prototypes[name] = row
+
+        self.db.commit()
+        self.cursor.execute("DETACH DATABASE seed")
+
+        self.rootId = self.addGroup("Groups", 0)
+        self.masterId = self.addGroup("Master", self.rootId)
+        self.leftRightId = self.addGroup("Left/Right", self.rootId)
+        self.overviewId = self.cursor.execute(
+            "SELECT ViewId FROM Views WHERE Name = 'Overview'"
+        ).fetchone()[0]
+
+        self.orderIndex = 0
+        self.channels = []  # Free (DeviceId, AmplifierChannel) of the last amplifier
+        self.remoteId = 0
+        self.joinedId = 0
+        # Every project needs at least one control for R1 to count it as initialised
+        self.addControl("frame", self.overviewId, "Overview", 15, 15)
+        self.addSourceGroup(SRC_TYPE_UNUSED, "Unused channels", "mixed", orderIndex=-1)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def addGroup(self, name, parentId, targetId=0, targetChannel=-1):
+        """
+        Args:
+            name (string): Name of group
+            parentId (int): GroupId of parent
+            targetId (int, optional): DeviceId of a channel entry. Defaults to 0.
+            targetChannel (int, optional): AmplifierChannel of a channel entry. Defaults to -1.
+
+        Returns:
+            int: GroupId of new group
+        """
+        self.cursor.execute(
+            "INSERT INTO Groups (Name, ParentId, TargetId, TargetChannel, Type, Flags) VALUES (?, ?, ?, ?, ?, 0)",
+            (name, parentId, targetId, targetChannel, 1 if targetId else 0),
+        )
+        return self.cursor.lastrowid
+
+    def addView(self, name):
+        self.cursor.execute(
+            'INSERT INTO Views ("Type", "Name", "Flags", "HomeViewIndex", "NaviBarIndex", "HRes", "VRes", "ZoomLevel") VALUES (1000, ?, 4, NULL, -1, 1016, 1016, 100)',
+            (name,),
+        )
+        return self.cursor.lastrowid
+
+    def addControl(
+        self,
+        prototype,
+        viewId,
+        displayName,
+        posX,
+        posY,
+        targetId=None,
+        targetChannel=None,
+    ):
+        """Copy a prototype control from the seed into a view
+
+        Args:
+            prototype (string): Key of PROTOTYPE_QUERIES
+            viewId (int): View to add the control to
+            displayName (string): DisplayName of the control
+            posX (int): X position
+            posY (int): Y position
+            targetId (int, optional): Replaces the prototype's TargetId. Defaults to None.
+            targetChannel (int, optional): Replaces the prototype's TargetChannel. Defaults to None.
+        """
+        row = dict(zip(self.columns, self.prototypes[prototype]))
+        self.joinedId += 1
+        row.update(
+            ControlId=None,
+            ViewId=viewId,
+            DisplayName=displayName,
+            JoinedId=self.joinedId,
+            PosX=posX,
+            PosY=posY,
+        )
+        if targetId is not None:
+            row.update(TargetId=targetId, TargetChannel=targetChannel)
+        self.cursor.execute(
+            f"INSERT INTO Controls ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            tuple(row.values()),
+        )
+
+    def addSourceGroup(
+        self, srcType, name, system, nextId=0, apEnable=0, orderIndex=None
+    ):
+        """
+        Args:
+            srcType (int): SourceGroup Type
+            name (string): Name of source group
+            system (string): Cabinet family
+            nextId (int, optional): SourceGroupId of the right half of a stereo pair. Defaults to 0.
+            apEnable (int, optional): ArrayProcessingEnable. Defaults to 0.
+            orderIndex (int, optional): OrderIndex, the next free one if None. Defaults to None.
+
+        Returns:
+            int: SourceGroupId of new source group
+        """
+        if orderIndex is None:
+            orderIndex = self.orderIndex
+            self.orderIndex += 1
+        self.cursor.execute(
+            "INSERT INTO SourceGroups (Type, Name, OrderIndex, RemarkableChangeDate, NextSourceGroupId, ArrayProcessingEnable, ArraySightId, LinkMode, Symmetric, Mounting) VALUES (?, ?, ?, 0, ?, ?, 0, 0, 0, 0)",
+            (srcType, name, orderIndex, nextId, apEnable),
+        )
+        srcId = self.cursor.lastrowid
+        self.cursor.execute(
+            "INSERT INTO SourceGroupsAdditionalData (SourceGroupId, System) VALUES (?, ?)",
+            (srcId, system),
+        )
+        return srcId
+
+    def addChannel(self, srcId, cabinet, name, position):
+        """Patch a cabinet to the next free amplifier channel, adding an amplifier when needed
+
+        Returns:
+            (int, int): DeviceId and AmplifierChannel of the cabinet
+        """
+        if not len(self.channels):
+            self.remoteId += 1
+            self.cursor.execute(
+                "INSERT INTO Devices (Model, RemoteIdSubnet, RemoteIdDevice, Name) VALUES (?, 0, ?, ?)",
+                (AMP_MODEL, self.remoteId, f"0.{self.remoteId:02d}"),
+            )
+            deviceId = self.cursor.lastrowid
+            self.cursor.execute(
+                "INSERT INTO DevicesAmplifier (DeviceId, InputMode, OutputMode) VALUES (?, 4, 0)",
+                (deviceId,),
+            )
+            self.channels = [(deviceId, ch) for ch in range(AMP_CHANNELS, 0, -1)]
+        deviceId, channel = self.channels.pop()
+
+        self.cursor.execute(
+            "INSERT INTO AmplifierChannels (DeviceId, AmplifierChannel, Name) VALUES (?, ?, ?)",
+            (deviceId, channel, name),
+        )
+        self.cursor.execute(
+            "INSERT INTO Cabinets (DeviceId, AmplifierChannel, SpeakerId, SourceGroupId, PositionIndex, OrderIndex, HorizontalAngle, VerticalAngle, RotationAngle, PivotAngle, Linked, OriginX, OriginY, OriginZ) VALUES (?, ?, 0, ?, ?, 1, 0, 0, 0, 0, 0, 0, 0, 0)",
+            (deviceId, channel, srcId, position),
+        )
+        self.cursor.execute(
+            "INSERT INTO CabinetsAdditionalData (CabinetId, Name, ControllerSetup, SplayAngle, AlignmentToSubArrayTestPoint, CabinetsPerPosition, IsCompressible) VALUES (?, ?, 1, 0, 4, 1, 0)",
+            (self.cursor.lastrowid, cabinet),
+        )
+        return deviceId, channel
+
+    def addArray(self, name, channels, subs=False, apEnable=False):
+        """Add a left/right pair of arrays as ArrayCalc and R1 lay them out
+
+        Args:
+            name (string): Name of source group
+            channels (int): Cabinets on each side
+            subs (bool, optional): Array of SUBs rather than TOPs. Defaults to False.
+            apEnable (bool, optional): Enable array processing. Defaults to False.
+        """
+        role = "SUBs" if subs else "TOPs"
+        system, cabinet = (
+            (SUBS_SYSTEM, SUBS_CABINET) if subs else (TOPS_SYSTEM, TOPS_CABINET)
+        )
+
+        rightId = self.addSourceGroup(
+            SRC_TYPE_ARRAY, name, system, 0, int(apEnable), -1
+        )
+        leftId = self.addSourceGroup(
+            SRC_TYPE_ARRAY, name, system, rightId, int(apEnable)
+        )
+
+        masterRole = self.addGroup(f"{name} {role}", self.addGroup(name, self.masterId))
+        lrRole = self.addGroup(f"{name} {role}", self.addGroup(name, self.leftRightId))
+        sides = {
+            side: self.addGroup(f"{name} {role} {side}", lrRole) for side in ["L", "R"]
+        }
+
+        viewId = self.addView(name)
+        self.addView(f"{name} EQ")
+        self.addControl("frame", viewId, f"{name} {role}", 15, 15)
+        if subs:
+            self.addControl("infra", viewId, "Infra", 15, 45, masterRole, -1)
+
+        for position in range(1, channels + 1):
+            positionId = self.addGroup(f"{name} {role} {position}", masterRole)
+            for side, srcId in [("L", leftId), ("R", rightId)]:
+                chName = f"{name} {position:02d}{side}"
+                target = self.addChannel(srcId, cabinet, chName, position)
+                self.addGroup(chName, positionId, *target)
+                self.addGroup(chName, sides[side], *target)
+                self.addControl(
+                    "meter", viewId, chName, 15 + (position * 60), 75, *target
+                )
+
+    def addSubArray(self, name, channels):
+        """Add a SUB array with left, right and centre positions
+
+        Args:
+            name (string): Name of source group
+            channels (int): Cabinets on each of the left and right sides, the centre has half as many
+        """
+        srcId = self.addSourceGroup(SRC_TYPE_SUBARRAY, name, SUBARRAY_SYSTEM)
+        groupId = self.addGroup(name, self.masterId)
+        viewId = self.addView(name)
+        self.addView(f"{name} EQ")
+        self.addControl("frame", viewId, name, 15, 15)
+
+        # Channel names end in L/R/C, two digits, a dash and two more, see autor1 __getSubArrayGroup
+        position = 0
+        for idx in range(1, channels + 1):
+            pairId = self.addGroup(f"L{idx}-R{idx}", groupId)
+            for side in ["L", "R"]:
+                position += 1
+                sideId = self.addGroup(f"{side}{idx}", pairId)
+                chName = f"{name} {side}{idx:02d}-01"
+                target = self.addChannel(srcId, SUBARRAY_CABINET, chName, position)
+                self.addGroup(chName, sideId, *target)
+                self.addControl(
+                    "meter", viewId, chName, 15 + (position * 60), 75, *target
+                )
+
+        centreId = self.addGroup("Ctr", groupId)
+        for idx in range(1, max(channels // 2, 1) + 1):
+            position += 1
+            chName = f"{name} C{idx:02d}-01"
+            target = self.addChannel(srcId, SUBARRAY_CABINET, chName, position)
+            self.addGroup(chName, centreId, *target)
+            self.addControl("meter", viewId, chName, 15 + (position * 60), 75, *target)
+
+
+def createProject(
+    path, seedPath, arrays=4, subs=2, apEnable=False, subArray=True, channels=8
+):
+    """Build an initialised R1 project of a given size for tests and benchmarks
+
+    Args:
+        path (string): File to create, replaced if it exists
+        seedPath (string): Any initialised .dbpr project, its schema and lookup tables are copied
+        arrays (int, optional): Left/right pairs of TOPs arrays. Defaults to 4.
+        subs (int, optional): Left/right pairs of SUBs arrays. Defaults to 2.
+        apEnable (bool, optional): Enable array processing on TOPs arrays. Defaults to False.
+        subArray (bool, optional): Add a SUB array with L/R/C positions. Defaults to True.
+        channels (int, optional): Cabinets on each side of every array. Defaults to 8.
+
+    Returns:
+        string: path
+    """
+    project = SyntheticProject(path, seedPath)
+    for idx in range(1, arrays + 1):
+        project.addArray(f"Array {idx:02d}", channels, apEnable=apEnable)
+    for idx in range(1, subs + 1):
+        project.addArray(f"Subs {idx:02d}", channels, subs=True)
+    if subArray:
+        project.addSubArray("SUB array", channels)
+    project.close()
+    log.info(
+        f"Created {path} - {arrays} arrays, {subs} subs, {channels} channels per side, AP {'on' if apEnable else 'off'}, SUB array {'on' if subArray else 'off'}"
+    )
+    return path
@@ -1,8 +1,11 @@
 import logging
 import sqlite3
 import sys
+import os
+import json
 import pytest
 import r1py.r1py as r1
+import r1py.synthetic as synthetic
 from shutil import copyfile
 
 TEMP_FILE = "./dist/templates.r2t"
@@ -71,5 +74,387 @@ def test_deleteGroup(loadedProject):
         loadedProject.getGroupIdFromName("Left/Right")
 
 
+def test_registerQueries():
+    r1.registerQueries({"testQuery": "SELECT 1"})
+    # Re-registering the same statement is allowed
+    r1.registerQueries({"testQuery": "SELECT 1"})
+    with pytest.raises(ValueError):
+        r1.registerQueries({"testQuery": "SELECT 2"})
+
+
+def test_quotedGroupName(loadedProject):
+    name = 'Quoted "group"'
+    groupId = loadedProject.createGrp(name, 1)[0]
+    assert loadedProject.getGroupIdFromName(name)[0] == groupId
+    loadedProject.deleteGroup(groupId)
+
+
 def test_getGroupCount(loadedProject):
     assert loadedProject.getGroupCount() > 10
+
+
+def copyTestFile(name):
+    try:
+        os.mkdir("./Projects/Output/", 0o777)
+    except:
+        pass
+    path = "./Projects/Output/" + name
+    copyfile(TEST_FILE, path)
+    return path
+
+
+def test_controlWriter():
+    proj = r1.ProjectFile(copyTestFile("test_controlWriter.dbpr"))
+
+    proj.cursor.execute("SELECT count(*) FROM Controls")
+    initCount = proj.cursor.fetchone()[0]
+
+    row = [0] * len(r1.CONTROLS_COLUMNS)
+    row[r1.CONTROLS_COLUMNS.index("DisplayName")] = 'Quoted "name"'
+    row[r1.CONTROLS_COLUMNS.index("JoinedId")] = proj.jId
+
+    writer = r1.ControlWriter(proj)
+    with pytest.raises(ValueError):
+        writer.add(tuple(row[:-1]))
+    for _ in range(5):
+        writer.add(tuple(row))
+
+    # Nothing is written until flushed
+    proj.cursor.execute("SELECT count(*) FROM Controls")
+    assert proj.cursor.fetchone()[0] == initCount
+
+    assert writer.flush() == 5
+    assert writer.flush() == 0
+    proj.cursor.execute(
+        "SELECT DisplayName FROM Controls WHERE JoinedId = ?", (proj.jId,)
+    )
+    assert [r[0] for r in proj.cursor.fetchall()] == ['Quoted "name"'] * 5
+
+    # Flushed rows are part of the project's transaction, not committed by the writer
+    db = sqlite3.connect(proj.f)
+    assert db.execute("SELECT count(*) FROM Controls").fetchone()[0] == initCount
+    db.close()
+    proj.close(commit=False)
+    proj = r1.ProjectFile(proj.f)
+    proj.cursor.execute("SELECT count(*) FROM Controls")
+    assert proj.cursor.fetchone()[0] == initCount
+    proj.close()
+
+
+def test_controlSinks():
+    row = [0] * len(r1.CONTROLS_COLUMNS)
+    row[r1.CONTROLS_COLUMNS.index("DisplayName")] = 'Quoted "name"'
+    row = tuple(row)
+
+    # Every sink decides where rows go
+    with pytest.raises(TypeError):
+        r1.ControlSink()
+
+    with r1.NullSink() as sink:
+        with pytest.raises(ValueError):
+            sink.add(row[:-1])
+        sink.extend(row for _ in range(3))
+    assert sink.count == 3
+    assert sink.flush() == 0
+
+    path = copyTestFile("test_controlSinks.dbpr") + ".jsonl"
+    sink = r1.JsonLinesSink(path)
+    sink.extend([row, row])
+    assert sink.flush() == 2
+    sink.close()
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 2
+    assert lines[0]["DisplayName"] == 'Quoted "name"'
+    assert list(lines[0]) == r1.CONTROLS_COLUMNS
+
+
+def test_inMemory():
+    path = copyTestFile("test_inMemory.dbpr")
+    with open(path, "rb") as f:
+        contents = f.read()
+
+    proj = r1.ProjectFile(path, inMemory=True)
+    proj.controlSink = r1.NullSink()
+    assert proj.getControlSink() is proj.controlSink
+    groupId = proj.createGrp("In memory", 1)[0]
+    assert proj.getGroupIdFromName("In memory")[0] == groupId
+    proj.close()
+
+    with open(path, "rb") as f:
+        assert f.read() == contents
+
+
+def test_saveAs():
+    path = copyTestFile("test_saveAs.dbpr")
+    outPath = os.path.splitext(path)[0] + "_AUTO.dbpr"
+    with open(path, "rb") as f:
+        contents = f.read()
+
+    proj = r1.ProjectFile(path, processingIndexes=True, inMemory=True)
+    groupId = proj.createGrp("Saved", 1)[0]
+    proj.saveAs(outPath)
+
+    # Failed writes leave no partial output behind
+    missingPath = os.path.join(os.path.dirname(path), "missing", "out.dbpr")
+    with pytest.raises(Exception):
+        proj.saveAs(missingPath)
+    proj.close()
+
+    with open(path, "rb") as f:
+        assert f.read() == contents
+    assert not [f for f in os.listdir(os.path.dirname(path)) if f.endswith(".tmp")]
+
+    saved = r1.ProjectFile(outPath)
+    assert saved.getGroupIdFromName("Saved")[0] == groupId
+    assert not saved.cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE 'r1py_%'"
+    ).fetchall()
+    saved.close()
+
+
+def test_groupTree():
+    proj = r1.ProjectFile(copyTestFile("test_groupTree.dbpr"), groupTree=True)
+    tree = proj.groupTree
+    assert len(tree.rows) == proj.getGroupCount()
+
+    groupId = proj.getGroupIdFromName("Left/Right")[0]
+    subtree = tree.getSubtreeIds(groupId)
+    assert subtree[-1] == groupId
+    for gId in subtree[:-1]:
+        assert groupId in tree.getAncestorIds(gId)
+    assert proj.getChildGroupIds(groupId) == [
+        row[0]
+        for row in proj.cursor.execute(
+            "SELECT GroupId FROM Groups WHERE ParentId = ? ORDER BY GroupId", (groupId,)
+        ).fetchall()
+    ]
+
+    newId = proj.createGrp("Tree test", groupId)[0]
+    assert proj.getGroupIdFromNameAndParent("Tree test", groupId) == newId
+    assert newId in tree.getChildIds(groupId)
+
+    initCount = proj.getGroupCount()
+    proj.deleteGroup(groupId)
+    assert proj.getGroupCount() == initCount - len(subtree) - 1
+    assert groupId not in tree.rows and newId not in tree.rows
+    with pytest.raises(RuntimeError):
+        proj.getGroupIdFromName("Left/Right")
+    proj.close()
+
+
+def test_keepGroups():
+    proj = r1.ProjectFile(copyTestFile("test_keepGroups.dbpr"), groupTree=True)
+    rows = [
+        ("Kept", 1, 0, -1, 0, 0),
+        ("Channel A", r1.GroupRef(0), 10, 1, 1, 0),
+        ("Channel B", r1.GroupRef(0), 10, 2, 1, 0),
+    ]
+    ids = proj.createGroups(rows)
+    proj.keepGroups(ids)
+
+    # Identical rows are handed back without writing, others are inserted
+    proj.created["Groups"] = []
+    changes = proj.db.total_changes
+    assert proj.createGrp("Kept", 1)[0] == ids[0]
+    assert proj.createGroups([("Channel A", ids[0], 10, 1, 1, 0)]) == ids[1:2]
+    assert proj.db.total_changes == changes
+    newId = proj.createGroups([("Channel C", ids[0], 10, 3, 1, 0)])[0]
+    assert newId not in ids
+    assert proj.created["Groups"] == ids[:2] + [newId]
+
+    assert proj.getKeptGroupIds() == {ids[2]}
+    proj.deleteKeptGroups()
+    assert not proj.getKeptGroupIds()
+    assert proj.groupTree.getChildIds(ids[0]) == [ids[1], newId]
+    proj.close()
+
+
+@pytest.mark.parametrize("groupTree", [False, True])
+def test_createGroups(groupTree):
+    proj = r1.ProjectFile(
+        copyTestFile(f"test_createGroups_{groupTree}.dbpr"), groupTree=groupTree
+    )
+    initCount = proj.getGroupCount()
+
+    ids = proj.createGroups(
+        [
+            ("Bulk", 1, 0, -1, 0, 0),
+            ("Bulk child", r1.GroupRef(0), 0, -1, 0, 0),
+            ("Bulk channel", r1.GroupRef(1), 1, 2, 1, 0),
+            ("Bulk channel", r1.GroupRef(1), 1, 3, 1, 0),
+        ]
+    )
+    assert ids == list(range(ids[0], ids[0] + 4))
+    assert proj.getGroupCount() == initCount + 4
+    assert proj.getGroupIdFromNameAndParent("Bulk child", ids[0]) == ids[1]
+    assert proj.getChildGroupIds(ids[1]) == ids[2:]
+    assert proj.created["Groups"] == ids
+
+    with pytest.raises(ValueError):
+        proj.createGroups([("Bad", r1.GroupRef(1), 0, -1, 0, 0)])
+    with pytest.raises(Exception):
+        proj.createGroups([("Bad", -1, 0, -1, 0, 0)])
+    assert proj.createGroups([]) == []
+    proj.close()
+
+
+def test_projectIndex():
+    proj = r1.ProjectFile(copyTestFile("test_projectIndex.dbpr"))
+
+    viewId = proj.getViewIdFromName("Overview")
+    assert "Views" in proj.index.tables
+    assert proj.getViewIdFromName("Overview") == viewId
+
+    newViewId = proj.createView("Index test", 100, 100)
+    assert "Views" not in proj.index.tables
+    assert proj.getViewIdFromName("Index test") == newViewId
+    proj.deleteView(newViewId)
+    with pytest.raises(RuntimeError):
+        proj.getViewIdFromName("Index test")
+
+    for id in proj.getSourceGroupIds():
+        name = proj.getSourceGroupNameFromId(id)
+        assert proj.getSourceGroupIdFromName(name) <= id
+    with pytest.raises(RuntimeError):
+        proj.getSourceGroupIdFromName("abcd")
+
+    initCount = proj.getGroupCount()
+    groupId = proj.createGrp("Index test", 1)[0]
+    assert proj.getGroupCount() == initCount + 1
+    assert proj.getGroupIdFromName("Index test")[0] == groupId
+    proj.deleteGroup(groupId)
+    assert proj.getGroupCount() == initCount
+    proj.close()
+
+
+def test_processingIndexes():
+    path = copyTestFile("test_processingIndexes.dbpr")
+    query = "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'r1py_%'"
+
+    proj = r1.ProjectFile(path, processingIndexes=True)
+    proj.cursor.execute(query)
+    assert sorted(r[0] for r in proj.cursor.fetchall()) == sorted(r1.PROCESSING_INDEXES)
+    # Not yet committed to the file, another connection does not see them
+    db = sqlite3.connect(path)
+    assert db.execute(query).fetchall() == []
+    db.close()
+    proj.close()
+
+    db = sqlite3.connect(path)
+    assert db.execute(query).fetchall() == []
+    db.close()
+
+    # Exiting without closing leaves nothing behind
+    proj = r1.ProjectFile(path, processingIndexes=True)
+    proj.createGrp("test_processingIndexes", 1)
+    proj.db.close()
+    db = sqlite3.connect(path)
+    assert db.execute(query).fetchall() == []
+    assert db.execute(
+        "SELECT count(*) FROM Groups WHERE Name = 'test_processingIndexes'"
+    ).fetchone() == (0,)
+    db.close()
+
+
+def test_syntheticProject():
+    path = copyTestFile("test_syntheticProject.dbpr")
+    synthetic.createProject(path, TEST_FILE, arrays=3, subs=2, channels=5)
+
+    proj = r1.ProjectFile(path)
+    assert proj.isInitialised() == 1
+    # Each array is a left/right pair, plus the SUB array
+    assert len(proj.getSourceGroupIds()) == 2 * (3 + 2) + 1
+    assert len(proj.getSourceGroupIds(skipRightGroups=True)) == 3 + 2 + 1
+    proj.cursor.execute("SELECT count(*) FROM Cabinets")
+    assert proj.cursor.fetchone()[0] == 2 * 5 * (3 + 2) + 5 * 2 + 2
+    proj.cursor.execute("PRAGMA foreign_key_check")
+    assert proj.cursor.fetchall() == []
+    proj.close()
+
+    with pytest.raises(Exception):
+        synthetic.createProject(path, "./Projects/missing.dbpr")
+
+
+def test_tracer():
+    path = copyTestFile("test_tracer.dbpr")
+    proj = r1.ProjectFile(path)
+    assert not proj.tracer.enabled
+    with proj.span("untraced") as span:
+        span["value"] = 1
+    assert proj.tracer.popEvents() == []
+
+    proj.tracer = r1.Tracer()
+    with proj.span("outer", "test", label="x") as span:
+        with proj.tracer.span("inner"):
+            proj.createGrp("Traced", 1)
+    proj.close()
+
+    inner, outer = proj.tracer.events
+    assert (inner["name"], outer["name"]) == ("inner", "outer")
+    assert outer["args"] == {"label": "x", "rows": 1}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+    tracePath = path + ".json"
+    proj.tracer.save(tracePath)
+    with open(tracePath) as f:
+        trace = json.load(f)
+    assert [e["ph"] for e in trace["traceEvents"]] == ["X", "X", "M"]
+    assert min(e["ts"] for e in trace["traceEvents"] if e["ph"] == "X") == 0
+
+
+def test_sqlTrace():
+    assert (
+        r1.normaliseSql(
+            """SELECT "a b", x'00ff' FROM t WHERE n = 'it''s'   AND v IN (-1, 2.5e3, NULL) AND c2 = 10"""
+        )
+        == 'SELECT "a b", ? FROM t WHERE n = ? AND v IN (?, ?, ?) AND c2 = ?'
+    )
+
+    path = copyTestFile("test_sqlTrace.dbpr")
+    proj = r1.ProjectFile(path, sqlTrace=True)
+    trace = proj.sqlTrace
+    groups = proj.getGroupCount()
+    for name in ["Master", "Left/Right", "Master"]:
+        proj.query("groupIdsFromName", (name,)).fetchall()
+    proj.createGrp("Traced", 1)
+
+    shapes = [s for s in trace.statements if "FROM Groups WHERE Name = ? ORDER" in s]
+    assert len(shapes) == 1
+    statement = trace.statements[shapes[0]]
+    assert statement.count == 3
+    assert statement.seconds > 0
+    assert statement.plan and not statement.plan[0].startswith("No plan")
+    # Plans are only captured once per shape, EXPLAIN itself is not traced
+    assert not [s for s in trace.statements if s.startswith("EXPLAIN")]
+
+    count = trace.getCount()
+    proj.cursor.execute("SELECT * FROM Controls WHERE DisplayName = 'Untraced'")
+    proj.cursor.fetchall()
+    assert trace.getCount() == count + 1
+    report = trace.getReport()
+    assert "SELECT * FROM Controls WHERE DisplayName = ?" in report
+    assert "[SCAN]" in report
+    proj.close()
+
+    proj = r1.ProjectFile(path)
+    assert proj.sqlTrace is None
+    assert proj.getGroupCount() == groups + 1
+    proj.close()
+
+
+@pytest.mark.parametrize("groupTree", [False, True])
+def test_deleteGroupQueries(groupTree):
+    # Deleting a subtree takes the same statements whatever its size
+    calls = []
+    for arrays in [1, 8]:
+        path = copyTestFile(f"test_deleteGroupQueries_{groupTree}.dbpr")
+        synthetic.createProject(path, TEST_FILE, arrays=arrays, subs=arrays)
+        proj = r1.ProjectFile(path, groupTree=groupTree, sqlTrace=True)
+        groupId = proj.getGroupIdFromName("Master")[0]
+        before = proj.sqlTrace.calls
+        proj.deleteGroup(groupId)
+        calls.append(proj.sqlTrace.calls - before)
+        proj.close()
+    assert calls[0] == calls[1]